@@ -1,3 +1,12 @@
 from .ankiconnect import AnkiConnectBackend
+from .ankiconnect_async import AsyncAnkiConnectBackend, ConcurrentAnkiConnectBackend
+from .collection import CollectionBackend
+from .memory import MemoryBackend
 
-__all__ = ["AnkiConnectBackend"]
\ No newline at end of file
+__all__ = [
+    "AnkiConnectBackend",
+    "AsyncAnkiConnectBackend",
+    "ConcurrentAnkiConnectBackend",
+    "CollectionBackend",
+    "MemoryBackend",
+]
@@ -1,73 +1,288 @@
 from __future__ import annotations
 
 import base64
-from typing import Any, Dict, List, Optional
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
 
 import httpx
 
-from .base import Backend
+from .base import Backend, Batch, Deferred
+from ..log import LogPayload, enable_verbose, get_logger
+from ..profile import Profiler
 
+logger = get_logger("ankiconnect")
 
-class AnkiConnectBackend(Backend):
-    def __init__(self, base_url: str = "http://127.0.0.1:8765", timeout: int = 30, verbose: bool = False):
-        self.base_url = base_url.rstrip("/")
-        self.timeout = timeout
-        self.verbose = verbose
-    
-    def _log_verbose(self, message: str) -> None:
-        """Log message if verbose mode is enabled."""
-        if self.verbose:
-            print(f"[VERBOSE] {message}")
+_QueuedCall = Tuple[str, Optional[dict], Optional[Callable[[Any], Any]], Deferred]
 
-    def _invoke(self, action: str, params: Optional[dict] = None) -> Any:
-        payload = {"action": action, "version": 5}
+
+_LOCAL_HOSTS = {"127.0.0.1", "localhost", "::1"}
+_STREAM_PLACEHOLDER = "\x00ankiday-stream\x00"
+
+
+def is_local_url(url: str) -> bool:
+    """Whether the AnkiConnect URL points to this machine."""
+    return (urlparse(url).hostname or "") in _LOCAL_HOSTS
+
+
+class Base64File:
+    """Local file passed as a base64 param without loading it into memory.
+
+    The transport splices the encoded file into the JSON request body as a
+    stream, in blocks that are a multiple of 3 bytes so they encode without
+    padding.
+    """
+
+    block_size = 3 * 256 * 1024
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.size = self.path.stat().st_size
+
+    def __repr__(self) -> str:
+        return f"<{self.path} ({self.size} bytes, streamed)>"
+
+    @property
+    def encoded_length(self) -> int:
+        return 4 * ((self.size + 2) // 3)
+
+    def iter_encoded(self) -> Iterator[bytes]:
+        with self.path.open("rb") as f:
+            for block in iter(lambda: f.read(self.block_size), b""):
+                yield base64.b64encode(block)
+
+    def read_encoded(self) -> str:
+        return b"".join(self.iter_encoded()).decode("ascii")
+
+
+def _stream_param(params: Optional[dict]) -> Optional[str]:
+    """Name of the param holding a :class:`Base64File`, if any."""
+    for key, value in (params or {}).items():
+        if isinstance(value, Base64File):
+            return key
+    return None
+
+
+def _streamed_body(payload: dict) -> Tuple[Iterator[bytes], int]:
+    """Serialize ``payload`` with its Base64File param streamed; returns (body, length)."""
+    params = dict(payload["params"])
+    key = _stream_param(params)
+    stream: Base64File = params[key]
+    params[key] = _STREAM_PLACEHOLDER
+    head, tail = json.dumps({**payload, "params": params}).split(json.dumps(_STREAM_PLACEHOLDER))
+    head_bytes = (head + '"').encode("utf-8")
+    tail_bytes = ('"' + tail).encode("utf-8")
+
+    def body() -> Iterator[bytes]:
+        yield head_bytes
+        yield from stream.iter_encoded()
+        yield tail_bytes
+
+    return body(), len(head_bytes) + stream.encoded_length + len(tail_bytes)
+
+
+def _multi_params(calls: List[_QueuedCall]) -> dict:
+    """Build the params of a ``multi`` request for queued calls."""
+    actions = []
+    for action, params, _, _ in calls:
+        entry: Dict[str, Any] = {"action": action, "version": 5}
         if params is not None:
-            payload["params"] = params
-        
-        self._log_verbose(f"Invoking AnkiConnect action: {action}")
-        if self.verbose and params:
-            self._log_verbose(f"Parameters: {params}")
-        
-        with httpx.Client(timeout=self.timeout) as client:
-            resp = client.post(self.base_url, json=payload)
-            resp.raise_for_status()
-            data = resp.json()
-            if data.get("error") is not None:
-                raise RuntimeError(f"AnkiConnect error: {data['error']}")
-            
-            result = data.get("result")
-            self._log_verbose(f"Action {action} completed successfully")
+            if _stream_param(params) is not None:
+                # A multi request is one JSON document; streamed files are inlined
+                params = {k: v.read_encoded() if isinstance(v, Base64File) else v for k, v in params.items()}
+            entry["params"] = params
+        actions.append(entry)
+    return {"actions": actions}
+
+
+def _resolve(deferred: Deferred, transform: Optional[Callable[[Any], Any]], result: Any) -> None:
+    try:
+        deferred.set_result(transform(result) if transform else result)
+    except Exception as e:
+        deferred.set_error(e)
+
+
+def _deliver_multi(calls: List[_QueuedCall], replies: Optional[List[dict]]) -> None:
+    """Hand each ``multi`` reply to the deferred of the call it answers."""
+    replies = replies or []
+    if len(replies) != len(calls):
+        raise RuntimeError(f"AnkiConnect multi returned {len(replies)} results for {len(calls)} actions")
+    for (_, _, transform, deferred), reply in zip(calls, replies):
+        if reply.get("error") is not None:
+            deferred.set_error(RuntimeError(f"AnkiConnect error: {reply['error']}"))
+        else:
+            _resolve(deferred, transform, reply.get("result"))
+
+
+def _anki_note(note: Dict[str, Any]) -> Dict[str, Any]:
+    """AnkiConnect note object for a ``{"model", "deck", "fields", "tags"}`` dict."""
+    return {
+        "deckName": note["deck"],
+        "modelName": note["model"],
+        "fields": note["fields"],
+        "tags": note.get("tags", []),
+    }
+
+
+class AnkiConnectBatch(Batch):
+    """Batch that packs queued calls into chunked AnkiConnect ``multi`` requests.
+
+    Calls are sent in order, ``chunk_size`` actions per request. Each action's
+    result (or error) is delivered to the :class:`Deferred` returned for it, so
+    one failing action does not affect the others in the same request.
+    """
+
+    def __init__(self, backend: Backend, chunk_size: int, actions: Optional["AnkiConnectActions"] = None):
+        super().__init__(backend)
+        self.chunk_size = max(1, chunk_size)
+        # Object whose action methods are recorded into this batch
+        self.actions = actions if actions is not None else backend
+        self._queue: List[_QueuedCall] = []
+
+    def __getattr__(self, name: str) -> Callable[..., Deferred]:
+        method = getattr(self.actions, name)
+
+        def call(*args: Any, **kwargs: Any) -> Deferred:
+            self.actions._active_batch = self
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                self.actions._active_batch = None
+            if not isinstance(result, Deferred):
+                deferred = Deferred()
+                deferred.set_result(result)
+                return deferred
             return result
 
+        return call
+
+    def enqueue(self, action: str, params: Optional[dict], transform: Optional[Callable[[Any], Any]]) -> Deferred:
+        deferred = Deferred()
+        self._queue.append((action, params, transform, deferred))
+        if len(self._queue) >= self.chunk_size:
+            self._submit(self._take_chunk())
+        return deferred
+
+    def flush(self) -> None:
+        while self._queue:
+            self._submit(self._take_chunk())
+        self._wait()
+
+    def _take_chunk(self) -> List[_QueuedCall]:
+        chunk = self._queue[: self.chunk_size]
+        self._queue = self._queue[self.chunk_size :]
+        return chunk
+
+    def _submit(self, chunk: List[_QueuedCall]) -> None:
+        try:
+            self.backend._invoke_multi(chunk)
+        except Exception as e:
+            # Transport-level failure: nothing in this chunk or behind it was delivered
+            self._fail(chunk + self._queue, e)
+            self._queue = []
+            raise
+
+    def _wait(self) -> None:
+        pass
+
+    @staticmethod
+    def _fail(calls: List[_QueuedCall], error: BaseException) -> None:
+        for _, _, _, deferred in calls:
+            if not deferred.done:
+                deferred.set_error(error)
+
+
+class AnkiConnectActions:
+    """AnkiConnect actions shared by the sync and async backends.
+
+    Every method describes one action and hands it to ``_call``, which either
+    performs it (sync), returns an awaitable (async) or queues it in the
+    active batch.
+    """
+
+    verbose: bool = False
+    # Whether Anki can read media files from our filesystem by path
+    local_files: bool = False
+    # Records each request's actions, duration and size when set (--profile)
+    profiler: Optional[Profiler] = None
+
+    @property
+    def _active_batch(self) -> Optional[AnkiConnectBatch]:
+        """Batch recording calls made on the current thread, if any.
+
+        Thread-local, so threads applying independent parts of a plan each
+        queue into their own batch.
+        """
+        return getattr(self._batch_context(), "batch", None)
+
+    @_active_batch.setter
+    def _active_batch(self, batch: Optional[AnkiConnectBatch]) -> None:
+        self._batch_context().batch = batch
+
+    def _batch_context(self) -> threading.local:
+        context = self.__dict__.get("_batch_local")
+        if context is None:
+            context = self.__dict__.setdefault("_batch_local", threading.local())
+        return context
+
+    def _log_verbose(self, message: str, *args: Any) -> None:
+        """Log message if verbose mode is enabled; ``args`` are formatted only when it is emitted."""
+        if self.verbose:
+            logger.debug(message, *args)
+
+    def _call(self, action: str, params: Optional[dict] = None, transform: Optional[Callable[[Any], Any]] = None) -> Any:
+        raise NotImplementedError
+
+    def _profile_request(self, action: str, params: Optional[dict], started: float, resp: httpx.Response) -> None:
+        if self.profiler is None:
+            return
+        actions = [a["action"] for a in params["actions"]] if action == "multi" and params else [action]
+        sent = int(resp.request.headers.get("Content-Length") or 0)
+        self.profiler.record_request(actions, started, sent, len(resp.content))
+
     # Decks
     def list_decks(self) -> List[str]:
         self._log_verbose("Listing all decks")
-        result = list(self._invoke("deckNames") or [])
-        self._log_verbose(f"Found {len(result)} decks")
-        return result
+
+        def done(result: Any) -> List[str]:
+            names = list(result or [])
+            self._log_verbose("Found %s decks", len(names))
+            return names
+
+        return self._call("deckNames", transform=done)
 
     def create_deck(self, name: str) -> None:
-        self._log_verbose(f"Creating deck '{name}'")
-        self._invoke("createDeck", {"deck": name})
-        self._log_verbose(f"Deck '{name}' created successfully")
+        self._log_verbose("Creating deck '%s'", name)
+        return self._call("createDeck", {"deck": name})
 
     def delete_decks(self, names: List[str], cards_too: bool = False) -> None:
-        self._log_verbose(f"Deleting {len(names)} deck(s): {names} (cards_too={cards_too})")
-        self._invoke("deleteDecks", {"decks": names, "cardsToo": cards_too})
-        self._log_verbose(f"Deck deletion completed")
+        self._log_verbose("Deleting %s deck(s): %s (cards_too=%s)", len(names), names, cards_too)
+        return self._call("deleteDecks", {"decks": names, "cardsToo": cards_too})
 
     # Models
     def list_models(self) -> List[str]:
         self._log_verbose("Listing all models")
-        result = list(self._invoke("modelNames") or [])
-        self._log_verbose(f"Found {len(result)} models")
-        return result
+
+        def done(result: Any) -> List[str]:
+            names = list(result or [])
+            self._log_verbose("Found %s models", len(names))
+            return names
+
+        return self._call("modelNames", transform=done)
 
     def model_field_names(self, model_name: str) -> List[str]:
-        self._log_verbose(f"Getting field names for model '{model_name}'")
-        result = list(self._invoke("modelFieldNames", {"modelName": model_name}) or [])
-        self._log_verbose(f"Model '{model_name}' has {len(result)} fields: {result}")
-        return result
+        self._log_verbose("Getting field names for model '%s'", model_name)
+
+        def done(result: Any) -> List[str]:
+            names = list(result or [])
+            self._log_verbose("Model '%s' has %s fields: %s", model_name, len(names), names)
+            return names
+
+        return self._call("modelFieldNames", {"modelName": model_name}, done)
 
     def create_model(self, name: str, fields: List[str], templates: List[Dict[str, str]], css: str, is_cloze: bool = False) -> None:
         # anki-connect expects templates array of {Name, Front, Back}
@@ -81,17 +296,24 @@ class AnkiConnectBackend(Backend):
         if is_cloze:
             params["isCloze"] = True
 
-        self._log_verbose(f"Creating model '{name}' with {len(fields)} fields, {len(templates)} templates, is_cloze={is_cloze}")
+        self._log_verbose("Creating model '%s' with %s fields, %s templates, is_cloze=%s", name, len(fields), len(templates), is_cloze)
         
         try:
-            result = self._invoke("createModel", params)
-            self._log_verbose(f"Model '{name}' created successfully")
+            return self._call("createModel", params)
         except Exception as e:
-            self._log_verbose(f"Model creation failed: {e}")
+            self._log_verbose("Model creation failed: %s", e)
             raise
 
+    def model_templates(self, name: str) -> Dict[str, Dict[str, str]]:
+        self._log_verbose("Getting templates for model '%s'", name)
+        return self._call("modelTemplates", {"modelName": name}, lambda result: dict(result or {}))
+
+    def model_styling(self, name: str) -> str:
+        self._log_verbose("Getting CSS styling for model '%s'", name)
+        return self._call("modelStyling", {"modelName": name}, lambda result: (result or {}).get("css", ""))
+
     def update_model_templates(self, name: str, templates: List[Dict[str, str]]) -> None:
-        self._log_verbose(f"Updating templates for model '{name}' ({len(templates)} templates)")
+        self._log_verbose("Updating templates for model '%s' (%s templates)", name, len(templates))
         # Convert our template format to AnkiConnect's expected format
         # Our format: [{"name": "Card 1", "qfmt": "...", "afmt": "..."}]
         # AnkiConnect format: {"Card 1": {"Front": "...", "Back": "..."}}
@@ -102,7 +324,7 @@ class AnkiConnectBackend(Backend):
                 "Back": t["afmt"]
             }
 
-        self._invoke(
+        return self._call(
             "updateModelTemplates",
             {
                 "model": {
@@ -111,11 +333,10 @@ class AnkiConnectBackend(Backend):
                 }
             },
         )
-        self._log_verbose(f"Templates for model '{name}' updated successfully")
 
     def update_model_styling(self, name: str, css: str) -> None:
-        self._log_verbose(f"Updating CSS styling for model '{name}'")
-        self._invoke(
+        self._log_verbose("Updating CSS styling for model '%s'", name)
+        return self._call(
             "updateModelStyling",
             {
                 "model": {
@@ -124,16 +345,14 @@ class AnkiConnectBackend(Backend):
                 }
             }
         )
-        self._log_verbose(f"CSS styling for model '{name}' updated successfully")
 
     def delete_model(self, name: str) -> None:
-        self._log_verbose(f"Deleting model '{name}'")
-        self._invoke("deleteModel", {"model": name})
-        self._log_verbose(f"Model '{name}' deleted successfully")
+        self._log_verbose("Deleting model '%s'", name)
+        return self._call("deleteModel", {"model": name})
 
     # Notes
     def find_notes(self, query: str) -> List[int]:
-        return list(self._invoke("findNotes", {"query": query}) or [])
+        return self._call("findNotes", {"query": query}, lambda result: list(result or []))
 
     def add_note(self, model: str, deck: str, fields: Dict[str, str], tags: List[str]) -> int:
         note_data = {
@@ -146,44 +365,187 @@ class AnkiConnectBackend(Backend):
             }
         }
 
-        self._log_verbose(f"Adding note to model '{model}' in deck '{deck}' with {len(fields)} fields")
-        
-        try:
-            nid = self._invoke("addNote", note_data)
-            self._log_verbose(f"Note created successfully with ID: {nid}")
+        self._log_verbose("Adding note to model '%s' in deck '%s' with %s fields", model, deck, len(fields))
+
+        def done(nid: Any) -> int:
+            self._log_verbose("Note created successfully with ID: %s", nid)
             return int(nid)
+
+        try:
+            return self._call("addNote", note_data, done)
         except Exception as e:
-            self._log_verbose(f"Note creation failed: {e}")
+            self._log_verbose("Note creation failed: %s", e)
             raise
 
+    def add_notes(self, notes: List[Dict[str, Any]]) -> List[Optional[int]]:
+        self._log_verbose("Adding %s notes", len(notes))
+
+        def done(result: Any) -> List[Optional[int]]:
+            ids = [int(nid) if nid is not None else None for nid in result or []]
+            self._log_verbose("Created %s of %s notes", sum(nid is not None for nid in ids), len(notes))
+            return ids
+
+        return self._call("addNotes", {"notes": [_anki_note(n) for n in notes]}, done)
+
+    def can_add_notes(self, notes: List[Dict[str, Any]]) -> List[Optional[str]]:
+        def done(result: Any) -> List[Optional[str]]:
+            return [None if r.get("canAdd") else str(r.get("error") or "cannot be added") for r in result or []]
+
+        return self._call("canAddNotesWithErrorDetail", {"notes": [_anki_note(n) for n in notes]}, done)
+
     def update_note_fields(self, note_id: int, fields: Dict[str, str]) -> None:
-        self._invoke("updateNoteFields", {"note": {"id": note_id, "fields": fields}})
+        return self._call("updateNoteFields", {"note": {"id": note_id, "fields": fields}})
 
     def delete_notes(self, ids: List[int]) -> None:
-        self._invoke("deleteNotes", {"notes": ids})
+        return self._call("deleteNotes", {"notes": ids})
 
     def notes_info(self, ids: List[int]):
-        return list(self._invoke("notesInfo", {"notes": ids}) or [])
+        return self._call("notesInfo", {"notes": ids}, lambda result: list(result or []))
 
     # Media
     def store_media_file(self, filename: str, data: bytes) -> str:
         """Store a media file in Anki's media collection."""
         encoded_data = base64.b64encode(data).decode('utf-8')
-        result = self._invoke("storeMediaFile", {
+        return self._call("storeMediaFile", {
             "filename": filename,
             "data": encoded_data
-        })
-        return str(result)
+        }, str)
+
+    def store_media_path(self, filename: str, path: Path) -> str:
+        """Store a local file without reading it into memory.
+
+        Anki reads the file itself when it runs on this machine; otherwise the
+        file is streamed base64-encoded in the request body.
+        """
+        path = Path(path)
+        if self.local_files:
+            self._log_verbose("Storing media file '%s' from path %s", filename, path)
+            params = {"filename": filename, "path": str(path.resolve())}
+        else:
+            data = Base64File(path)
+            self._log_verbose("Streaming media file '%s' (%s bytes)", filename, data.size)
+            params = {"filename": filename, "data": data}
+        return self._call("storeMediaFile", params, str)
+
+    def store_media_url(self, filename: str, url: str) -> str:
+        """Have Anki download a media file from a URL."""
+        self._log_verbose("Storing media file '%s' from %s", filename, url)
+        return self._call("storeMediaFile", {"filename": filename, "url": url}, str)
 
     def get_media_files_names(self, pattern: str = "*") -> List[str]:
         """Get list of media filenames matching pattern."""
-        return list(self._invoke("getMediaFilesNames", {"pattern": pattern}) or [])
+        return self._call("getMediaFilesNames", {"pattern": pattern}, lambda result: list(result or []))
 
     def retrieve_media_file(self, filename: str) -> bytes:
         """Retrieve a media file's content."""
-        encoded_data = self._invoke("retrieveMediaFile", {"filename": filename})
-        return base64.b64decode(encoded_data)
+        return self._call("retrieveMediaFile", {"filename": filename}, base64.b64decode)
 
     def delete_media_file(self, filename: str) -> None:
         """Delete a media file from Anki's collection."""
-        self._invoke("deleteMediaFile", {"filename": filename})
+        return self._call("deleteMediaFile", {"filename": filename})
+
+
+class AnkiConnectBackend(AnkiConnectActions, Backend):
+    def __init__(
+        self,
+        base_url: str = "http://127.0.0.1:8765",
+        timeout: int = 30,
+        verbose: bool = False,
+        batch_size: int = 100,
+        connect_timeout: Optional[float] = None,
+        max_connections: int = 10,
+        max_keepalive_connections: int = 5,
+        keepalive_expiry: float = 30.0,
+        local_files: Optional[bool] = None,
+        profiler: Optional[Profiler] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.verbose = verbose
+        if verbose:
+            enable_verbose()
+        self.batch_size = batch_size
+        self.connect_timeout = connect_timeout
+        self.local_files = is_local_url(self.base_url) if local_files is None else local_files
+        self.profiler = profiler
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._client: Optional[httpx.Client] = None
+        self._client_lock = threading.Lock()
+
+    def _get_client(self) -> httpx.Client:
+        """Return the pooled keep-alive client, opening it on first use."""
+        with self._client_lock:
+            if self._client is None:
+                timeout = httpx.Timeout(self.timeout, connect=self.connect_timeout or self.timeout)
+                self._log_verbose("Opening HTTP session to %s", self.base_url)
+                self._client = httpx.Client(timeout=timeout, limits=self.limits)
+            return self._client
+
+    def close(self) -> None:
+        """Close the HTTP session; the next call opens a new one."""
+        if self._client is not None:
+            self._log_verbose("Closing HTTP session")
+            self._client.close()
+            self._client = None
+
+    def _invoke(self, action: str, params: Optional[dict] = None) -> Any:
+        payload = {"action": action, "version": 5}
+        if params is not None:
+            payload["params"] = params
+        
+        self._log_verbose("Invoking AnkiConnect action: %s", action)
+        if self.verbose and params:
+            self._log_verbose("Parameters: %s", LogPayload(params, logger))
+
+        started = time.perf_counter()
+        if _stream_param(params) is not None:
+            body, length = _streamed_body(payload)
+            headers = {"Content-Type": "application/json", "Content-Length": str(length)}
+            resp = self._get_client().post(self.base_url, content=body, headers=headers)
+        else:
+            resp = self._get_client().post(self.base_url, json=payload)
+        self._profile_request(action, params, started, resp)
+        resp.raise_for_status()
+        data = resp.json()
+        if data.get("error") is not None:
+            raise RuntimeError(f"AnkiConnect error: {data['error']}")
+
+        result = data.get("result")
+        self._log_verbose("Action %s completed successfully", action)
+        return result
+
+    def _invoke_multi(self, calls: List[_QueuedCall]) -> None:
+        """Send queued calls in one ``multi`` request and resolve their deferreds."""
+        if len(calls) == 1:
+            action, params, transform, deferred = calls[0]
+            try:
+                result = self._invoke(action, params)
+            except httpx.HTTPError:
+                raise
+            except Exception as e:
+                deferred.set_error(e)
+                return
+            _resolve(deferred, transform, result)
+            return
+
+        self._log_verbose("Sending %s batched actions via multi", len(calls))
+        _deliver_multi(calls, self._invoke("multi", _multi_params(calls)))
+
+    def _call(self, action: str, params: Optional[dict] = None, transform: Optional[Callable[[Any], Any]] = None) -> Any:
+        """Invoke an action now, or queue it when called through an active batch."""
+        if self._active_batch is not None:
+            return self._active_batch.enqueue(action, params, transform)
+        result = self._invoke(action, params)
+        return transform(result) if transform else result
+
+    @contextmanager
+    def batch(self, chunk_size: Optional[int] = None) -> Iterator[AnkiConnectBatch]:
+        b = AnkiConnectBatch(self, chunk_size or self.batch_size)
+        try:
+            yield b
+        finally:
+            b.flush()
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Coroutine, Iterator, List, Optional, Tuple
+
+import httpx
+
+from .ankiconnect import (
+    AnkiConnectActions,
+    AnkiConnectBatch,
+    logger,
+    _QueuedCall,
+    _deliver_multi,
+    _multi_params,
+    _resolve,
+    _stream_param,
+    _streamed_body,
+    is_local_url,
+)
+from .base import Backend
+from ..log import LogPayload, enable_verbose
+from ..profile import Profiler
+
+
+class AsyncAnkiConnectBackend(AnkiConnectActions):
+    """AnkiConnect backend built on ``httpx.AsyncClient``.
+
+    Has the same methods as :class:`~ankiday.backends.base.Backend`, but each
+    one returns an awaitable. At most ``concurrency`` requests are in flight at
+    once: Anki still executes actions one at a time, but network transfer and
+    JSON (de)serialization of concurrent requests overlap.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://127.0.0.1:8765",
+        timeout: int = 30,
+        verbose: bool = False,
+        batch_size: int = 100,
+        concurrency: int = 4,
+        connect_timeout: Optional[float] = None,
+        keepalive_expiry: float = 30.0,
+        local_files: Optional[bool] = None,
+        profiler: Optional[Profiler] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.verbose = verbose
+        if verbose:
+            enable_verbose()
+        self.batch_size = batch_size
+        self.concurrency = max(1, concurrency)
+        self.connect_timeout = connect_timeout
+        self.local_files = is_local_url(self.base_url) if local_files is None else local_files
+        self.profiler = profiler
+        self.limits = httpx.Limits(
+            max_connections=self.concurrency,
+            max_keepalive_connections=self.concurrency,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        # Created on first use so they bind to the loop that runs the requests
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            timeout = httpx.Timeout(self.timeout, connect=self.connect_timeout or self.timeout)
+            self._log_verbose("Opening async HTTP session to %s (concurrency=%s)", self.base_url, self.concurrency)
+            self._client = httpx.AsyncClient(timeout=timeout, limits=self.limits)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the HTTP session; the next call opens a new one."""
+        if self._client is not None:
+            self._log_verbose("Closing async HTTP session")
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
+
+    async def __aenter__(self) -> "AsyncAnkiConnectBackend":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def _ainvoke(self, action: str, params: Optional[dict] = None) -> Any:
+        payload = {"action": action, "version": 5}
+        if params is not None:
+            payload["params"] = params
+
+        self._log_verbose("Invoking AnkiConnect action: %s", action)
+        if self.verbose and params:
+            self._log_verbose("Parameters: %s", LogPayload(params, logger))
+
+        client = self._get_client()
+        async with self._semaphore:
+            started = time.perf_counter()
+            if _stream_param(params) is not None:
+                body, length = _streamed_body(payload)
+                headers = {"Content-Type": "application/json", "Content-Length": str(length)}
+                resp = await client.post(self.base_url, content=_aiter(body), headers=headers)
+            else:
+                resp = await client.post(self.base_url, json=payload)
+        self._profile_request(action, params, started, resp)
+        resp.raise_for_status()
+        data = resp.json()
+        if data.get("error") is not None:
+            raise RuntimeError(f"AnkiConnect error: {data['error']}")
+
+        result = data.get("result")
+        self._log_verbose("Action %s completed successfully", action)
+        return result
+
+    async def _ainvoke_multi(self, calls: List[_QueuedCall]) -> None:
+        """Send queued calls in one ``multi`` request and resolve their deferreds."""
+        if len(calls) == 1:
+            action, params, transform, deferred = calls[0]
+            try:
+                result = await self._ainvoke(action, params)
+            except httpx.HTTPError:
+                raise
+            except Exception as e:
+                deferred.set_error(e)
+                return
+            _resolve(deferred, transform, result)
+            return
+
+        self._log_verbose("Sending %s batched actions via multi", len(calls))
+        _deliver_multi(calls, await self._ainvoke("multi", _multi_params(calls)))
+
+    def _call(self, action: str, params: Optional[dict] = None, transform: Optional[Callable[[Any], Any]] = None) -> Any:
+        """Return an awaitable for the action, or queue it when called through an active batch."""
+        if self._active_batch is not None:
+            return self._active_batch.enqueue(action, params, transform)
+        return self._run_call(action, params, transform)
+
+    async def _run_call(self, action: str, params: Optional[dict], transform: Optional[Callable[[Any], Any]]) -> Any:
+        result = await self._ainvoke(action, params)
+        return transform(result) if transform else result
+
+
+async def _aiter(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+class ConcurrentBatch(AnkiConnectBatch):
+    """Batch whose ``multi`` chunks are sent concurrently instead of one after another.
+
+    Use it only for calls that do not depend on each other's order.
+    """
+
+    def __init__(self, backend: "ConcurrentAnkiConnectBackend", chunk_size: int):
+        super().__init__(backend, chunk_size, actions=backend.async_backend)
+        self._in_flight: List[Tuple[List[_QueuedCall], Future]] = []
+
+    def _submit(self, chunk: List[_QueuedCall]) -> None:
+        self._in_flight.append((chunk, self.backend._submit(self.actions._ainvoke_multi(chunk))))
+
+    def _wait(self) -> None:
+        in_flight, self._in_flight = self._in_flight, []
+        first_error: Optional[BaseException] = None
+        for chunk, future in in_flight:
+            try:
+                future.result()
+            except Exception as e:
+                self._fail(chunk, e)
+                first_error = first_error or e
+        if first_error is not None:
+            raise first_error
+
+
+class ConcurrentAnkiConnectBackend(Backend):
+    """Synchronous :class:`Backend` driving an :class:`AsyncAnkiConnectBackend`.
+
+    The async backend runs on a private event loop thread. Direct calls block
+    until their request completes; calls queued through :meth:`batch` are sent
+    as concurrent ``multi`` chunks, so ``Planner`` and ``Applier`` overlap their
+    reads and uploads without being async themselves.
+    """
+
+    def __init__(self, async_backend: AsyncAnkiConnectBackend):
+        self.async_backend = async_backend
+        self.verbose = async_backend.verbose
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="ankiday-async-backend", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def _submit(self, coro: Coroutine[Any, Any, Any]) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def _run(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        return self._submit(coro).result()
+
+    def close(self) -> None:
+        if self._loop is None:
+            return
+        try:
+            self._run(self.async_backend.aclose())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+
+    @contextmanager
+    def batch(self, chunk_size: Optional[int] = None) -> Iterator[ConcurrentBatch]:
+        b = ConcurrentBatch(self, chunk_size or self.async_backend.batch_size)
+        try:
+            yield b
+        finally:
+            b.flush()
+
+
+def _blocking(name: str) -> Callable[..., Any]:
+    def method(self: ConcurrentAnkiConnectBackend, *args: Any, **kwargs: Any) -> Any:
+        return self._run(getattr(self.async_backend, name)(*args, **kwargs))
+
+    method.__name__ = name
+    method.__doc__ = f"Blocking call to ``AsyncAnkiConnectBackend.{name}``."
+    return method
+
+
+# Every backend operation becomes a blocking call on the background loop
+for _name, _value in vars(Backend).items():
+    if callable(_value) and not _name.startswith("_") and _name not in ("batch", "close"):
+        setattr(ConcurrentAnkiConnectBackend, _name, _blocking(_name))
@@ -1,10 +1,112 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+class AddedNotes(List[Optional[int]]):
+    """Ids returned by :meth:`Backend.add_notes`, with why each refused note was refused.
+
+    ``errors`` holds one entry per note, None for notes that were added.
+    Backends that cannot tell (AnkiConnect's ``addNotes``) return a plain list.
+    """
+
+    def __init__(self, ids: List[Optional[int]], errors: List[Optional[str]]):
+        super().__init__(ids)
+        self.errors = errors
+
+
+class Deferred:
+    """Result of a backend call queued inside a batch.
+
+    The value (or error) becomes available once the batch has been flushed.
+    """
+
+    __slots__ = ("_done", "_value", "_error")
+
+    def __init__(self) -> None:
+        self._done = False
+        self._value: Any = None
+        self._error: Optional[BaseException] = None
+
+    def set_result(self, value: Any) -> None:
+        self._value = value
+        self._done = True
+
+    def set_error(self, error: BaseException) -> None:
+        self._error = error
+        self._done = True
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        return self._error
+
+    def result(self) -> Any:
+        if not self._done:
+            raise RuntimeError("Batched call has not been flushed yet")
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class Batch:
+    """Queue of backend calls.
+
+    Calling a backend method through the batch (``batch.create_deck("X")``)
+    returns a :class:`Deferred`. This default implementation runs every call
+    immediately; backends that can pack several calls into one request
+    override it.
+    """
+
+    def __init__(self, backend: "Backend") -> None:
+        self.backend = backend
+
+    def __getattr__(self, name: str) -> Callable[..., Deferred]:
+        method = getattr(self.backend, name)
+
+        def call(*args: Any, **kwargs: Any) -> Deferred:
+            deferred = Deferred()
+            try:
+                deferred.set_result(method(*args, **kwargs))
+            except Exception as e:
+                deferred.set_error(e)
+            return deferred
+
+        return call
+
+    def flush(self) -> None:
+        pass
 
 
 class Backend:
-    """Abstract backend interface."""
+    """Abstract backend interface.
+
+    Backends are context managers; leaving the block releases any open
+    connection or file handle via :meth:`close`.
+    """
+
+    def __enter__(self) -> "Backend":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        pass
+
+    @contextmanager
+    def batch(self, chunk_size: Optional[int] = None) -> Iterator[Batch]:
+        """Group backend calls; queued calls are flushed when the block exits."""
+        b = Batch(self)
+        try:
+            yield b
+        finally:
+            b.flush()
 
     # Decks
     def list_decks(self) -> List[str]:
@@ -33,6 +135,13 @@ class Backend:
     ) -> None:
         raise NotImplementedError
 
+    def model_templates(self, name: str) -> Dict[str, Dict[str, str]]:
+        """Current templates as ``{template name: {"Front": ..., "Back": ...}}``."""
+        raise NotImplementedError
+
+    def model_styling(self, name: str) -> str:
+        raise NotImplementedError
+
     def update_model_templates(self, name: str, templates: List[Dict[str, str]]) -> None:
         raise NotImplementedError
 
@@ -49,6 +158,28 @@ class Backend:
     def add_note(self, model: str, deck: str, fields: Dict[str, str], tags: List[str]) -> int:
         raise NotImplementedError
 
+    def add_notes(self, notes: List[Dict[str, Any]]) -> List[Optional[int]]:
+        """Add notes given as ``{"model", "deck", "fields", "tags"}`` dicts.
+
+        Returns the new ids in input order, None for notes Anki refused, as
+        :class:`AddedNotes` when the reasons are known. Backends with a bulk
+        action override this.
+        """
+        ids: List[Optional[int]] = []
+        errors: List[Optional[str]] = []
+        for n in notes:
+            try:
+                ids.append(self.add_note(n["model"], n["deck"], n["fields"], n.get("tags", [])))
+                errors.append(None)
+            except Exception as e:
+                ids.append(None)
+                errors.append(str(e))
+        return AddedNotes(ids, errors)
+
+    def can_add_notes(self, notes: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """Why each note could not be added (e.g. a duplicate), None for notes that can."""
+        return [None] * len(notes)
+
     def update_note_fields(self, note_id: int, fields: Dict[str, str]) -> None:
         raise NotImplementedError
 
@@ -62,6 +193,13 @@ class Backend:
     def store_media_file(self, filename: str, data: bytes) -> str:
         raise NotImplementedError
 
+    def store_media_path(self, filename: str, path: Path) -> str:
+        """Store a local file. Backends that can avoid loading it into memory override this."""
+        return self.store_media_file(filename, Path(path).read_bytes())
+
+    def store_media_url(self, filename: str, url: str) -> str:
+        raise NotImplementedError
+
     def get_media_files_names(self, pattern: str = "*") -> List[str]:
         raise NotImplementedError
 
@@ -0,0 +1,803 @@
+from __future__ import annotations
+
+import hashlib
+import html
+import json
+import os
+import random
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import httpx
+
+from .base import AddedNotes, Backend, Batch, Deferred
+from .search import parse_search
+from ..log import enable_verbose, get_logger
+
+logger = get_logger("collection")
+
+# Legacy collection schema written by Anki 2.1 before its Rust storage layer,
+# and still read and imported by every Anki version
+SCHEMA_VERSION = 11
+DEFAULT_DECK_ID = 1
+DEFAULT_CONF_ID = 1
+FIELD_SEPARATOR = "\x1f"
+
+_SCHEMA = """
+CREATE TABLE col (
+    id integer primary key, crt integer not null, mod integer not null, scm integer not null,
+    ver integer not null, dty integer not null, usn integer not null, ls integer not null,
+    conf text not null, models text not null, decks text not null, dconf text not null, tags text not null
+);
+CREATE TABLE notes (
+    id integer primary key, guid text not null, mid integer not null, mod integer not null,
+    usn integer not null, tags text not null, flds text not null, sfld integer not null,
+    csum integer not null, flags integer not null, data text not null
+);
+CREATE TABLE cards (
+    id integer primary key, nid integer not null, did integer not null, ord integer not null,
+    mod integer not null, usn integer not null, type integer not null, queue integer not null,
+    due integer not null, ivl integer not null, factor integer not null, reps integer not null,
+    lapses integer not null, left integer not null, odue integer not null, odid integer not null,
+    flags integer not null, data text not null
+);
+CREATE TABLE revlog (
+    id integer primary key, cid integer not null, usn integer not null, ease integer not null,
+    ivl integer not null, lastIvl integer not null, factor integer not null, time integer not null,
+    type integer not null
+);
+CREATE TABLE graves (usn integer not null, oid integer not null, type integer not null);
+CREATE INDEX ix_notes_usn on notes (usn);
+CREATE INDEX ix_cards_usn on cards (usn);
+CREATE INDEX ix_revlog_usn on revlog (usn);
+CREATE INDEX ix_cards_nid on cards (nid);
+CREATE INDEX ix_cards_sched on cards (did, queue, due);
+CREATE INDEX ix_revlog_cid on revlog (cid);
+CREATE INDEX ix_notes_csum on notes (csum);
+"""
+
+_LATEX_PRE = (
+    "\\documentclass[12pt]{article}\n\\special{papersize=3in,5in}\n\\usepackage[utf8]{inputenc}\n"
+    "\\usepackage{amssymb,amsmath}\n\\pagestyle{empty}\n\\setlength{\\parindent}{0in}\n\\begin{document}\n"
+)
+
+_DECK_CONF = {
+    "id": DEFAULT_CONF_ID, "name": "Default", "mod": 0, "usn": 0, "maxTaken": 60, "autoplay": True,
+    "timer": 0, "replayq": True, "dyn": False,
+    "new": {"delays": [1, 10], "ints": [1, 4, 7], "initialFactor": 2500, "order": 1, "perDay": 20, "bury": False},
+    "rev": {"perDay": 200, "ease4": 1.3, "ivlFct": 1, "maxIvl": 36500, "hardFactor": 1.2, "bury": False},
+    "lapse": {"delays": [10], "mult": 0, "minInt": 1, "leechFails": 8, "leechAction": 1},
+}
+
+_COL_CONF = {
+    "activeDecks": [DEFAULT_DECK_ID], "curDeck": DEFAULT_DECK_ID, "newSpread": 0, "collapseTime": 1200,
+    "timeLim": 0, "estTimes": True, "dueCounts": True, "curModel": None, "nextPos": 1,
+    "sortType": "noteFld", "sortBackwards": False, "addToCur": True, "schedVer": 2,
+}
+
+_GUID_CHARS = (
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!#$%&()*+,-./:;<=>?@[]^_`{|}~"
+)
+_REF = re.compile(r"{{\s*([#^/]?)\s*([^}]+?)\s*}}")
+_SECTION = re.compile(r"{{\s*([#^])\s*([^}]+?)\s*}}(.*?){{\s*/\s*\2\s*}}", re.DOTALL)
+_CLOZE = re.compile(r"{{c(\d+)::", re.IGNORECASE)
+_SPECIAL_FIELDS = {"FrontSide", "Tags", "Type", "Deck", "Subdeck", "Card", "CardFlag"}
+
+
+def guid64(num: Optional[int] = None) -> str:
+    """Note GUID, base91-encoded like Anki's; random unless ``num`` is given."""
+    if num is None:
+        num = random.getrandbits(64)
+    chars = []
+    while num:
+        num, rem = divmod(num, len(_GUID_CHARS))
+        chars.append(_GUID_CHARS[rem])
+    return "".join(reversed(chars)) or _GUID_CHARS[0]
+
+
+def stable_guid(*parts: str) -> str:
+    """GUID derived from ``parts``, so the same note gets the same GUID on every build."""
+    digest = hashlib.sha1(FIELD_SEPARATOR.join(parts).encode("utf-8")).digest()
+    return guid64(int.from_bytes(digest[:8], "big"))
+
+
+def stable_id(kind: str, name: str) -> int:
+    """Deck or model id derived from its name, so the same name gets the same id on every build."""
+    digest = hashlib.sha1(f"{kind}{FIELD_SEPARATOR}{name}".encode("utf-8")).digest()
+    # 48 bits: never 0 or 1 in practice, and well within the integers JSON tools read exactly
+    return int.from_bytes(digest[:6], "big") + 2
+
+
+def strip_html_media(text: str) -> str:
+    """Field text without markup, keeping image filenames (Anki's stripHTMLMedia)."""
+    text = re.sub(r"(?i)<img[^>]+src=[\"']?([^\"'>]+)[\"']?[^>]*>", r" \1 ", text)
+    text = re.sub(r"(?is)<!--.*?-->|<style.*?>.*?</style>|<script.*?>.*?</script>", "", text)
+    text = re.sub(r"<.*?>", "", text)
+    return html.unescape(text.replace("&nbsp;", " ")).strip()
+
+
+def field_checksum(first_field: str) -> int:
+    """``notes.csum``: first 8 hex digits of the SHA-1 of the stripped first field."""
+    return int(hashlib.sha1(strip_html_media(first_field).encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _template_fields(qfmt: str) -> Set[str]:
+    """Fields whose content can make a question non-empty."""
+    names = set()
+    for kind, ref in _REF.findall(qfmt):
+        if kind in ("^", "/"):
+            continue
+        name = ref.rsplit(":", 1)[-1].strip()
+        if name not in _SPECIAL_FIELDS:
+            names.add(name)
+    return names
+
+
+def _question_nonempty(qfmt: str, fields: Dict[str, str]) -> bool:
+    """Whether the question renders with some field content, as Anki requires for a card."""
+    previous = None
+    while previous != qfmt:
+        previous = qfmt
+        qfmt = _SECTION.sub(
+            lambda m: m.group(3) if (m.group(1) == "#") == bool(strip_html_media(fields.get(m.group(2), ""))) else "",
+            qfmt,
+        )
+    return any(strip_html_media(fields.get(name, "")) for name in _template_fields(qfmt))
+
+
+def create_collection(path: Path) -> Path:
+    """Create an empty schema-11 collection with the Default deck."""
+    path = Path(path)
+    if path.exists():
+        raise FileExistsError(f"Collection already exists: {path}")
+    now = int(time.time())
+    deck = _deck_json(DEFAULT_DECK_ID, "Default", now)
+    conn = sqlite3.connect(str(path))
+    try:
+        conn.executescript(_SCHEMA)
+        conn.execute(
+            "INSERT INTO col VALUES (1, ?, ?, ?, ?, 0, 0, 0, ?, '{}', ?, ?, '{}')",
+            (
+                now - now % 86400,
+                now * 1000,
+                now * 1000,
+                SCHEMA_VERSION,
+                json.dumps(_COL_CONF),
+                json.dumps({str(DEFAULT_DECK_ID): deck}),
+                json.dumps({str(DEFAULT_CONF_ID): _DECK_CONF}),
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+
+def _deck_json(did: int, name: str, now: int) -> Dict[str, Any]:
+    return {
+        "id": did, "name": name, "mod": now, "usn": -1, "desc": "", "dyn": 0, "conf": DEFAULT_CONF_ID,
+        "collapsed": False, "browserCollapsed": False, "extendNew": 0, "extendRev": 0,
+        "newToday": [0, 0], "revToday": [0, 0], "lrnToday": [0, 0], "timeToday": [0, 0],
+    }
+
+
+class CollectionBatch(Batch):
+    """Batch running every call inside one SQLite transaction.
+
+    Each call gets a savepoint, so a failing call is rolled back on its own
+    and reported through its :class:`Deferred`; the transaction commits when
+    the batch is flushed.
+    """
+
+    def __init__(self, backend: "CollectionBackend"):
+        super().__init__(backend)
+        backend._lock.acquire()
+        self._open = True
+        try:
+            self._owner = backend._begin()
+        except BaseException:
+            backend._lock.release()
+            raise
+
+    def __getattr__(self, name: str) -> Callable[..., Deferred]:
+        method = getattr(self.backend, name)
+
+        def call(*args: Any, **kwargs: Any) -> Deferred:
+            deferred = Deferred()
+            try:
+                with self.backend._savepoint():
+                    deferred.set_result(method(*args, **kwargs))
+            except Exception as e:
+                deferred.set_error(e)
+            return deferred
+
+        return call
+
+    def flush(self) -> None:
+        if not self._open:
+            return
+        self._open = False
+        try:
+            if self._owner:
+                self.backend._commit()
+        finally:
+            self.backend._lock.release()
+
+
+class CollectionBackend(Backend):
+    """Backend writing directly to a closed ``collection.anki2`` file (schema 11).
+
+    Anki must not have the collection open. Notes, cards and deck/model JSON
+    are written with set-based SQL; a batch is one transaction, and each
+    direct call commits on its own. New cards are generated the way Anki does
+    for standard (one per template with a non-empty question) and cloze
+    (one per cloze number) models. Media goes to the ``collection.media``
+    folder next to the file.
+    """
+
+    def __init__(self, path: Path, verbose: bool = False, stable_ids: bool = False):
+        self.path = Path(path)
+        self.verbose = verbose
+        # New decks and models get ids derived from their names instead of the clock
+        self.stable_ids = stable_ids
+        if verbose:
+            enable_verbose()
+        if not self.path.exists():
+            raise FileNotFoundError(f"Collection not found: {self.path}")
+        self.media_dir = self.path.with_name(self.path.stem + ".media")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._in_transaction = False
+        self._savepoints = 0
+        self._col: Dict[str, Any] = {}
+        # One writer at a time: a batch holds the connection until it is flushed
+        self._lock = threading.RLock()
+
+    def _log_verbose(self, message: str, *args: Any) -> None:
+        """Log message if verbose mode is enabled."""
+        if self.verbose:
+            logger.debug(message, *args)
+
+    # Connection and transactions
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return self._ensure_open()
+
+    def _ensure_open(self) -> sqlite3.Connection:
+        """Open the collection and load its deck and model JSON on first use."""
+        if self._conn is not None:
+            return self._conn
+        with self._lock:
+            if self._conn is None:
+                self._log_verbose("Opening collection %s", self.path)
+                conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False)
+                ver = conn.execute("SELECT ver FROM col").fetchone()[0]
+                if ver != SCHEMA_VERSION:
+                    conn.close()
+                    raise RuntimeError(
+                        f"Collection schema version {ver} is not supported (expected {SCHEMA_VERSION}); "
+                        "export it from Anki as a legacy package or use the AnkiConnect backend"
+                    )
+                self._conn = conn
+                self._load_col()
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            if self._in_transaction:
+                self._commit()
+            self._log_verbose("Closing collection")
+            self._conn.close()
+            self._conn = None
+
+    def _load_col(self) -> None:
+        conf, models, decks = self.conn.execute("SELECT conf, models, decks FROM col").fetchone()
+        self._col = {"conf": json.loads(conf), "models": json.loads(models), "decks": json.loads(decks)}
+
+    def _save_col(self) -> None:
+        """Write the deck, model and config JSON back, inside the open transaction."""
+        self.conn.execute(
+            "UPDATE col SET conf = ?, models = ?, decks = ?, mod = ?",
+            (
+                json.dumps(self._col["conf"]),
+                json.dumps(self._col["models"]),
+                json.dumps(self._col["decks"]),
+                int(time.time() * 1000),
+            ),
+        )
+
+    def _begin(self) -> bool:
+        """Start a transaction unless one is open; True when this call opened it."""
+        if self._in_transaction:
+            return False
+        self.conn.execute("BEGIN IMMEDIATE")
+        self._in_transaction = True
+        return True
+
+    def _commit(self) -> None:
+        self.conn.execute("COMMIT")
+        self._in_transaction = False
+
+    @contextmanager
+    def _savepoint(self) -> Iterator[None]:
+        self._savepoints += 1
+        name = f"sp{self._savepoints}"
+        self.conn.execute(f"SAVEPOINT {name}")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute(f"ROLLBACK TO {name}")
+            self.conn.execute(f"RELEASE {name}")
+            self._load_col()
+            raise
+        else:
+            self.conn.execute(f"RELEASE {name}")
+
+    @contextmanager
+    def _write(self) -> Iterator[None]:
+        """Run a mutating call in the open transaction, or in its own."""
+        with self._lock:
+            owner = self._begin()
+            try:
+                yield
+            except BaseException:
+                if owner:
+                    self.conn.execute("ROLLBACK")
+                    self._in_transaction = False
+                    self._load_col()
+                raise
+            if owner:
+                self._commit()
+
+    @contextmanager
+    def batch(self, chunk_size: Optional[int] = None) -> Iterator[CollectionBatch]:
+        b = CollectionBatch(self)
+        try:
+            yield b
+        finally:
+            b.flush()
+
+    # Helpers
+    def _new_ids(self, table: str, count: int) -> List[int]:
+        """Unique millisecond-timestamp ids, as Anki assigns them."""
+        top = self.conn.execute(f"SELECT coalesce(max(id), 0) FROM {table}").fetchone()[0]
+        start = max(int(time.time() * 1000), top + 1)
+        return list(range(start, start + count))
+
+    def _new_entity_id(self, kind: str, name: str, taken: Iterable[int]) -> int:
+        """Id for a new deck or model: a millisecond timestamp, or derived from ``name`` with ``stable_ids``."""
+        taken = set(taken)
+        if not self.stable_ids:
+            return max([int(time.time() * 1000)] + [i + 1 for i in taken])
+        new_id = stable_id(kind, name)
+        while new_id in taken:
+            new_id += 1
+        return new_id
+
+    def _model(self, name: str) -> Dict[str, Any]:
+        for m in self._col["models"].values():
+            if m["name"] == name:
+                return m
+        raise RuntimeError(f"model was not found: {name}")
+
+    def _deck_id(self, name: str) -> int:
+        for d in self._col["decks"].values():
+            if d["name"].lower() == name.lower():
+                return int(d["id"])
+        return self.create_deck(name)
+
+    @staticmethod
+    def _card_ords(model: Dict[str, Any], values: Sequence[str]) -> List[int]:
+        """Template ordinals of the cards a note with these field values has."""
+        by_name = {f["name"]: values[f["ord"]] if f["ord"] < len(values) else "" for f in model["flds"]}
+        if model.get("type") == 1:
+            numbers: Set[int] = set()
+            for name in _template_fields(model["tmpls"][0]["qfmt"]):
+                numbers.update(int(n) for n in _CLOZE.findall(by_name.get(name, "")))
+            return sorted(n - 1 for n in numbers if n > 0)
+        return [t["ord"] for t in model["tmpls"] if _question_nonempty(t["qfmt"], by_name)]
+
+    def _note_values(self, model: Dict[str, Any], fields: Dict[str, str]) -> List[str]:
+        names = [f["name"] for f in sorted(model["flds"], key=lambda f: f["ord"])]
+        unknown = set(fields) - set(names)
+        if unknown:
+            raise RuntimeError(f"model '{model['name']}' has no field(s) {sorted(unknown)}")
+        return [fields.get(name, "") for name in names]
+
+    def _check_note(self, note: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str], List[int]]:
+        """Model, field values and card ordinals of a note, or an error like AnkiConnect's."""
+        model = self._model(note["model"])
+        values = self._note_values(model, note["fields"])
+        ords = self._card_ords(model, values)
+        if not strip_html_media(values[0]) or not ords:
+            raise RuntimeError("cannot create note because it is empty")
+        return model, values, ords
+
+    def _is_duplicate(self, model: Dict[str, Any], first: str) -> bool:
+        stripped = strip_html_media(first)
+        rows = self.conn.execute(
+            "SELECT flds FROM notes WHERE mid = ? AND csum = ?", (int(model["id"]), field_checksum(first))
+        )
+        return any(strip_html_media(flds.split(FIELD_SEPARATOR, 1)[0]) == stripped for (flds,) in rows)
+
+    def _graves(self, ids: Sequence[int], kind: int) -> None:
+        self.conn.executemany("INSERT INTO graves VALUES (-1, ?, ?)", [(i, kind) for i in ids])
+
+    def _delete_note_rows(self, note_ids: Sequence[int]) -> None:
+        ids = json.dumps(list(note_ids))
+        card_ids = [r[0] for r in self.conn.execute("SELECT id FROM cards WHERE nid IN (SELECT value FROM json_each(?))", (ids,))]
+        self._graves(card_ids, 0)
+        self._graves(note_ids, 1)
+        self.conn.execute("DELETE FROM cards WHERE nid IN (SELECT value FROM json_each(?))", (ids,))
+        self.conn.execute("DELETE FROM notes WHERE id IN (SELECT value FROM json_each(?))", (ids,))
+
+    # Decks
+    def list_decks(self) -> List[str]:
+        with self._lock:
+            self._ensure_open()
+            return sorted(d["name"] for d in self._col["decks"].values())
+
+    def create_deck(self, name: str) -> int:
+        with self._lock:
+            self._ensure_open()
+            existing = {d["name"].lower(): int(d["id"]) for d in self._col["decks"].values()}
+            if name.lower() in existing:
+                return existing[name.lower()]
+            with self._write():
+                parts = name.split("::")
+                did = 0
+                for depth in range(1, len(parts) + 1):
+                    path = "::".join(parts[:depth])
+                    if path.lower() in existing:
+                        did = existing[path.lower()]
+                        continue
+                    did = self._new_entity_id("deck", path, existing.values())
+                    self._col["decks"][str(did)] = _deck_json(did, path, int(time.time()))
+                    existing[path.lower()] = did
+                    self._log_verbose("Created deck '%s' (id=%s)", path, did)
+                self._save_col()
+            return did
+
+    def delete_decks(self, names: List[str], cards_too: bool = False) -> None:
+        self._ensure_open()
+        wanted = {n.lower() for n in names}
+        with self._write():
+            doomed = [
+                int(d["id"])
+                for d in self._col["decks"].values()
+                if int(d["id"]) != DEFAULT_DECK_ID
+                and any(d["name"].lower() == n or d["name"].lower().startswith(n + "::") for n in wanted)
+            ]
+            dids = json.dumps(doomed)
+            if cards_too:
+                nids = [r[0] for r in self.conn.execute("SELECT DISTINCT nid FROM cards WHERE did IN (SELECT value FROM json_each(?))", (dids,))]
+                card_ids = [r[0] for r in self.conn.execute("SELECT id FROM cards WHERE did IN (SELECT value FROM json_each(?))", (dids,))]
+                self._graves(card_ids, 0)
+                self.conn.execute("DELETE FROM cards WHERE did IN (SELECT value FROM json_each(?))", (dids,))
+                orphans = [
+                    r[0]
+                    for r in self.conn.execute(
+                        "SELECT value FROM json_each(?) WHERE value NOT IN (SELECT nid FROM cards)", (json.dumps(nids),)
+                    )
+                ]
+                self._graves(orphans, 1)
+                self.conn.execute("DELETE FROM notes WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(orphans),))
+            else:
+                self.conn.execute(
+                    "UPDATE cards SET did = ?, mod = ?, usn = -1 WHERE did IN (SELECT value FROM json_each(?))",
+                    (DEFAULT_DECK_ID, int(time.time()), dids),
+                )
+            for did in doomed:
+                self._col["decks"].pop(str(did), None)
+                self._graves([did], 2)
+            self._save_col()
+
+    # Models
+    def list_models(self) -> List[str]:
+        with self._lock:
+            self._ensure_open()
+            return sorted(m["name"] for m in self._col["models"].values())
+
+    def model_field_names(self, model_name: str) -> List[str]:
+        with self._lock:
+            self._ensure_open()
+            return [f["name"] for f in sorted(self._model(model_name)["flds"], key=lambda f: f["ord"])]
+
+    def create_model(self, name: str, fields: List[str], templates: List[Dict[str, str]], css: str, is_cloze: bool = False) -> None:
+        with self._lock:
+            self._ensure_open()
+            if any(m["name"] == name for m in self._col["models"].values()):
+                raise RuntimeError(f"Model name already exists: {name}")
+            with self._write():
+                now = int(time.time())
+                mid = self._new_entity_id("model", name, (int(k) for k in self._col["models"]))
+                model = {
+                    "id": mid, "name": name, "type": 1 if is_cloze else 0, "mod": now, "usn": -1, "sortf": 0,
+                    "did": DEFAULT_DECK_ID, "css": css, "latexPre": _LATEX_PRE, "latexPost": "\\end{document}",
+                    "latexsvg": False, "tags": [], "vers": [],
+                    "flds": [
+                        {"name": f, "ord": i, "sticky": False, "rtl": False, "font": "Arial", "size": 20, "media": []}
+                        for i, f in enumerate(fields)
+                    ],
+                    "tmpls": [
+                        {"name": t["name"], "ord": i, "qfmt": t["qfmt"], "afmt": t["afmt"], "did": None, "bqfmt": "", "bafmt": ""}
+                        for i, t in enumerate(templates)
+                    ],
+                }
+                self._update_req(model)
+                self._col["models"][str(mid)] = model
+                self.conn.execute("UPDATE col SET scm = ?", (int(time.time() * 1000),))
+                self._save_col()
+                self._log_verbose("Created model '%s' (id=%s)", name, mid)
+
+    @staticmethod
+    def _update_req(model: Dict[str, Any]) -> None:
+        """Legacy ``req`` list: which fields each template needs to produce a card."""
+        if model["type"] == 1:
+            model.pop("req", None)
+            return
+        ords = {f["name"]: f["ord"] for f in model["flds"]}
+        model["req"] = [
+            [t["ord"], "any", sorted(ords[n] for n in _template_fields(t["qfmt"]) if n in ords)]
+            for t in model["tmpls"]
+        ]
+
+    def model_templates(self, name: str) -> Dict[str, Dict[str, str]]:
+        with self._lock:
+            self._ensure_open()
+            return {t["name"]: {"Front": t["qfmt"], "Back": t["afmt"]} for t in self._model(name)["tmpls"]}
+
+    def model_styling(self, name: str) -> str:
+        with self._lock:
+            self._ensure_open()
+            return self._model(name)["css"]
+
+    def update_model_templates(self, name: str, templates: List[Dict[str, str]]) -> None:
+        self._ensure_open()
+        with self._write():
+            model = self._model(name)
+            by_name = {t["name"]: t for t in model["tmpls"]}
+            unknown = [t["name"] for t in templates if t["name"] not in by_name]
+            if unknown:
+                raise RuntimeError(f"model '{name}' has no template(s) {unknown}; adding templates is not supported")
+            for t in templates:
+                by_name[t["name"]].update(qfmt=t["qfmt"], afmt=t["afmt"])
+            self._update_req(model)
+            model["mod"], model["usn"] = int(time.time()), -1
+            self._save_col()
+
+    def update_model_styling(self, name: str, css: str) -> None:
+        self._ensure_open()
+        with self._write():
+            model = self._model(name)
+            model["css"], model["mod"], model["usn"] = css, int(time.time()), -1
+            self._save_col()
+
+    def delete_model(self, name: str) -> None:
+        self._ensure_open()
+        with self._write():
+            model = self._model(name)
+            nids = [r[0] for r in self.conn.execute("SELECT id FROM notes WHERE mid = ?", (int(model["id"]),))]
+            self._delete_note_rows(nids)
+            del self._col["models"][str(model["id"])]
+            self.conn.execute("UPDATE col SET scm = ?", (int(time.time() * 1000),))
+            self._save_col()
+
+    # Notes
+    def find_notes(self, query: str) -> List[int]:
+        """Note ids matching a search of ``deck:``, ``note:`` and ``nid:`` terms."""
+        with self._lock:
+            self._ensure_open()
+            clauses, params = [], []
+            for term in parse_search(query):
+                if term.key == "nid":
+                    clause = "n.id IN (SELECT value FROM json_each(?))"
+                    params.append(json.dumps(term.note_ids()))
+                elif term.key == "note":
+                    mids = [int(m["id"]) for m in self._col["models"].values() if term.matches(m["name"])]
+                    clause = "n.mid IN (SELECT value FROM json_each(?))"
+                    params.append(json.dumps(mids))
+                else:
+                    dids = [int(d["id"]) for d in self._col["decks"].values() if term.matches(d["name"])]
+                    clause = "n.id IN (SELECT nid FROM cards WHERE did IN (SELECT value FROM json_each(?)))"
+                    params.append(json.dumps(dids))
+                clauses.append(f"NOT {clause}" if term.negated else clause)
+            where = " AND ".join(clauses) or "1"
+            return [r[0] for r in self.conn.execute(f"SELECT n.id FROM notes n WHERE {where} ORDER BY n.id", params)]
+
+    def add_note(self, model: str, deck: str, fields: Dict[str, str], tags: List[str]) -> int:
+        ids = self._insert_notes([{"model": model, "deck": deck, "fields": fields, "tags": tags}], strict=True)
+        return ids[0]
+
+    def add_notes(self, notes: List[Dict[str, Any]]) -> List[Optional[int]]:
+        return self._insert_notes(notes, strict=False)
+
+    def can_add_notes(self, notes: List[Dict[str, Any]]) -> List[Optional[str]]:
+        with self._lock:
+            self._ensure_open()
+            reasons: List[Optional[str]] = []
+            for note in notes:
+                try:
+                    model, values, _ = self._check_note(note)
+                except RuntimeError as e:
+                    reasons.append(str(e))
+                    continue
+                duplicate = self._is_duplicate(model, values[0])
+                reasons.append("cannot create note because it is a duplicate" if duplicate else None)
+            return reasons
+
+    def _insert_notes(self, notes: List[Dict[str, Any]], strict: bool) -> List[Optional[int]]:
+        """Insert notes and their cards with one ``executemany`` per table.
+
+        A note may carry a ``guid``; otherwise a random one is assigned.
+        """
+        self._ensure_open()
+        with self._write():
+            checked: List[Optional[Tuple[Dict[str, Any], List[str], List[int], int]]] = []
+            seen: Set[Tuple[int, str]] = set()
+            errors: List[Optional[str]] = []
+            for note in notes:
+                try:
+                    model, values, ords = self._check_note(note)
+                    key = (int(model["id"]), strip_html_media(values[0]))
+                    if key in seen or self._is_duplicate(model, values[0]):
+                        raise RuntimeError("cannot create note because it is a duplicate")
+                    seen.add(key)
+                    checked.append((model, values, ords, self._deck_id(note["deck"])))
+                    errors.append(None)
+                except RuntimeError as e:
+                    if strict:
+                        raise
+                    checked.append(None)
+                    errors.append(str(e))
+
+            valid = [i for i, c in enumerate(checked) if c is not None]
+            note_ids = self._new_ids("notes", len(valid))
+            card_count = sum(len(checked[i][2]) for i in valid)
+            card_ids = iter(self._new_ids("cards", card_count))
+            now = int(time.time())
+            pos = self._col["conf"].get("nextPos", 1)
+            note_rows, card_rows = [], []
+            ids: List[Optional[int]] = [None] * len(notes)
+            for nid, i in zip(note_ids, valid):
+                model, values, ords, did = checked[i]
+                tags = notes[i].get("tags", [])
+                sort_value = strip_html_media(values[model.get("sortf", 0)])
+                note_rows.append((
+                    nid, notes[i].get("guid") or guid64(), int(model["id"]), now, -1, f" {' '.join(tags)} " if tags else "",
+                    FIELD_SEPARATOR.join(values), sort_value, field_checksum(values[0]), 0, "",
+                ))
+                card_rows.extend(
+                    (next(card_ids), nid, did, ord_, now, -1, 0, 0, pos, 0, 0, 0, 0, 0, 0, 0, 0, "")
+                    for ord_ in ords
+                )
+                pos += 1
+                ids[i] = nid
+            self.conn.executemany("INSERT INTO notes VALUES (?,?,?,?,?,?,?,?,?,?,?)", note_rows)
+            self.conn.executemany("INSERT INTO cards VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", card_rows)
+            self._col["conf"]["nextPos"] = pos
+            self._save_col()
+            self._log_verbose("Inserted %s notes and %s cards", len(note_rows), len(card_rows))
+        return AddedNotes(ids, errors)
+
+    def update_note_fields(self, note_id: int, fields: Dict[str, str]) -> None:
+        self._ensure_open()
+        with self._write():
+            row = self.conn.execute("SELECT mid, flds FROM notes WHERE id = ?", (note_id,)).fetchone()
+            if row is None:
+                raise RuntimeError(f"Note was not found: {note_id}")
+            model = self._col["models"][str(row[0])]
+            names = [f["name"] for f in sorted(model["flds"], key=lambda f: f["ord"])]
+            current = dict(zip(names, row[1].split(FIELD_SEPARATOR)))
+            current.update({k: v for k, v in fields.items() if k in current})
+            values = [current.get(name, "") for name in names]
+            self.conn.execute(
+                "UPDATE notes SET flds = ?, sfld = ?, csum = ?, mod = ?, usn = -1 WHERE id = ?",
+                (
+                    FIELD_SEPARATOR.join(values),
+                    strip_html_media(values[model.get("sortf", 0)]),
+                    field_checksum(values[0]),
+                    int(time.time()),
+                    note_id,
+                ),
+            )
+            # Templates whose question became non-empty get their card now
+            have = {r[0]: r[1] for r in self.conn.execute("SELECT ord, did FROM cards WHERE nid = ?", (note_id,))}
+            missing = [o for o in self._card_ords(model, values) if o not in have]
+            if missing:
+                did = next(iter(have.values()), DEFAULT_DECK_ID)
+                due = self.conn.execute("SELECT coalesce(min(due), 0) FROM cards WHERE nid = ?", (note_id,)).fetchone()[0]
+                now = int(time.time())
+                self.conn.executemany(
+                    "INSERT INTO cards VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                    [
+                        (cid, note_id, did, o, now, -1, 0, 0, due, 0, 0, 0, 0, 0, 0, 0, 0, "")
+                        for cid, o in zip(self._new_ids("cards", len(missing)), missing)
+                    ],
+                )
+
+    def delete_notes(self, ids: List[int]) -> None:
+        self._ensure_open()
+        with self._write():
+            self._delete_note_rows(list(ids))
+
+    def notes_info(self, ids: List[int]) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._ensure_open()
+            rows = {
+                r[0]: r
+                for r in self.conn.execute(
+                    "SELECT id, mid, tags, flds, mod FROM notes WHERE id IN (SELECT value FROM json_each(?))",
+                    (json.dumps(list(ids)),),
+                )
+            }
+            cards: Dict[int, List[int]] = {}
+            for cid, nid in self.conn.execute(
+                "SELECT id, nid FROM cards WHERE nid IN (SELECT value FROM json_each(?)) ORDER BY ord", (json.dumps(list(ids)),)
+            ):
+                cards.setdefault(nid, []).append(cid)
+            infos = []
+            for nid in ids:
+                row = rows.get(nid)
+                if row is None:
+                    infos.append({})
+                    continue
+                model = self._col["models"][str(row[1])]
+                names = [f["name"] for f in sorted(model["flds"], key=lambda f: f["ord"])]
+                values = row[3].split(FIELD_SEPARATOR)
+                infos.append({
+                    "noteId": nid,
+                    "modelName": model["name"],
+                    "tags": row[2].split(),
+                    "fields": {name: {"value": value, "order": i} for i, (name, value) in enumerate(zip(names, values))},
+                    "cards": cards.get(nid, []),
+                    "mod": row[4],
+                })
+            return infos
+
+    # Media
+    def _media_file(self, filename: str) -> Path:
+        if os.path.basename(filename) != filename or filename in ("", ".", ".."):
+            raise ValueError(f"Invalid media filename: {filename!r}")
+        return self.media_dir / filename
+
+    def store_media_file(self, filename: str, data: bytes) -> str:
+        target = self._media_file(filename)
+        self.media_dir.mkdir(exist_ok=True)
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, target)
+        return filename
+
+    def store_media_path(self, filename: str, path: Path) -> str:
+        target = self._media_file(filename)
+        self.media_dir.mkdir(exist_ok=True)
+        shutil.copyfile(path, target)
+        return filename
+
+    def store_media_url(self, filename: str, url: str) -> str:
+        target = self._media_file(filename)
+        self.media_dir.mkdir(exist_ok=True)
+        with httpx.stream("GET", url, follow_redirects=True) as resp:
+            resp.raise_for_status()
+            with target.open("wb") as f:
+                for chunk in resp.iter_bytes():
+                    f.write(chunk)
+        return filename
+
+    def get_media_files_names(self, pattern: str = "*") -> List[str]:
+        if not self.media_dir.is_dir():
+            return []
+        return sorted(p.name for p in self.media_dir.iterdir() if p.is_file() and fnmatchcase(p.name, pattern))
+
+    def retrieve_media_file(self, filename: str) -> bytes:
+        return self._media_file(filename).read_bytes()
+
+    def delete_media_file(self, filename: str) -> None:
+        self._media_file(filename).unlink(missing_ok=True)
@@ -0,0 +1,402 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .base import AddedNotes, Backend, Batch, Deferred
+from .search import parse_search
+
+_Op = Tuple[Callable[..., Any], tuple, dict, Deferred]
+
+
+def payload_size(value: Any) -> int:
+    """Approximate JSON size of ``value`` on the wire, with bytes counted as base64."""
+
+    def default(o: Any) -> Any:
+        if isinstance(o, (bytes, bytearray)):
+            return "=" * (4 * ((len(o) + 2) // 3))
+        return str(o)
+
+    return len(json.dumps(value, default=default, ensure_ascii=False).encode("utf-8"))
+
+
+@dataclass
+class Call:
+    """One recorded backend call; ``request`` numbers the round trip that carried it."""
+
+    method: str
+    args: tuple
+    kwargs: dict
+    request: int
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    error: Optional[BaseException] = None
+
+
+def _action(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Make ``fn`` a recorded action: called directly, it costs one round trip."""
+
+    @wraps(fn)
+    def call(self: "MemoryBackend", *args: Any, **kwargs: Any) -> Any:
+        if getattr(self._local, "in_round_trip", False):
+            # Called from another action, e.g. an override calling super()
+            return fn(self, *args, **kwargs)
+        deferred = Deferred()
+        self._round_trip([(fn, args, kwargs, deferred)])
+        return deferred.result()
+
+    call.action = fn  # type: ignore[attr-defined]
+    return call
+
+
+class MemoryBatch(Batch):
+    """Batch queuing calls and running them ``chunk_size`` per round trip, like ``multi``.
+
+    Results are only available after the chunk carrying the call ran, so code
+    that reads a deferred too early fails here just as it would against Anki.
+    """
+
+    def __init__(self, backend: "MemoryBackend", chunk_size: int):
+        super().__init__(backend)
+        self.chunk_size = max(1, chunk_size)
+        self._queue: List[_Op] = []
+
+    def __getattr__(self, name: str) -> Callable[..., Deferred]:
+        fn = getattr(type(self.backend), name).action
+
+        def call(*args: Any, **kwargs: Any) -> Deferred:
+            deferred = Deferred()
+            self._queue.append((fn, args, kwargs, deferred))
+            if len(self._queue) >= self.chunk_size:
+                self.flush()
+            return deferred
+
+        return call
+
+    def flush(self) -> None:
+        while self._queue:
+            chunk, self._queue = self._queue[: self.chunk_size], self._queue[self.chunk_size :]
+            self.backend._round_trip(chunk)
+
+
+class MemoryBackend(Backend):
+    """In-memory collection that records every call, for tests and budgets.
+
+    Decks, models, notes and media behave like AnkiConnect's: notes are
+    refused when empty or when their first field duplicates another note of
+    the same model, and ``notes_info`` has AnkiConnect's shape. Every call is
+    appended to ``calls``. A direct call is one round trip; a batch packs
+    ``batch_size`` calls per round trip, so ``requests`` counts what an
+    AnkiConnect backend would send. Each round trip sleeps ``latency``
+    seconds. Byte counts approximate the JSON exchanged; media stored by
+    path count as the path, as when Anki reads local files itself.
+
+    Subclasses may override actions, e.g. to inject failures; overrides are
+    recorded and batched like the actions they replace.
+    """
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        for name, value in list(vars(cls).items()):
+            if callable(value) and not hasattr(value, "action") and hasattr(getattr(MemoryBackend, name, None), "action"):
+                setattr(cls, name, _action(value))
+
+    def __init__(self, latency: float = 0.0, batch_size: int = 100, record: bool = True):
+        self.latency = latency
+        self.batch_size = batch_size
+        # Without recording, calls and bytes are not tracked (faster for large stores)
+        self.record = record
+        self.calls: List[Call] = []
+        self.requests = 0
+        self.decks: Dict[str, int] = {"Default": 1}
+        self.models: Dict[str, Dict[str, Any]] = {}
+        self.notes: Dict[int, Dict[str, Any]] = {}
+        self.media: Dict[str, bytes] = {}
+        # (model, first field value) -> note id, for duplicate checks
+        self._firsts: Dict[Tuple[str, str], int] = {}
+        self._next_id = 1_000_000
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    # Recording
+    @property
+    def bytes_sent(self) -> int:
+        return sum(c.bytes_sent for c in self.calls)
+
+    @property
+    def bytes_received(self) -> int:
+        return sum(c.bytes_received for c in self.calls)
+
+    def call_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for c in self.calls:
+            counts[c.method] = counts.get(c.method, 0) + 1
+        return counts
+
+    def reset_counters(self) -> None:
+        """Forget recorded calls and requests; the collection is kept."""
+        with self._lock:
+            self.calls = []
+            self.requests = 0
+
+    def _round_trip(self, ops: List[_Op]) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            request = self.requests
+            for fn, args, kwargs, deferred in ops:
+                self._local.in_round_trip = True
+                try:
+                    deferred.set_result(fn(self, *args, **kwargs))
+                except Exception as e:
+                    deferred.set_error(e)
+                finally:
+                    self._local.in_round_trip = False
+                if self.record:
+                    self.calls.append(
+                        Call(
+                            fn.__name__,
+                            args,
+                            kwargs,
+                            request,
+                            payload_size([args, kwargs]),
+                            payload_size(deferred._value),
+                            deferred.error,
+                        )
+                    )
+
+    @contextmanager
+    def batch(self, chunk_size: Optional[int] = None) -> Iterator[MemoryBatch]:
+        b = MemoryBatch(self, chunk_size or self.batch_size)
+        try:
+            yield b
+        finally:
+            b.flush()
+
+    def _new_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    # Decks
+    @_action
+    def list_decks(self) -> List[str]:
+        return sorted(self.decks)
+
+    @_action
+    def create_deck(self, name: str) -> int:
+        parts = name.split("::")
+        for i in range(1, len(parts) + 1):
+            self.decks.setdefault("::".join(parts[:i]), self._new_id())
+        return self.decks[name]
+
+    @_action
+    def delete_decks(self, names: List[str], cards_too: bool = False) -> None:
+        doomed = {d for d in self.decks for n in names if d == n or d.startswith(n + "::")}
+        doomed.discard("Default")
+        for nid, note in list(self.notes.items()):
+            if note["deck"] in doomed:
+                if cards_too:
+                    self._drop(nid)
+                else:
+                    note["deck"] = "Default"
+        for d in doomed:
+            del self.decks[d]
+
+    # Models
+    def _model(self, name: str) -> Dict[str, Any]:
+        if name not in self.models:
+            raise RuntimeError(f"model was not found: {name}")
+        return self.models[name]
+
+    @_action
+    def list_models(self) -> List[str]:
+        return sorted(self.models)
+
+    @_action
+    def model_field_names(self, model_name: str) -> List[str]:
+        return list(self._model(model_name)["fields"])
+
+    @_action
+    def create_model(self, name: str, fields: List[str], templates: List[Dict[str, str]], css: str, is_cloze: bool = False) -> None:
+        if name in self.models:
+            raise RuntimeError(f"Model name already exists: {name}")
+        self.models[name] = {
+            "fields": list(fields),
+            "templates": {t["name"]: {"Front": t["qfmt"], "Back": t["afmt"]} for t in templates},
+            "css": css,
+            "isCloze": is_cloze,
+        }
+
+    @_action
+    def model_templates(self, name: str) -> Dict[str, Dict[str, str]]:
+        return {k: dict(v) for k, v in self._model(name)["templates"].items()}
+
+    @_action
+    def model_styling(self, name: str) -> str:
+        return self._model(name)["css"]
+
+    @_action
+    def update_model_templates(self, name: str, templates: List[Dict[str, str]]) -> None:
+        current = self._model(name)["templates"]
+        for t in templates:
+            if t["name"] in current:
+                current[t["name"]] = {"Front": t["qfmt"], "Back": t["afmt"]}
+
+    @_action
+    def update_model_styling(self, name: str, css: str) -> None:
+        self._model(name)["css"] = css
+
+    @_action
+    def delete_model(self, name: str) -> None:
+        self._model(name)
+        for nid in [nid for nid, n in self.notes.items() if n["model"] == name]:
+            self._drop(nid)
+        del self.models[name]
+
+    # Notes
+    def _first_key(self, model: str, fields: Dict[str, str]) -> Tuple[str, str]:
+        return model, fields.get(self.models[model]["fields"][0], "")
+
+    def _cannot_add(self, note: Dict[str, Any]) -> Optional[str]:
+        if note["model"] not in self.models:
+            return f"model was not found: {note['model']}"
+        if note["deck"] not in self.decks:
+            return f"deck was not found: {note['deck']}"
+        key = self._first_key(note["model"], note["fields"])
+        if not key[1].strip():
+            return "cannot create note because it is empty"
+        if key in self._firsts:
+            return "cannot create note because it is a duplicate"
+        return None
+
+    def _insert(self, note: Dict[str, Any]) -> int:
+        error = self._cannot_add(note)
+        if error:
+            raise RuntimeError(error)
+        nid = self._new_id()
+        names = self.models[note["model"]]["fields"]
+        self.notes[nid] = {
+            "model": note["model"],
+            "deck": note["deck"],
+            "fields": {name: note["fields"].get(name, "") for name in names},
+            "tags": list(note.get("tags", [])),
+        }
+        self._firsts[self._first_key(note["model"], note["fields"])] = nid
+        return nid
+
+    def _drop(self, nid: int) -> None:
+        note = self.notes.pop(nid, None)
+        if note is not None:
+            self._firsts.pop(self._first_key(note["model"], note["fields"]), None)
+
+    @_action
+    def find_notes(self, query: str) -> List[int]:
+        terms = parse_search(query)
+        if len(terms) == 1 and terms[0].key == "nid" and not terms[0].negated:
+            return [nid for nid in terms[0].note_ids() if nid in self.notes]
+        # Resolve each term to the matching ids or names once, not per note
+        checks = []
+        for term in terms:
+            if term.key == "nid":
+                checks.append((term, None, set(term.note_ids())))
+            else:
+                attr = "deck" if term.key == "deck" else "model"
+                names = self.decks if term.key == "deck" else self.models
+                checks.append((term, attr, {name for name in names if term.matches(name)}))
+        return [
+            nid
+            for nid, note in self.notes.items()
+            if all(((nid if attr is None else note[attr]) in wanted) != term.negated for term, attr, wanted in checks)
+        ]
+
+    @_action
+    def add_note(self, model: str, deck: str, fields: Dict[str, str], tags: List[str]) -> int:
+        return self._insert({"model": model, "deck": deck, "fields": fields, "tags": tags})
+
+    @_action
+    def add_notes(self, notes: List[Dict[str, Any]]) -> List[Optional[int]]:
+        ids: List[Optional[int]] = []
+        errors: List[Optional[str]] = []
+        for note in notes:
+            try:
+                ids.append(self._insert(note))
+                errors.append(None)
+            except RuntimeError as e:
+                ids.append(None)
+                errors.append(str(e))
+        return AddedNotes(ids, errors)
+
+    @_action
+    def can_add_notes(self, notes: List[Dict[str, Any]]) -> List[Optional[str]]:
+        return [self._cannot_add(note) for note in notes]
+
+    @_action
+    def update_note_fields(self, note_id: int, fields: Dict[str, str]) -> None:
+        note = self.notes.get(note_id)
+        if note is None:
+            raise RuntimeError(f"Note was not found: {note_id}")
+        self._firsts.pop(self._first_key(note["model"], note["fields"]), None)
+        note["fields"].update({k: v for k, v in fields.items() if k in note["fields"]})
+        self._firsts[self._first_key(note["model"], note["fields"])] = note_id
+
+    @_action
+    def delete_notes(self, ids: List[int]) -> None:
+        for nid in ids:
+            self._drop(nid)
+
+    @_action
+    def notes_info(self, ids: List[int]) -> List[Dict[str, Any]]:
+        infos: List[Dict[str, Any]] = []
+        for nid in ids:
+            note = self.notes.get(nid)
+            if note is None:
+                infos.append({})
+                continue
+            infos.append({
+                "noteId": nid,
+                "modelName": note["model"],
+                "tags": list(note["tags"]),
+                "fields": {name: {"value": value, "order": i} for i, (name, value) in enumerate(note["fields"].items())},
+                "cards": [nid],
+            })
+        return infos
+
+    # Media
+    @_action
+    def store_media_file(self, filename: str, data: bytes) -> str:
+        self.media[filename] = bytes(data)
+        return filename
+
+    @_action
+    def store_media_path(self, filename: str, path: Path) -> str:
+        self.media[filename] = Path(path).read_bytes()
+        return filename
+
+    @_action
+    def store_media_url(self, filename: str, url: str) -> str:
+        # Nothing is downloaded; the URL stands in for the content
+        self.media[filename] = url.encode("utf-8")
+        return filename
+
+    @_action
+    def get_media_files_names(self, pattern: str = "*") -> List[str]:
+        return sorted(name for name in self.media if fnmatchcase(name, pattern))
+
+    @_action
+    def retrieve_media_file(self, filename: str) -> bytes:
+        if filename not in self.media:
+            raise RuntimeError(f"Media file not found: {filename}")
+        return self.media[filename]
+
+    @_action
+    def delete_media_file(self, filename: str) -> None:
+        self.media.pop(filename, None)
+
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import List
+
+_TERM = re.compile(r'(-?)(?:"((?:[^"\\]|\\.)*)"|(\S+))')
+
+# Search keys understood by the backends that evaluate searches themselves
+SEARCH_KEYS = ("deck", "note", "nid")
+
+
+def search_pattern(value: str) -> "re.Pattern[str]":
+    """Anki search value to a regex: ``*`` and ``_`` are wildcards unless escaped."""
+    parts = []
+    chars = iter(value)
+    for ch in chars:
+        if ch == "\\":
+            parts.append(re.escape(next(chars, "\\")))
+        elif ch == "*":
+            parts.append(".*")
+        elif ch == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(ch))
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+@dataclass
+class SearchTerm:
+    key: str
+    value: str
+    negated: bool = False
+
+    def note_ids(self) -> List[int]:
+        """Ids listed by an ``nid:`` term."""
+        return [int(i) for i in self.value.split(",") if i]
+
+    def matches(self, name: str) -> bool:
+        """Whether a model (``note:``) or deck (``deck:``) name matches, ignoring negation.
+
+        Like Anki, ``deck:X`` also matches the subdecks of X.
+        """
+        pattern = search_pattern(self.value)
+        if pattern.fullmatch(name):
+            return True
+        if self.key == "deck":
+            parts = name.split("::")
+            return any(pattern.fullmatch("::".join(parts[:i])) for i in range(1, len(parts)))
+        return False
+
+
+def parse_search(query: str) -> List[SearchTerm]:
+    """Split a search into ANDed terms; an empty query has none and matches everything.
+
+    Only the ``deck:``, ``note:`` and ``nid:`` terms ankiday issues are
+    supported, quoted or not and optionally negated with ``-``.
+    """
+    terms = []
+    for negate, quoted, bare in _TERM.findall(query):
+        term = quoted if quoted or not bare else bare
+        key, sep, value = term.partition(":")
+        if not sep or key.lower() not in SEARCH_KEYS:
+            raise ValueError(f"Unsupported search term: {term}")
+        terms.append(SearchTerm(key.lower(), value, bool(negate)))
+    return terms
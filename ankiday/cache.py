@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+def cache_dir() -> Path:
+    """Directory for local caches: ``$ANKIDAY_CACHE_DIR``, else ``$XDG_CACHE_HOME/ankiday``."""
+    root = os.environ.get("ANKIDAY_CACHE_DIR")
+    if root:
+        return Path(root)
+    xdg = os.environ.get("XDG_CACHE_HOME")
+    return (Path(xdg) if xdg else Path.home() / ".cache") / "ankiday"
+
+
+def file_hash(path: Path) -> str:
+    """Content hash of a file, read in 1 MiB blocks."""
+    digest = hashlib.sha1()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+class HashCache:
+    """Content hashes of local files keyed by path, mtime and size.
+
+    A file is only read again when its mtime or size changed. With a ``path``
+    the cache persists across runs; safe to use from several threads.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self.entries: Dict[str, List] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "HashCache":
+        cache = cls(path or cache_dir() / "media-hashes.json")
+        try:
+            data = json.loads(cache.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        if isinstance(data, dict):
+            cache.entries = data
+        return cache
+
+    def hash(self, path: Path) -> str:
+        st = path.stat()
+        key = str(path.resolve())
+        entry = self.entries.get(key)
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return entry[2]
+        digest = file_hash(path)
+        with self._lock:
+            self.entries[key] = [st.st_mtime_ns, st.st_size, digest]
+            self._dirty = True
+        return digest
+
+    def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self.entries, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._dirty = False
@@ -2,23 +2,87 @@ from __future__ import annotations
 
 import json
 import sys
+from collections import Counter
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterator, List, Optional
 
 import typer
 
 from .config import load_config, Config
-from .ops.apply import Planner, Applier
+from .ops.apply import Planner, Applier, Plan
+from .ops.build import build_package
+from .ops.media import MediaManifest, config_media
+from .ops.optimize import count_requests, optimize_plan
+from .cache import HashCache
+from .journal import Journal, journal_path
+from .log import LEVELS, set_level
+from .planfile import PlanFile, PlanFileError
+from .profile import Profiler
+from .state import State, content_hash, state_path
 from .backends.ankiconnect import AnkiConnectBackend
+from .backends.ankiconnect_async import AsyncAnkiConnectBackend, ConcurrentAnkiConnectBackend
+from .backends.collection import CollectionBackend
 
 app = typer.Typer(add_completion=False, help="Manage Anki decks, models, and notes from YAML config")
 
 
-def _load_backend(cfg: Config, verbose: bool = False):
-    if cfg.backend == "ankiConnect":
-        return AnkiConnectBackend(base_url=cfg.server.url, timeout=cfg.server.timeoutSeconds, verbose=verbose)
+@app.callback()
+def main(
+    log_level: Optional[str] = typer.Option(
+        None,
+        "--log-level",
+        envvar="ANKIDAY_LOG_LEVEL",
+        help="How much --verbose shows: info (progress), debug (also backend calls, the default) or trace (full payloads)",
+    ),
+) -> None:
+    if log_level is not None:
+        if log_level.lower() not in LEVELS:
+            raise typer.BadParameter(f"must be one of {', '.join(LEVELS)}", param_hint="--log-level")
+        set_level(log_level)
+
+
+def _load_backend(
+    cfg: Config,
+    verbose: bool = False,
+    concurrency: int = 1,
+    base_dir: Optional[Path] = None,
+    profiler: Optional[Profiler] = None,
+):
+    if cfg.backend == "collection":
+        path = Path(cfg.collection.path).expanduser()
+        if not path.is_absolute() and base_dir is not None:
+            path = base_dir / path
+        return CollectionBackend(path, verbose=verbose)
+    elif cfg.backend == "ankiConnect" and concurrency > 1:
+        return ConcurrentAnkiConnectBackend(
+            AsyncAnkiConnectBackend(
+                base_url=cfg.server.url,
+                timeout=cfg.server.timeoutSeconds,
+                verbose=verbose,
+                batch_size=cfg.server.batchSize,
+                concurrency=concurrency,
+                connect_timeout=cfg.server.connectTimeoutSeconds,
+                keepalive_expiry=cfg.server.keepaliveExpirySeconds,
+                local_files=cfg.server.localFiles,
+                profiler=profiler,
+            )
+        )
+    elif cfg.backend == "ankiConnect":
+        return AnkiConnectBackend(
+            base_url=cfg.server.url,
+            timeout=cfg.server.timeoutSeconds,
+            verbose=verbose,
+            batch_size=cfg.server.batchSize,
+            connect_timeout=cfg.server.connectTimeoutSeconds,
+            max_connections=cfg.server.maxConnections,
+            max_keepalive_connections=cfg.server.maxKeepaliveConnections,
+            keepalive_expiry=cfg.server.keepaliveExpirySeconds,
+            local_files=cfg.server.localFiles,
+            profiler=profiler,
+        )
     else:
-        raise typer.BadParameter("Only 'ankiConnect' backend is implemented at the moment")
+        raise typer.BadParameter("Only the 'ankiConnect' and 'collection' backends are implemented at the moment")
 
 
 @app.command()
@@ -41,21 +105,96 @@ def validate(
     typer.secho("Config is valid.", fg=typer.colors.GREEN)
 
 
+@contextmanager
+def _profiling(profile: bool, trace: Optional[Path]) -> Iterator[Optional[Profiler]]:
+    """Profile the command when asked; the summary is printed even if it fails."""
+    if not profile and trace is None:
+        yield None
+        return
+    profiler = Profiler()
+    try:
+        yield profiler
+    finally:
+        typer.echo("\n" + profiler.summary(), err=True)
+        if trace is not None:
+            profiler.write_trace(trace)
+            typer.echo(f"Wrote trace to {trace}", err=True)
+
+
+def _request_summary(plan: Plan, optimized: Plan, batch_size: int) -> str:
+    before, _ = count_requests(plan, batch_size)
+    actions, requests = count_requests(optimized, batch_size)
+    return (
+        f"Optimized: {len(plan.steps)} steps -> {len(optimized.steps)} steps, "
+        f"{actions} Anki actions (was {before}) in {requests} requests, excluding media uploads."
+    )
+
+
 @app.command()
 def diff(
     file: Path = typer.Option(..., "-f", "--file", exists=True, readable=True, help="YAML config"),
     json_out: bool = typer.Option(False, "--json", help="Output machine-readable diff"),
     verbose: bool = typer.Option(False, "-v", "--verbose", help="Show verbose output with detailed progress"),
     skip_model_validation: bool = typer.Option(False, "--skip-model-validation", help="Skip model validation and rely on existing models in Anki"),
+    concurrency: int = typer.Option(1, "--concurrency", min=1, help="Run up to N AnkiConnect requests concurrently (async backend)"),
+    refresh_state: bool = typer.Option(False, "--refresh-state", help="Ignore the state file and re-check everything against Anki"),
+    out: Optional[Path] = typer.Option(None, "--out", help="Save the plan to this file for apply --plan"),
+    summary: bool = typer.Option(False, "--summary", help="Print only the number of changes of each kind"),
+    profile: bool = typer.Option(False, "--profile", help="Print per-action backend timings and phase times at exit"),
+    trace: Optional[Path] = typer.Option(None, "--trace", help="Write a Chrome trace (chrome://tracing, Perfetto) of the run; implies --profile"),
 ) -> None:
     cfg = load_config(file)
-    backend = _load_backend(cfg, verbose=verbose)
-    planner = Planner(backend, verbose=verbose, skip_model_validation=skip_model_validation)
-    plan = planner.build_plan(cfg)
+    state = None if refresh_state else State.load(state_path(file))
+    with _profiling(profile, trace) as profiler:
+        with _load_backend(cfg, verbose=verbose, concurrency=concurrency, base_dir=file.parent, profiler=profiler) as backend:
+            planner = Planner(backend, verbose=verbose, skip_model_validation=skip_model_validation, state=state, profiler=profiler)
+            if summary and out is None:
+                # Count the plan part by part; it is never held whole
+                counts: Counter = Counter()
+                unchanged = 0
+                for part in planner.iter_plan(cfg):
+                    counts.update(s.kind for s in part.steps)
+                    unchanged += part.unchanged
+                _echo_counts(counts, unchanged, json_out)
+                return
+            plan = planner.build_plan(cfg)
+            if out is not None:
+                PlanFile(plan, content_hash(cfg.model_dump()), planner.fingerprint(cfg)).save(out)
+    if summary:
+        _echo_counts(plan.counts(), plan.unchanged, json_out)
+    else:
+        _echo_plan(plan, cfg.server.batchSize, json_out)
+    if out is not None:
+        typer.echo(f"Plan saved to {out}; run apply --plan {out} to apply it.", err=json_out)
+
+
+def _echo_counts(counts: Dict[str, int], unchanged: int, json_out: bool) -> None:
+    if json_out:
+        typer.echo(json.dumps({"counts": dict(sorted(counts.items())), "unchanged": unchanged}, indent=2))
+        return
+    if not counts:
+        typer.echo(f"No changes. ({unchanged} notes unchanged.)" if unchanged else "No changes.")
+        return
+    typer.echo("Planned changes by kind:")
+    for kind, count in sorted(counts.items()):
+        typer.echo(f"  {kind:<24} {count:>8}")
+    if unchanged:
+        typer.echo(f"{unchanged} notes unchanged.")
+
+
+def _echo_plan(plan: Plan, batch_size: int, json_out: bool) -> None:
+    optimized = optimize_plan(plan)
     if json_out:
-        typer.echo(json.dumps(plan.to_dict(), indent=2))
+        data = plan.to_dict()
+        actions, requests = count_requests(optimized, batch_size)
+        data["optimized"] = {"steps": len(optimized.steps), "actions": actions, "requests": requests}
+        typer.echo(json.dumps(data, indent=2))
     else:
-        typer.echo(plan.pretty())
+        # Line by line, so a large plan is never rendered as one string
+        for line in plan.lines():
+            typer.echo(line)
+        if plan.steps:
+            typer.echo(_request_summary(plan, optimized, batch_size))
 
 
 @app.command()
@@ -64,23 +203,163 @@ def apply(
     assume_yes: bool = typer.Option(False, "-y", "--yes", help="Do not prompt for confirmation"),
     verbose: bool = typer.Option(False, "-v", "--verbose", help="Show verbose output with detailed progress"),
     skip_model_validation: bool = typer.Option(False, "--skip-model-validation", help="Skip model validation and rely on existing models in Anki"),
+    concurrency: int = typer.Option(1, "--concurrency", min=1, help="Run up to N AnkiConnect requests concurrently (async backend)"),
+    refresh_state: bool = typer.Option(False, "--refresh-state", help="Ignore the state file and re-check everything against Anki"),
+    jobs: int = typer.Option(1, "-j", "--jobs", min=1, help="Apply up to N independent parts of the plan (e.g. notes of different decks) in parallel"),
+    keep_going: bool = typer.Option(False, "--keep-going", help="After a failure, still apply the parts of the plan that do not depend on it"),
+    resume: bool = typer.Option(False, "--resume", help="Continue an interrupted apply from its journal instead of planning again"),
+    plan_file: Optional[Path] = typer.Option(None, "--plan", exists=True, readable=True, help="Apply a plan saved by diff --out instead of planning again"),
+    profile: bool = typer.Option(False, "--profile", help="Print per-action backend timings and phase times at exit"),
+    trace: Optional[Path] = typer.Option(None, "--trace", help="Write a Chrome trace (chrome://tracing, Perfetto) of the run; implies --profile"),
 ) -> None:
     cfg = load_config(file)
-    backend = _load_backend(cfg, verbose=verbose)
-    planner = Planner(backend, verbose=verbose, skip_model_validation=skip_model_validation)
-    plan = planner.build_plan(cfg)
-    if not plan.steps:
-        typer.secho("Nothing to do.", fg=typer.colors.GREEN)
-        raise typer.Exit(code=0)
-    typer.echo(plan.pretty())
-    if not assume_yes:
-        proceed = typer.confirm("Apply these changes?", default=False)
-        if not proceed:
+    # Incremental apply: entries recorded by the last successful apply are not re-checked
+    state_file = state_path(file)
+    state = None if refresh_state else State.load(state_file)
+    journal_file = journal_path(file)
+    config_hash = content_hash(cfg.model_dump())
+    if plan_file is not None:
+        if resume:
+            raise typer.BadParameter("cannot be combined with --resume", param_hint="--plan")
+        try:
+            saved = PlanFile.load(plan_file)
+        except PlanFileError as e:
+            typer.secho(str(e), fg=typer.colors.RED)
+            raise typer.Exit(code=1) from None
+        if saved.config_hash != config_hash:
+            typer.secho(f"The config changed since {plan_file} was saved; run diff --out again.", fg=typer.colors.RED)
             raise typer.Exit(code=1)
-    Applier(backend, verbose=verbose).apply(plan, config_dir=file.parent)
+    # Without a confirmation to wait for, parts of the plan are applied while the rest is planned
+    stream = assume_yes and not resume and plan_file is None
+    applied_steps: List[int] = []
+
+    def show_part(part: Plan) -> None:
+        if not applied_steps:
+            typer.echo("Applying changes as they are planned:")
+        applied_steps.append(len(part.steps))
+        typer.echo("\n".join(f"- [{s.kind}] {s.description}" for s in part.steps))
+
+    # Every file is checked, so one edited behind an unchanged note is uploaded too
+    media = config_media(cfg.notes)
+
+    with _profiling(profile, trace) as profiler:
+        # One HTTP session for planning and applying
+        with _load_backend(cfg, verbose=verbose, concurrency=concurrency, base_dir=file.parent, profiler=profiler) as backend:
+
+            def make_applier(journal: Optional[Journal]) -> Applier:
+                return Applier(
+                    backend,
+                    verbose=verbose,
+                    media_state=state.media if state else None,
+                    hash_cache=HashCache.load(),
+                    parallelism=jobs,
+                    fail_fast=not keep_going,
+                    journal=journal,
+                    profiler=profiler,
+                )
+
+            if resume:
+                journal = Journal.load(journal_file)
+                if journal is None:
+                    typer.secho(f"No interrupted apply to resume ({journal_file} not found).", fg=typer.colors.RED)
+                    raise typer.Exit(code=1)
+                if journal.config_hash != config_hash:
+                    journal.close()
+                    typer.secho("The config changed since the interrupted apply; run apply without --resume.", fg=typer.colors.RED)
+                    raise typer.Exit(code=1)
+                optimized = plan = journal.plan.bind(cfg.notes)
+                typer.echo(f"Resuming: {len(journal.completed)} of {len(plan.steps)} steps already applied.")
+            else:
+                if journal_file.exists():
+                    typer.secho(f"Ignoring the journal of an interrupted apply ({journal_file}); use --resume to continue it.", fg=typer.colors.YELLOW)
+                planner = Planner(backend, verbose=verbose, skip_model_validation=skip_model_validation, state=state, profiler=profiler)
+                if plan_file is not None:
+                    # One batched check instead of planning again
+                    if planner.fingerprint(cfg) != saved.collection:
+                        typer.secho(f"Anki changed since {plan_file} was saved; run diff --out again.", fg=typer.colors.RED)
+                        raise typer.Exit(code=1)
+                    plan = saved.plan.bind(cfg.notes)
+                elif stream:
+                    # Collects note ids and the unchanged count as parts are applied
+                    optimized = plan = Plan()
+                else:
+                    plan = planner.build_plan(cfg)
+                if stream:
+                    journal = Journal.create(journal_file, plan, config_hash)
+                else:
+                    if not plan.steps:
+                        if not assume_yes:
+                            # Media edited behind unchanged notes is still a change to confirm
+                            manifest = MediaManifest(backend, file.parent, state.media if state else None, HashCache.load())
+                            pending = manifest.pending(media)
+                            if pending:
+                                typer.echo("No note changes; media files to upload:")
+                                typer.echo("\n".join(f"- {name}" for name in pending))
+                                if not typer.confirm("Upload these media files?", default=False):
+                                    raise typer.Exit(code=1)
+                        applier = make_applier(None)
+                        applier.apply(plan, config_dir=file.parent, media=media)
+                        State.from_config(cfg, plan.note_ids, applier.media.known).save(state_file)
+                        journal_file.unlink(missing_ok=True)
+                        typer.secho(_nothing_to_do(applier), fg=typer.colors.GREEN)
+                        raise typer.Exit(code=0)
+                    typer.echo(plan.pretty())
+                    optimized = optimize_plan(plan)
+                    typer.echo(_request_summary(plan, optimized, cfg.server.batchSize))
+                    if not assume_yes:
+                        proceed = typer.confirm("Apply these changes?", default=False)
+                        if not proceed:
+                            raise typer.Exit(code=1)
+                    journal = Journal.create(journal_file, optimized, config_hash)
+            applier = make_applier(journal)
+            try:
+                if stream:
+                    parts = (optimize_plan(part) for part in planner.iter_plan(cfg))
+                    applier.apply_parts(parts, plan, config_dir=file.parent, on_part=show_part, media=media)
+                else:
+                    applier.apply(optimized, config_dir=file.parent, media=media)
+            except BaseException:
+                journal.close()
+                typer.secho(f"Apply interrupted; progress is saved in {journal_file}. Run apply --resume to continue.", fg=typer.colors.YELLOW, err=True)
+                raise
+        journal.discard()
+        State.from_config(cfg, plan.note_ids, applier.media.known).save(state_file)
+    if stream and not applied_steps:
+        typer.secho(_nothing_to_do(applier), fg=typer.colors.GREEN)
+        return
+    if stream and plan.unchanged:
+        typer.echo(f"{sum(applied_steps)} steps applied, {plan.unchanged} notes unchanged.")
     typer.secho("Apply complete.", fg=typer.colors.GREEN)
 
 
+def _nothing_to_do(applier: Applier) -> str:
+    """Outcome of an apply that had no steps; changed media may still have been uploaded."""
+    if applier.media.uploaded:
+        return f"No note changes; uploaded {applier.media.uploaded} changed media files."
+    return "Nothing to do."
+
+
+@app.command()
+def build(
+    file: Path = typer.Option(..., "-f", "--file", exists=True, readable=True, help="YAML config"),
+    output: Path = typer.Option(..., "-o", "--output", help="Anki package (.apkg) to write"),
+    verbose: bool = typer.Option(False, "-v", "--verbose", help="Show verbose output with detailed progress"),
+) -> None:
+    """Compile the config into an .apkg package for Anki to import, without Anki running."""
+    cfg = load_config(file)
+    try:
+        result = build_package(cfg, output, file.parent, verbose=verbose)
+    except (RuntimeError, FileNotFoundError) as e:
+        typer.secho(f"Build failed: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1) from None
+    typer.secho(
+        f"Wrote {output}: {result.notes} notes, {result.cards} cards, {result.media} media files.",
+        fg=typer.colors.GREEN,
+    )
+    if result.skipped:
+        typer.secho(f"Skipped {result.skipped} empty or duplicate notes.", fg=typer.colors.YELLOW)
+
+
 @app.command()
 def list(
     decks: bool = typer.Option(False, "--decks", help="List decks"),
@@ -92,28 +371,28 @@ def list(
     # Default to listing decks if nothing chosen
     if not any([decks, models, notes_limit]):
         decks = True
-    backend = AnkiConnectBackend(verbose=verbose)
-    if decks:
-        names = backend.list_decks()
-        typer.echo("Decks:")
-        for n in names:
-            typer.echo(f"  - {n}")
-    if models:
-        names = backend.list_models()
-        typer.echo("Models:")
-        for n in names:
-            typer.echo(f"  - {n}")
-    if notes_limit:
-        ids = backend.find_notes("")
-        ids = ids[:notes_limit]
-        if ids:
-            notes = backend.notes_info(ids)
-            typer.echo(f"Notes (showing {len(notes)}):")
-            for ni in notes:
-                model = ni.get("modelName")
-                deck = ni.get("fields", {}).get("Deck", {}).get("value") or ni.get("deckName")
-                fields = {k: v.get("value") for k, v in ni.get("fields", {}).items()}
-                typer.echo(f"  - id={ni['noteId']} model={model} deck={deck} fields={fields}")
+    with AnkiConnectBackend(verbose=verbose) as backend:
+        if decks:
+            names = backend.list_decks()
+            typer.echo("Decks:")
+            for n in names:
+                typer.echo(f"  - {n}")
+        if models:
+            names = backend.list_models()
+            typer.echo("Models:")
+            for n in names:
+                typer.echo(f"  - {n}")
+        if notes_limit:
+            ids = backend.find_notes("")
+            ids = ids[:notes_limit]
+            if ids:
+                notes = backend.notes_info(ids)
+                typer.echo(f"Notes (showing {len(notes)}):")
+                for ni in notes:
+                    model = ni.get("modelName")
+                    deck = ni.get("fields", {}).get("Deck", {}).get("value") or ni.get("deckName")
+                    fields = {k: v.get("value") for k, v in ni.get("fields", {}).items()}
+                    typer.echo(f"  - id={ni['noteId']} model={model} deck={deck} fields={fields}")
 
 
 @app.command()
@@ -141,12 +420,13 @@ def delete(
         typer.echo(f"  - {a}")
     if not yes and not typer.confirm("Proceed?", default=False):
         raise typer.Exit(code=1)
-    if deck:
-        backend.delete_decks([deck], cards_too=cards_too)
-    if model:
-        backend.delete_model(model)
-    if note_query:
-        ids = backend.find_notes(note_query)
-        if ids:
-            backend.delete_notes(ids)
+    with backend:
+        if deck:
+            backend.delete_decks([deck], cards_too=cards_too)
+        if model:
+            backend.delete_model(model)
+        if note_query:
+            ids = backend.find_notes(note_query)
+            if ids:
+                backend.delete_notes(ids)
     typer.secho("Deletion complete.", fg=typer.colors.GREEN)
\ No newline at end of file
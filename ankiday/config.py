@@ -1,15 +1,47 @@
 from __future__ import annotations
 
+import functools
+import glob
+import hashlib
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 
+import pydantic
 import yaml
-from pydantic import BaseModel, Field, ValidationError, field_validator
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+from . import __version__
+from .cache import cache_dir
+
+# libyaml's parser is several times faster; PyYAML may be built without it
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+CONFIG_CACHE_VERSION = 1
 
 
 class Server(BaseModel):
     url: str = Field(default="http://127.0.0.1:8765")
     timeoutSeconds: int = Field(default=30, ge=1, le=300)
+    connectTimeoutSeconds: Optional[float] = Field(default=None, gt=0, le=300, description="Defaults to timeoutSeconds")
+    batchSize: int = Field(default=100, ge=1, le=10000, description="Actions sent per AnkiConnect 'multi' request")
+    maxConnections: int = Field(default=10, ge=1, le=100)
+    maxKeepaliveConnections: int = Field(default=5, ge=0, le=100)
+    keepaliveExpirySeconds: float = Field(default=30.0, ge=0, le=3600)
+    localFiles: Optional[bool] = Field(
+        default=None,
+        description="Whether Anki can read media files by path; defaults to true when url points to this machine",
+    )
+
+
+class Collection(BaseModel):
+    path: str = Field(
+        default="collection.anki2",
+        description="Anki collection file for the 'collection' backend, relative to the config file",
+    )
 
 
 class Template(BaseModel):
@@ -45,7 +77,7 @@ class Note(BaseModel):
     deck: str
     fields: Dict[str, str]
     tags: List[str] = Field(default_factory=list)
-    media: List[str] = Field(default_factory=list, description="List of local file paths to upload as media")
+    media: List[str] = Field(default_factory=list, description="List of local file paths or http(s) URLs to upload as media")
 
 
 class Prune(BaseModel):
@@ -58,18 +90,212 @@ class Config(BaseModel):
     version: int = 1
     backend: str = Field(default="ankiConnect")
     server: Server = Field(default_factory=Server)
+    collection: Collection = Field(default_factory=Collection)
     prune: Prune = Field(default_factory=Prune)
+    include: List[str] = Field(
+        default_factory=list,
+        description="Glob patterns or directories of files with more models, decks and notes, relative to the config file",
+    )
+    models: List[Model] = Field(default_factory=list)
+    decks: List[Deck] = Field(default_factory=list)
+    notes: List[Note] = Field(default_factory=list)
+
+    @field_validator("include", mode="before")
+    @classmethod
+    def include_as_list(cls, v):
+        return [v] if isinstance(v, str) else v
+
+
+class Fragment(BaseModel):
+    """A file listed by ``include``: models, decks and notes only."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    version: int = 1
     models: List[Model] = Field(default_factory=list)
     decks: List[Deck] = Field(default_factory=list)
     notes: List[Note] = Field(default_factory=list)
 
 
-def load_config(path: Path) -> Config:
+def load_config(path: Path, cache: bool = True, workers: Optional[int] = None) -> Config:
+    """Read and validate a YAML config and the files it includes.
+
+    With ``cache``, each validated file is kept in the cache directory and
+    reused while its content, the ankiday version and the pydantic version
+    stay the same, so an unchanged file is neither parsed nor validated
+    again. Included files that are not cached are parsed in a pool of up to
+    ``workers`` processes (default: one per CPU) and merged in path order.
+    """
+    raw, key, cached = _read(path, Config, cache)
+    cfg = _read_cached(cached, key, Config) if cached is not None else None
+    if cfg is None:
+        cfg = _parse(path, raw, key, cached, Config)
+    if not cfg.include:
+        return cfg
+
+    files = _include_files(path, cfg.include)
+    fragments: Dict[Path, Fragment] = {}
+    misses = []
+    for f in files:
+        raw, key, cached = _read(f, Fragment, cache)
+        fragment = _read_cached(cached, key, Fragment) if cached is not None else None
+        if fragment is None:
+            misses.append((f, raw, key, cached))
+        else:
+            fragments[f] = fragment
+    workers = min(len(misses), workers or os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(_parse_fragment, misses))
+    else:
+        parsed = [_parse_fragment(m) for m in misses]
+    fragments.update(zip((m[0] for m in misses), parsed))
+    return _merge(path, cfg, [(f, fragments[f]) for f in files])
+
+
+def _read(path: Path, kind: type, cache: bool) -> Tuple[bytes, str, Optional[Path]]:
+    """The file's content, its cache key and its cache entry (None without ``cache``)."""
     try:
-        data = yaml.safe_load(path.read_text())
-    except Exception as e:
+        raw = path.read_bytes()
+    except OSError as e:
         raise RuntimeError(f"Failed to read YAML: {e}")
+    key = f"{CONFIG_CACHE_VERSION}:{__version__}:{pydantic.VERSION}:{_schema_hash(kind)}:{hashlib.sha1(raw).hexdigest()}"
+    return raw, key, _config_cache_path(path) if cache else None
+
+
+@functools.lru_cache(maxsize=None)
+def _schema_hash(kind: type) -> str:
+    """Hash of the JSON schema of ``kind``.
+
+    Part of the cache key, so entries pickled before a field, default or
+    constraint changed are parsed again even when the version was not bumped.
+    """
+    schema = json.dumps(kind.model_json_schema(), sort_keys=True)
+    return f"{kind.__name__}-{hashlib.sha1(schema.encode('utf-8')).hexdigest()}"
+
+
+def _parse(path: Path, raw: bytes, key: str, cached: Optional[Path], kind: type) -> BaseModel:
+    where = "" if kind is Config else f" in {path}"
     try:
-        return Config.model_validate(data)
+        data = yaml.load(raw, Loader=SafeLoader)
+    except Exception as e:
+        raise RuntimeError(f"Failed to read YAML{where}: {e}")
+    try:
+        result = kind.model_validate({} if data is None and kind is Fragment else data)
     except ValidationError as ve:
-        raise RuntimeError(f"Config validation failed:\n{ve}")
\ No newline at end of file
+        raise RuntimeError(f"Config validation failed{where}:\n{ve}")
+    if cached is not None:
+        _write_cached(cached, key, result)
+    return result
+
+
+def _parse_fragment(miss: Tuple[Path, bytes, str, Optional[Path]]) -> Fragment:
+    # Module level, so it can run in a worker process
+    path, raw, key, cached = miss
+    return _parse(path, raw, key, cached, Fragment)
+
+
+def _include_files(path: Path, patterns: List[str]) -> List[Path]:
+    """Files matched by ``include``, each once, in pattern order and sorted within a pattern."""
+    base = path.parent
+    own = path.resolve()
+    seen = {own}
+    files: List[Path] = []
+    for pattern in patterns:
+        target = base / pattern
+        if target.is_dir():
+            matches = sorted([*target.glob("*.yaml"), *target.glob("*.yml")])
+        else:
+            matches = sorted(Path(m) for m in glob.glob(str(target), recursive=True))
+        if not matches:
+            raise RuntimeError(f"include '{pattern}' matches no files")
+        for m in matches:
+            if m.resolve() not in seen:
+                seen.add(m.resolve())
+                files.append(m)
+    return files
+
+
+def _merge(path: Path, cfg: Config, fragments: List[Tuple[Path, Fragment]]) -> Config:
+    """``cfg`` with the models, decks and notes of its included files appended.
+
+    A model or deck defined in several files must be defined identically; it
+    is kept once. A note with the same deck, model and unique field value in
+    two files is an error. Duplicates within one file, and notes without a
+    unique field value, are left to the planner.
+    """
+    base = path.parent
+
+    def name(p: Path) -> str:
+        return os.path.relpath(p, base)
+
+    models: List[Model] = []
+    decks: List[Deck] = []
+    notes: List[Note] = []
+    model_from: Dict[str, Tuple[Model, Path]] = {}
+    deck_from: Dict[str, Tuple[Deck, Path]] = {}
+    note_from: Dict[Tuple[str, str, str], Path] = {}
+    for source, part in [(path, cfg), *fragments]:
+        for m in part.models:
+            first = model_from.get(m.name)
+            if first is None:
+                model_from[m.name] = (m, source)
+            elif first[1] != source:
+                if first[0] != m:
+                    raise RuntimeError(f"Model '{m.name}' is defined differently in {name(first[1])} and {name(source)}")
+                continue
+            models.append(m)
+        for d in part.decks:
+            first = deck_from.get(d.name)
+            if first is None:
+                deck_from[d.name] = (d, source)
+            elif first[1] != source:
+                if first[0] != d:
+                    raise RuntimeError(f"Deck '{d.name}' is defined differently in {name(first[1])} and {name(source)}")
+                continue
+            decks.append(d)
+    for source, part in [(path, cfg), *fragments]:
+        for n in part.notes:
+            model = model_from.get(n.model)
+            uniq = model[0].uniqueField if model is not None else None
+            if uniq is not None and n.fields.get(uniq):
+                key = (n.deck, n.model, n.fields[uniq])
+                first = note_from.setdefault(key, source)
+                if first != source:
+                    raise RuntimeError(
+                        f"Note {uniq}='{key[2]}' in deck '{n.deck}' model '{n.model}' "
+                        f"is in both {name(first)} and {name(source)}"
+                    )
+            notes.append(n)
+    return cfg.model_copy(update={"models": models, "decks": decks, "notes": notes})
+
+
+def _config_cache_path(path: Path) -> Path:
+    """One cache entry per config file, replaced when the file changes."""
+    name = hashlib.sha1(str(path.resolve()).encode("utf-8")).hexdigest()[:16]
+    return cache_dir() / "configs" / f"{name}.pickle"
+
+
+def _read_cached(cached: Path, key: str, kind: type) -> Optional[BaseModel]:
+    # The key is pickled first, so a stale entry is rejected without loading the config
+    try:
+        with cached.open("rb") as f:
+            if pickle.load(f) != key:
+                return None
+            result = pickle.load(f)
+    except Exception:
+        return None
+    return result if isinstance(result, kind) else None
+
+
+def _write_cached(cached: Path, key: str, result: BaseModel) -> None:
+    # The cache only saves time: failing to write it is not an error
+    tmp = cached.with_name(cached.name + f".{os.getpid()}.tmp")
+    try:
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        with tmp.open("wb") as f:
+            pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cached)
+    except (OSError, pickle.PicklingError):
+        tmp.unlink(missing_ok=True)
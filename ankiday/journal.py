@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import IO, Dict, Iterable, List, Optional, Set
+
+from .ops.apply import Plan, PlanStep
+
+JOURNAL_VERSION = 1
+
+
+def journal_path(config_path: Path) -> Path:
+    """Journal kept next to the config: ``decks.yaml`` -> ``decks.ankiday.journal``."""
+    return config_path.with_suffix(".ankiday.journal")
+
+
+class Journal:
+    """Write-ahead log of one apply, for ``apply --resume``.
+
+    The first line holds the plan being applied and a hash of the config it
+    was built from; a plan applied in parts is appended by ``steps`` lines
+    as each part starts. Before a group of steps is sent, a ``begin`` line lists
+    their 1-based indices; once Anki confirmed them, a ``done`` line lists
+    those that succeeded together with the ids of notes they created. Lines
+    are flushed and synced as they are written, so a crash loses at most the
+    group in flight; a torn last line is ignored on load.
+    """
+
+    def __init__(self, path: Path, plan: Plan, config_hash: str):
+        self.path = path
+        self.plan = plan
+        self.config_hash = config_hash
+        # Steps Anki confirmed, and steps sent without confirmation (in doubt)
+        self.completed: Set[int] = set()
+        self.in_doubt: Set[int] = set()
+        self._file: Optional[IO[str]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, path: Path, plan: Plan, config_hash: str) -> "Journal":
+        """Start a journal for ``plan``, replacing any previous one."""
+        journal = cls(path, plan, config_hash)
+        journal._file = path.open("w", encoding="utf-8")
+        journal._write(
+            {
+                "version": JOURNAL_VERSION,
+                "config": config_hash,
+                "plan": plan.to_dict(compact=True),
+                "noteIds": plan.note_ids,
+            }
+        )
+        return journal
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["Journal"]:
+        """Reopen a journal left by an interrupted apply; None if there is none usable."""
+        try:
+            lines = path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return None
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break  # torn write at the crash point
+        if not records or records[0].get("version") != JOURNAL_VERSION:
+            return None
+
+        header = records[0]
+        plan = Plan.from_dict(header["plan"])
+        plan.note_ids.update(header.get("noteIds", {}))
+        journal = cls(path, plan, header.get("config", ""))
+        begun: Set[int] = set()
+        for record in records[1:]:
+            plan.steps.extend(PlanStep.from_dict(s) for s in record.get("steps", []))
+            begun.update(record.get("begin", []))
+            journal.completed.update(record.get("done", []))
+            plan.note_ids.update(record.get("noteIds", {}))
+        journal.in_doubt = begun - journal.completed
+        journal._file = path.open("a", encoding="utf-8")
+        return journal
+
+    def _write(self, record: dict) -> None:
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def extend(self, steps: List[PlanStep], note_ids: Optional[Dict[str, int]] = None) -> None:
+        """Append steps to the journaled plan, for plans applied in parts.
+
+        They are numbered after the steps already journaled. The steps are
+        written, not kept: only a resumed journal holds the whole plan.
+        """
+        record: dict = {"steps": [s.to_dict(compact=True) for s in steps]}
+        if note_ids:
+            record["noteIds"] = note_ids
+        self._write(record)
+
+    def begin(self, steps: Iterable[int]) -> None:
+        self._write({"begin": sorted(steps)})
+
+    def commit(self, steps: Iterable[int], note_ids: Optional[Dict[str, int]] = None) -> None:
+        steps = sorted(steps)
+        record: dict = {"done": steps}
+        if note_ids:
+            record["noteIds"] = note_ids
+        self._write(record)
+        with self._lock:
+            self.completed.update(steps)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self) -> None:
+        """Close and delete the journal after a successful apply."""
+        self.close()
+        self.path.unlink(missing_ok=True)
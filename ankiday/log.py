@@ -0,0 +1,130 @@
+"""Verbose output through :mod:`logging`.
+
+Each component logs to its own ``ankiday.*`` logger and prints
+``[PREFIX] message`` lines on stdout, as the ``-v`` output always looked.
+Messages use ``%`` arguments so nothing is formatted unless the line is
+emitted. Backend payloads go through :class:`LogPayload`, which formats them
+only when logged and then truncates long strings and lists and replaces
+base64 media with its size.
+
+The log level selects how much ``-v`` shows: ``info`` keeps the progress
+of planning and applying, ``debug`` (the default) adds every backend call,
+and ``trace`` logs backend payloads in full.
+"""
+
+from __future__ import annotations
+
+import logging
+import sys
+from typing import Any, Dict, Optional
+
+TRACE = 5
+logging.addLevelName(TRACE, "TRACE")
+
+LEVELS: Dict[str, int] = {
+    "trace": TRACE,
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+}
+
+# Line prefix of each component logger
+PREFIXES: Dict[str, str] = {
+    "ankiday.ankiconnect": "VERBOSE",
+    "ankiday.collection": "COLLECTION",
+    "ankiday.planner": "PLANNER",
+    "ankiday.applier": "APPLIER",
+    "ankiday.media": "MEDIA",
+}
+
+# Payload truncation limits
+MAX_STRING = 120
+MAX_ITEMS = 10
+MAX_LENGTH = 2000
+
+root = logging.getLogger("ankiday")
+_level: Optional[int] = None
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to the current ``sys.stdout``, even when it is replaced after setup."""
+
+    def __init__(self) -> None:
+        super().__init__(sys.stdout)
+
+    @property  # type: ignore[override]
+    def stream(self) -> Any:
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value: Any) -> None:
+        pass
+
+
+class _PrefixFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        prefix = PREFIXES.get(record.name, record.name.rsplit(".", 1)[-1].upper())
+        return f"[{prefix}] {record.getMessage()}"
+
+
+def get_logger(component: str) -> logging.Logger:
+    return logging.getLogger(f"ankiday.{component}")
+
+
+def _install_handler() -> None:
+    if not any(isinstance(h, _StdoutHandler) for h in root.handlers):
+        handler = _StdoutHandler()
+        handler.setFormatter(_PrefixFormatter())
+        root.addHandler(handler)
+        # Verbose lines are output, not diagnostics for the application's own logging
+        root.propagate = False
+
+
+def set_level(name: str) -> None:
+    """Select how much verbose output shows (``--log-level``)."""
+    global _level
+    _level = LEVELS[name.lower()]
+    root.setLevel(_level)
+    _install_handler()
+
+
+def enable_verbose() -> None:
+    """Print verbose output; called by components created with ``verbose=True``."""
+    _install_handler()
+    root.setLevel(_level if _level is not None else logging.DEBUG)
+
+
+def _shorten(value: Any, full: bool) -> Any:
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, str):
+        if full or len(value) <= MAX_STRING:
+            return value
+        return f"{value[:MAX_STRING]}... ({len(value)} chars)"
+    if isinstance(value, dict):
+        return {
+            k: f"<base64, {len(v)} chars>" if k == "data" and isinstance(v, str) and not full else _shorten(v, full)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        items = [_shorten(v, full) for v in (value if full else value[:MAX_ITEMS])]
+        if not full and len(value) > MAX_ITEMS:
+            items.append(f"... ({len(value) - MAX_ITEMS} more)")
+        return items
+    return value
+
+
+class LogPayload:
+    """Backend params or results, formatted only when a log line is emitted."""
+
+    __slots__ = ("value", "logger")
+
+    def __init__(self, value: Any, logger: logging.Logger):
+        self.value = value
+        self.logger = logger
+
+    def __str__(self) -> str:
+        if self.logger.isEnabledFor(TRACE):
+            return str(_shorten(self.value, full=True))
+        text = str(_shorten(self.value, full=False))
+        return text if len(text) <= MAX_LENGTH else f"{text[:MAX_LENGTH]}... ({len(text)} chars)"
@@ -1,3 +1,5 @@
 from .apply import Planner, Applier, Plan, PlanStep
+from .build import build_package
+from .optimize import optimize_plan
 
-__all__ = ["Planner", "Applier", "Plan", "PlanStep"]
\ No newline at end of file
+__all__ = ["Planner", "Applier", "Plan", "PlanStep", "build_package", "optimize_plan"]
@@ -1,60 +1,275 @@
 from __future__ import annotations
 
 import os
+import threading
+import unicodedata
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List
+from functools import partial
+from collections import Counter
+from itertools import groupby
+from queue import Full, Queue
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 from ..config import Config, Model, Deck, Note
-from ..backends.base import Backend
+from ..backends.base import Backend, Batch, Deferred
+from ..cache import HashCache
+from ..log import enable_verbose, get_logger
+from ..profile import Profiler, span
+from ..state import State, content_hash, note_key
+from .executor import DagExecutor, Task
+from .media import MediaManifest
+# Public before media handling moved to ops.media; kept for callers importing it from here
+from .media import process_media_files  # noqa: F401
+
+planner_logger = get_logger("planner")
+applier_logger = get_logger("applier")
+
+if TYPE_CHECKING:
+    from ..journal import Journal
+
+
+# Note ids per notesInfo call when indexing existing notes
+NOTES_INFO_CHUNK_SIZE = 500
+# Notes per addNotes / canAddNotesWithErrorDetail call when creating notes
+ADD_NOTES_CHUNK_SIZE = 500
+# Planned parts waiting to be applied when planning and applying overlap
+STREAM_QUEUE_SIZE = 4
+
+
+def normalize_field(value: str) -> str:
+    """Normalize a field value the way Anki stores it (Unicode NFC)."""
+    return unicodedata.normalize("NFC", value)
+
+
+def fields_differ(desired: Dict[str, str], current: Dict[str, dict]) -> bool:
+    """Whether writing ``desired`` would change a note whose notesInfo fields are ``current``.
+
+    Only fields set in the config are compared; updateNoteFields leaves the others alone.
+    """
+    for name, value in desired.items():
+        if name not in current:
+            return True
+        if normalize_field(value) != normalize_field(current[name].get("value", "")):
+            return True
+    return False
+
+
+def escape_search(value: str) -> str:
+    """Escape a literal value for use inside a quoted Anki search term."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("*", "\\*").replace("_", "\\_")
+
+
+def scope_query(deck: str, model: str) -> str:
+    """Search for notes of ``model`` in ``deck`` and its subdecks, like Anki's ``deck:`` search.
+
+    Notes a user moved into a subdeck are still found and matched, instead of
+    being planned as additions that Anki refuses as duplicates.
+    """
+    return f'"deck:{escape_search(deck)}" "note:{escape_search(model)}"'
 
 
-@dataclass
 class PlanStep:
-    kind: str
-    description: str
-    payload: dict
+    """One planned change.
+
+    A step planned from a config note keeps a reference to that
+    :class:`Note` instead of a copy. Its payload records the note's position
+    in ``Config.notes`` as ``index``, so a serialized plan stays small and is
+    re-attached to the loaded config with :meth:`Plan.bind`. Without an
+    explicit description, the description is rendered from the step when
+    read, so a large plan holds no description strings.
+    """
+
+    __slots__ = ("kind", "payload", "note", "_description")
+
+    def __init__(self, kind: str, description: Optional[str], payload: dict, note: Optional[Note] = None):
+        self.kind = kind
+        self.payload = payload
+        self.note = note
+        self._description = description
+
+    @property
+    def description(self) -> str:
+        return self._description if self._description is not None else _describe(self)
+
+    @description.setter
+    def description(self, value: str) -> None:
+        self._description = value
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PlanStep):
+            return NotImplemented
+        return (self.kind, self.description, self.payload) == (other.kind, other.description, other.payload)
+
+    def __repr__(self) -> str:
+        return f"PlanStep({self.kind!r}, {self.description!r}, {self.payload!r})"
+
+    def note_attr(self, name: str) -> object:
+        """An attribute of the step's config note, e.g. ``deck`` or ``media``."""
+        if self.note is not None:
+            return getattr(self.note, name)
+        return self.payload["note"].get(name)
+
+    def note_data(self) -> dict:
+        """The note as a ``{"model", "deck", "fields", "tags", ...}`` dict for the backend."""
+        if self.note is not None:
+            return self.note.model_dump()
+        return self.payload["note"]
+
+    def to_dict(self, compact: bool = False) -> dict:
+        """The step as JSON data; ``compact`` keeps note references as indices."""
+        data: dict = {"kind": self.kind}
+        if not compact or self._description is not None:
+            data["description"] = self.description
+        if compact or self.note is None:
+            data["payload"] = self.payload
+        else:
+            data["payload"] = {**self.payload, "note": self.note.model_dump()}
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PlanStep":
+        """Inverse of :meth:`to_dict`; compact steps need :meth:`Plan.bind`."""
+        return cls(data["kind"], data.get("description"), data["payload"])
+
+
+def _describe(s: PlanStep) -> str:
+    """Description of a step planned from a config note."""
+    n = s.note
+    if n is None:
+        return f"{s.kind} for config note #{s.payload.get('index')}"
+    media_desc = f" with {len(n.media)} media files" if n.media else ""
+    if s.kind == "note.add":
+        uniq = s.payload.get("uniq")
+        if uniq is None:
+            return f"Add note to deck '{n.deck}' model '{n.model}' (model validation skipped){media_desc}"
+        return f"Add note to deck '{n.deck}' model '{n.model}' keyed by {uniq}='{n.fields.get(uniq)}'{media_desc}"
+    if s.kind == "note.update":
+        return f"Update note id={s.payload['id']} in deck '{n.deck}' model '{n.model}'{media_desc}"
+    return f"{s.kind} for note in deck '{n.deck}' model '{n.model}'"
 
 
 @dataclass
 class Plan:
     steps: List[PlanStep] = field(default_factory=list)
+    # Existing notes whose fields already match the config
+    unchanged: int = 0
+    # Anki ids of managed notes by note key; the applier adds ids of created notes
+    note_ids: Dict[str, int] = field(default_factory=dict)
 
-    def add(self, kind: str, description: str, payload: dict) -> None:
-        self.steps.append(PlanStep(kind, description, payload))
+    def add(self, kind: str, description: Optional[str], payload: dict, note: Optional[Note] = None) -> None:
+        self.steps.append(PlanStep(kind, description, payload, note))
 
-    def to_dict(self) -> dict:
-        return {"steps": [s.__dict__ for s in self.steps]}
+    def to_dict(self, compact: bool = False) -> dict:
+        return {"steps": [s.to_dict(compact) for s in self.steps], "unchanged": self.unchanged}
 
-    def pretty(self) -> str:
+    @classmethod
+    def from_dict(cls, data: dict) -> "Plan":
+        """Inverse of :meth:`to_dict`."""
+        steps = [PlanStep.from_dict(s) for s in data.get("steps", [])]
+        return cls(steps=steps, unchanged=data.get("unchanged", 0))
+
+    def bind(self, notes: Sequence[Note]) -> "Plan":
+        """Re-attach loaded steps to the config notes they were planned from.
+
+        ``notes`` must be the ``notes`` of the config the plan was built from.
+        """
+        for s in self.steps:
+            for p in s.payload.get("notes", [s.payload]):
+                if "index" in p and s.note is None:
+                    s.note = notes[p["index"]]
+        return self
+
+    def counts(self) -> Dict[str, int]:
+        """Number of steps of each kind."""
+        return dict(Counter(s.kind for s in self.steps))
+
+    def lines(self) -> Iterator[str]:
+        """The lines of :meth:`pretty`, rendered one at a time."""
         if not self.steps:
-            return "No changes."
-        lines = ["Planned changes:"]
+            yield f"No changes. ({self.unchanged} notes unchanged.)" if self.unchanged else "No changes."
+            return
+        yield "Planned changes:"
         for s in self.steps:
-            lines.append(f"- [{s.kind}] {s.description}")
-        return "\n".join(lines)
+            yield f"- [{s.kind}] {s.description}"
+        if self.unchanged:
+            yield f"{self.unchanged} notes unchanged."
+
+    def pretty(self) -> str:
+        return "\n".join(self.lines())
 
 
 class Planner:
-    def __init__(self, backend: Backend, verbose: bool = False, skip_model_validation: bool = False):
+    def __init__(
+        self,
+        backend: Backend,
+        verbose: bool = False,
+        skip_model_validation: bool = False,
+        notes_info_chunk_size: int = NOTES_INFO_CHUNK_SIZE,
+        state: Optional[State] = None,
+        profiler: Optional[Profiler] = None,
+    ):
         self.backend = backend
         self.verbose = verbose
+        if verbose:
+            enable_verbose()
         self.skip_model_validation = skip_model_validation
+        self.notes_info_chunk_size = notes_info_chunk_size
+        # State of the last successful apply; entries it vouches for are not re-checked
+        self.state = state
+        self.profiler = profiler
     
-    def _log_verbose(self, message: str) -> None:
+    def _log_verbose(self, message: str, *args: object) -> None:
         """Log message if verbose mode is enabled."""
         if self.verbose:
-            print(f"[PLANNER] {message}")
+            planner_logger.info(message, *args)
 
     def build_plan(self, cfg: Config) -> Plan:
         self._log_verbose("Starting plan generation")
         plan = Plan()
+        with span(self.profiler, "plan.decks"):
+            self._plan_decks(plan, cfg)
+        with span(self.profiler, "plan.models"):
+            self._plan_models(plan, cfg)
+        with span(self.profiler, "plan.notes", notes=len(cfg.notes)):
+            self._plan_notes(plan, cfg)
+        self._log_verbose("Plan generation complete. Generated %s steps, %s notes unchanged", len(plan.steps), plan.unchanged)
+        return plan
+
+    def fingerprint(self, cfg: Config) -> str:
+        """Hash of what Anki holds for ``cfg``: its decks, models, the templates
+        and CSS of the config's models and the ids of the notes in each
+        (deck, model) pair the config uses.
 
-        # Decks
+        Costs one batched round trip, so a saved plan can be checked against
+        the collection without planning again. Edits to the fields of existing
+        notes do not change it.
+        """
+        pairs = sorted({(n.deck, n.model) for n in cfg.notes})
+        names = sorted({m.name for m in cfg.models})
+        with self.backend.batch() as batch:
+            decks = batch.list_decks()
+            models = batch.list_models()
+            looks = [(batch.model_templates(name), batch.model_styling(name)) for name in names]
+            searches = [batch.find_notes(scope_query(*pair)) for pair in pairs]
+        return content_hash(
+            {
+                "decks": sorted(decks.result()),
+                "models": sorted(models.result()),
+                # A model missing from Anki fails its lookups; it hashes as None
+                "looks": [
+                    [name, *(None if d.error else d.result() for d in lookups)]
+                    for name, lookups in zip(names, looks)
+                ],
+                "notes": [[deck, model, sorted(s.result())] for (deck, model), s in zip(pairs, searches)],
+            }
+        )
+
+    def _plan_decks(self, plan: Plan, cfg: Config) -> None:
         self._log_verbose("Analyzing deck configuration")
         existing_decks = set(self.backend.list_decks())
         desired_decks = {d.name for d in cfg.decks}
-        self._log_verbose(f"Found {len(existing_decks)} existing decks, {len(desired_decks)} desired decks")
+        self._log_verbose("Found %s existing decks, %s desired decks", len(existing_decks), len(desired_decks))
         for d in sorted(desired_decks - existing_decks):
             plan.add("deck.create", f"Create deck '{d}'", {"name": d})
         if cfg.prune.decks:
@@ -63,12 +278,34 @@ class Planner:
                     continue
                 plan.add("deck.delete", f"Delete unmanaged deck '{d}'", {"name": d, "cardsToo": False})
 
-        # Models
+    def _plan_models(self, plan: Plan, cfg: Config) -> None:
         self._log_verbose("Analyzing model configuration")
         existing_models = set(self.backend.list_models())
         desired_models = {m.name for m in cfg.models}
-        self._log_verbose(f"Found {len(existing_models)} existing models, {len(desired_models)} desired models")
+        self._log_verbose("Found %s existing models, %s desired models", len(existing_models), len(desired_models))
+        applied_models = {
+            m.name
+            for m in cfg.models
+            if self.state is not None
+            and m.name in existing_models
+            and self.state.models.get(m.name) == content_hash(m.model_dump())
+        }
+        if applied_models:
+            self._log_verbose("Skipping %s models unchanged since the last apply", len(applied_models))
+        # Fetch fields, templates and CSS of all existing models in one batched round trip
+        with self.backend.batch() as batch:
+            current = {
+                m.name: (
+                    batch.model_field_names(m.name),
+                    batch.model_templates(m.name),
+                    batch.model_styling(m.name),
+                )
+                for m in cfg.models
+                if m.name in existing_models and m.name not in applied_models
+            }
         for m in cfg.models:
+            if m.name in applied_models:
+                continue
             if m.name not in existing_models:
                 plan.add(
                     "model.create",
@@ -82,207 +319,590 @@ class Planner:
                     },
                 )
             else:
+                fields_lookup, templates_lookup, styling_lookup = current[m.name]
                 # Check fields (simple: ensure all exist; field removal not automated)
-                current_fields = self.backend.model_field_names(m.name)
+                current_fields = fields_lookup.result()
                 if current_fields != m.fields:
                     plan.add(
                         "model.note",
                         f"Model '{m.name}' field order differs (current={current_fields} desired={m.fields}); manual intervention may be required",
                         {"name": m.name},
                     )
-                plan.add(
-                    "model.updateTemplates",
-                    f"Update templates for model '{m.name}'",
-                    {"name": m.name, "templates": [t.model_dump() for t in m.templates]},
-                )
-                plan.add(
-                    "model.updateStyling",
-                    f"Update CSS for model '{m.name}'",
-                    {"name": m.name, "css": m.css},
-                )
+                desired_templates = {t.name: {"Front": t.qfmt, "Back": t.afmt} for t in m.templates}
+                # Templates only in Anki are left alone: updateModelTemplates cannot remove them
+                current_templates = templates_lookup.result()
+                if any(current_templates.get(name) != t for name, t in desired_templates.items()):
+                    plan.add(
+                        "model.updateTemplates",
+                        f"Update templates for model '{m.name}'",
+                        {"name": m.name, "templates": [t.model_dump() for t in m.templates]},
+                    )
+                if styling_lookup.result() != m.css:
+                    plan.add(
+                        "model.updateStyling",
+                        f"Update CSS for model '{m.name}'",
+                        {"name": m.name, "css": m.css},
+                    )
         if cfg.prune.models:
             for m in sorted(existing_models - desired_models):
                 plan.add("model.delete", f"Delete unmanaged model '{m}'", {"name": m})
 
-        # Notes
-        self._log_verbose(f"Analyzing note configuration ({len(cfg.notes)} notes)")
-        
+    def _plan_notes(self, plan: Plan, cfg: Config) -> None:
+        self._log_verbose("Analyzing note configuration (%s notes)", len(cfg.notes))
+        models_by_name, existing_anki_models, fresh, pairs = self._note_scope(cfg)
+        index = self._index_notes(pairs, models_by_name)
+        for i, n in enumerate(cfg.notes):
+            self._plan_note(plan, i, n, models_by_name.get(n.model), existing_anki_models, fresh.get(i), index)
+
+    def iter_plan(self, cfg: Config) -> Iterator[Plan]:
+        """Plan ``cfg`` in parts, each ready to apply as soon as it is yielded.
+
+        Deck steps come first, then model steps, then notes that need no
+        lookup in Anki, then one part per (deck, model) pair. The notes of
+        all pairs are searched in one batch; each pair's notes are read just
+        before its part is planned. Every part carries its own steps,
+        unchanged count and note ids. Within a pair, steps keep config order;
+        across pairs the order differs from :meth:`build_plan`.
+        """
+        self._log_verbose("Starting plan generation in parts")
+        part = Plan()
+        with span(self.profiler, "plan.decks"):
+            self._plan_decks(part, cfg)
+        yield part
+        part = Plan()
+        with span(self.profiler, "plan.models"):
+            self._plan_models(part, cfg)
+        yield part
+
+        self._log_verbose("Analyzing note configuration (%s notes)", len(cfg.notes))
+        models_by_name, existing_anki_models, fresh, pairs = self._note_scope(cfg)
+        by_pair: Dict[Tuple[str, str], List[int]] = {pair: [] for pair in pairs}
+        part = Plan()
+        for i, n in enumerate(cfg.notes):
+            if i not in fresh and (n.deck, n.model) in by_pair:
+                by_pair[(n.deck, n.model)].append(i)
+            else:
+                self._plan_note(part, i, n, models_by_name.get(n.model), existing_anki_models, fresh.get(i), {})
+        yield part
+
+        searches = self._find_notes(pairs)
+        for pair in pairs:
+            part = Plan()
+            with span(self.profiler, "plan.notes", deck=pair[0], model=pair[1], notes=len(by_pair[pair])):
+                index = self._index_notes([pair], models_by_name, searches)
+                for i in by_pair[pair]:
+                    n = cfg.notes[i]
+                    self._plan_note(part, i, n, models_by_name[n.model], existing_anki_models, None, index)
+            yield part
+
+    def _note_scope(
+        self, cfg: Config
+    ) -> Tuple[Dict[str, Model], Set[str], Dict[int, int], List[Tuple[str, str]]]:
+        """Models by name, models in Anki (when validation is skipped), notes the
+        state file vouches for, and the (deck, model) pairs to read from Anki."""
         # Get existing models from Anki if we're skipping validation
         existing_anki_models = set(self.backend.list_models()) if self.skip_model_validation else set()
-        
-        for n in cfg.notes:
-            # We require model's uniqueField to upsert
-            model_cfg = next((m for m in cfg.models if m.name == n.model), None)
-            
-            if not model_cfg:
-                if self.skip_model_validation and n.model in existing_anki_models:
-                    # Model exists in Anki but not in config - skip validation and add note without unique field check
-                    # We'll let AnkiConnect handle any errors during actual note creation
-                    self._log_verbose(f"Skipping model validation for '{n.model}' - assuming it exists in Anki")
-                    note_data = n.model_dump()
-                    media_desc = f" with {len(n.media)} media files" if n.media else ""
-                    plan.add(
-                        "note.add",
-                        f"Add note to deck '{n.deck}' model '{n.model}' (model validation skipped){media_desc}",
-                        {"note": note_data},
-                    )
-                    continue
-                else:
-                    plan.add(
-                        "note.error",
-                        f"Note targets unknown model '{n.model}'",
-                        {"note": n.model_dump()},
-                    )
-                    continue
-                    
-            uniq = model_cfg.uniqueField
-            uniq_val = n.fields.get(uniq)
-            if not uniq_val:
-                plan.add(
-                    "note.error",
-                    f"Note missing unique field '{uniq}' for model '{n.model}'",
-                    {"note": n.model_dump()},
-                )
-                continue
-            # Quote the unique value if it contains spaces or special characters
-            if ' ' in uniq_val or any(c in uniq_val for c in ['"', "'", ':']):
-                quoted_val = f'"{uniq_val}"'
-            else:
-                quoted_val = uniq_val
 
-            # Quote deck name if it contains spaces or colons (Anki search syntax)
-            if ' ' in n.deck or '::' in n.deck:
-                deck_part = f'"deck:{n.deck}"'
-            else:
-                deck_part = f'deck:{n.deck}'
+        models_by_name = {m.name: m for m in cfg.models}
+        fresh = self._applied_notes(cfg, models_by_name) if self.state is not None else {}
+        pairs = sorted({(n.deck, n.model) for i, n in enumerate(cfg.notes) if n.model in models_by_name and i not in fresh})
+        return models_by_name, existing_anki_models, fresh, pairs
 
-            # Quote model name if it contains spaces
-            if ' ' in n.model:
-                note_part = f'"note:{n.model}"'
-            else:
-                note_part = f'note:{n.model}'
+    def _plan_note(
+        self,
+        plan: Plan,
+        i: int,
+        n: Note,
+        model_cfg: Optional[Model],
+        existing_anki_models: Set[str],
+        fresh_id: Optional[int],
+        index: Dict[Tuple[str, str], Dict[str, dict]],
+    ) -> None:
+        """Plan config note ``i`` against the indexed notes of its pair.
 
-            query = f'{deck_part} {note_part} {uniq}:{quoted_val}'
-            ids = self.backend.find_notes(query)
-            if not ids:
-                note_data = n.model_dump()
-                media_desc = f" with {len(n.media)} media files" if n.media else ""
-                plan.add(
-                    "note.add",
-                    f"Add note to deck '{n.deck}' model '{n.model}' keyed by {uniq}='{uniq_val}'{media_desc}",
-                    {"note": note_data},
-                )
+        ``fresh_id`` is the note's id when the state file vouches for it.
+        Note steps reference ``n`` and describe themselves when read.
+        """
+        # We require model's uniqueField to upsert
+        if not model_cfg:
+            if self.skip_model_validation and n.model in existing_anki_models:
+                # Model exists in Anki but not in config - skip validation and add note without unique field check
+                # We'll let AnkiConnect handle any errors during actual note creation
+                self._log_verbose("Skipping model validation for '%s' - assuming it exists in Anki", n.model)
+                plan.add("note.add", None, {"index": i}, n)
             else:
-                # If multiple, update first and warn
-                note_id = ids[0]
-                media_desc = f" with {len(n.media)} media files" if n.media else ""
-                plan.add(
-                    "note.update",
-                    f"Update note id={note_id} in deck '{n.deck}' model '{n.model}'{media_desc}",
-                    {"id": note_id, "fields": n.fields, "media": n.media},
-                )
-        # Prune notes not in config is optional and coarse; omitted for brevity or future work
-        # It can be implemented by querying all notes in target decks/models and subtracting the upsert keys from config.
+                plan.add("note.error", f"Note targets unknown model '{n.model}'", {"index": i}, n)
+            return
 
-        self._log_verbose(f"Plan generation complete. Generated {len(plan.steps)} steps")
-        return plan
+        uniq = model_cfg.uniqueField
+        uniq_val = n.fields.get(uniq)
+        if not uniq_val:
+            plan.add("note.error", f"Note missing unique field '{uniq}' for model '{n.model}'", {"index": i}, n)
+            return
 
+        key = note_key(n.deck, n.model, uniq_val)
+        if fresh_id is not None:
+            plan.unchanged += 1
+            plan.note_ids[key] = fresh_id
+            return
 
-def process_media_files(backend: Backend, media_paths: List[str], config_dir: Path, verbose: bool = False) -> Dict[str, str]:
-    """Process media files and return mapping of original paths to Anki filenames."""
-    def _log_verbose(message: str) -> None:
-        if verbose:
-            print(f"[MEDIA] {message}")
-    
-    _log_verbose(f"Processing {len(media_paths)} media files")
-    media_mapping = {}
-
-    for media_path in media_paths:
-        _log_verbose(f"Processing media file: {media_path}")
-        # Convert to Path and handle relative paths
-        path = Path(media_path)
-        if not path.is_absolute():
-            path = config_dir / path
-
-        if not path.exists():
-            raise FileNotFoundError(f"Media file not found: {media_path} (resolved to {path})")
-
-        # Read file content
-        with path.open('rb') as f:
-            file_data = f.read()
-
-        # Generate a unique filename (preserve extension)
-        filename = path.name
-
-        # Check if file already exists in Anki
-        existing_files = backend.get_media_files_names(filename)
-        if filename not in existing_files:
-            # Upload the file
-            _log_verbose(f"Uploading new media file: {filename}")
-            stored_name = backend.store_media_file(filename, file_data)
-            media_mapping[media_path] = stored_name
-            _log_verbose(f"Media file uploaded successfully as: {stored_name}")
+        existing = index[(n.deck, n.model)].get(normalize_field(uniq_val))
+        if existing is None:
+            plan.add("note.add", None, {"index": i, "key": key, "uniq": uniq}, n)
+            return
+
+        note_id = existing["noteId"]
+        plan.note_ids[key] = note_id
+        if not fields_differ(n.fields, existing.get("fields", {})):
+            plan.unchanged += 1
         else:
-            # File already exists, use existing name
-            _log_verbose(f"Media file already exists in Anki: {filename}")
-            media_mapping[media_path] = filename
+            plan.add(
+                "note.update",
+                None,
+                {"id": note_id, "deck": n.deck, "fields": n.fields, "media": n.media, "index": i},
+                n,
+            )
+
+    def _applied_notes(self, cfg: Config, models: Dict[str, Model]) -> Dict[int, int]:
+        """Notes the state file vouches for, by position in ``cfg.notes``.
+
+        A note qualifies when its content hash equals the one recorded at the
+        last apply and its recorded id still exists in Anki (one batched
+        ``nid:`` search per chunk of ids).
+        """
+        candidates: Dict[int, int] = {}
+        for i, n in enumerate(cfg.notes):
+            model_cfg = models.get(n.model)
+            uniq_val = n.fields.get(model_cfg.uniqueField) if model_cfg else None
+            if not uniq_val:
+                continue
+            note_id = self.state.note_id(note_key(n.deck, n.model, uniq_val), content_hash(n.model_dump()))
+            if note_id is not None:
+                candidates[i] = note_id
+
+        ids = sorted(set(candidates.values()))
+        with self.backend.batch() as batch:
+            searches = [
+                batch.find_notes("nid:" + ",".join(str(nid) for nid in ids[j : j + self.notes_info_chunk_size]))
+                for j in range(0, len(ids), self.notes_info_chunk_size)
+            ]
+        alive = {nid for search in searches for nid in search.result()}
+        self._log_verbose("State file covers %s notes, %s still present in Anki", len(candidates), len(alive))
+        return {i: nid for i, nid in candidates.items() if nid in alive}
+
+    def _find_notes(self, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Deferred]:
+        """Ids of the existing notes of each (deck, model) pair, in one batch."""
+        with self.backend.batch() as batch:
+            return {pair: batch.find_notes(scope_query(*pair)) for pair in pairs}
+
+    def _index_notes(
+        self,
+        pairs: List[Tuple[str, str]],
+        models: Dict[str, Model],
+        searches: Optional[Dict[Tuple[str, str], Deferred]] = None,
+    ) -> Dict[Tuple[str, str], Dict[str, dict]]:
+        """Index existing notes of each (deck, model) pair by their unique-field value.
+
+        Costs one findNotes per pair plus chunked notesInfo calls, all batched,
+        instead of one search per config note. ``searches`` from
+        :meth:`_find_notes` saves the findNotes calls.
+        """
+        if searches is None:
+            searches = self._find_notes(pairs)
+
+        chunks = []
+        with self.backend.batch() as batch:
+            for pair in pairs:
+                ids = _pair_note_ids(pair, searches)
+                self._log_verbose("Found %s existing notes in deck '%s' model '%s'", len(ids), pair[0], pair[1])
+                for i in range(0, len(ids), self.notes_info_chunk_size):
+                    chunks.append((pair, batch.notes_info(ids[i : i + self.notes_info_chunk_size])))
 
-    _log_verbose(f"Media processing completed. Processed {len(media_mapping)} files")
-    return media_mapping
+        index: Dict[Tuple[str, str], Dict[str, dict]] = {pair: {} for pair in pairs}
+        for pair, info in chunks:
+            uniq = models[pair[1]].uniqueField
+            for note_info in info.result():
+                value = note_info.get("fields", {}).get(uniq, {}).get("value")
+                if value:
+                    # On duplicates the first (oldest) note wins, like the former findNotes lookup
+                    index[pair].setdefault(normalize_field(value), note_info)
+        return index
+
+
+def _pair_note_ids(pair: Tuple[str, str], searches: Dict[Tuple[str, str], Deferred]) -> List[int]:
+    """Ids found for ``pair``, less those found for a managed subdeck with the same model.
+
+    A deck search includes subdecks, so a note in ``A::B`` is matched
+    against the notes the config puts in ``A::B`` when both decks are managed.
+    """
+    deck, model = pair
+    prefix = deck.lower() + "::"
+    claimed: Set[int] = set()
+    for (d, m), search in searches.items():
+        if m == model and d.lower().startswith(prefix):
+            claimed.update(search.result())
+    return [i for i in searches[pair].result() if i not in claimed]
+
+
+class _PlanningFailed:
+    """Carries an exception from the planning thread to the applier."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _step_deck(s: PlanStep) -> Optional[str]:
+    """Deck a note step writes to, when the step records it."""
+    if s.kind == "note.add":
+        return s.note_attr("deck")
+    return s.payload.get("deck")
+
+
+def _group_kind(kind: str) -> str:
+    """Applier batching group of a step kind: its entity, with note additions on their own."""
+    return kind if kind == "note.add" else kind.split(".")[0]
 
 
 class Applier:
-    def __init__(self, backend: Backend, verbose: bool = False):
+    def __init__(
+        self,
+        backend: Backend,
+        verbose: bool = False,
+        media_state: Optional[Dict[str, str]] = None,
+        hash_cache: Optional[HashCache] = None,
+        add_notes_chunk_size: int = ADD_NOTES_CHUNK_SIZE,
+        parallelism: int = 1,
+        fail_fast: bool = True,
+        journal: Optional["Journal"] = None,
+        profiler: Optional[Profiler] = None,
+    ):
         self.backend = backend
         self.verbose = verbose
+        if verbose:
+            enable_verbose()
+        self.add_notes_chunk_size = add_notes_chunk_size
+        # Independent parts of the plan applied at once, and whether the first
+        # failure stops parts that have not started yet
+        self.parallelism = parallelism
+        self.fail_fast = fail_fast
+        # Write-ahead journal; steps it records as completed are skipped
+        self.journal = journal
+        self.profiler = profiler
+        # Anki filename -> content hash last uploaded, from the state file
+        self.media_state = media_state
+        self.hash_cache = hash_cache
+        self.media: Optional[MediaManifest] = None
     
-    def _log_verbose(self, message: str) -> None:
+    def _log_verbose(self, message: str, *args: object) -> None:
         """Log message if verbose mode is enabled."""
         if self.verbose:
-            print(f"[APPLIER] {message}")
+            applier_logger.info(message, *args)
 
-    def apply(self, plan: Plan, config_dir: Path = None) -> None:
+    def apply(self, plan: Plan, config_dir: Path = None, media: Iterable[str] = ()) -> None:
+        """Apply ``plan``.
+
+        ``media`` lists media paths to check and upload when changed even if
+        no step uses them, e.g. every media path of the config, so a file
+        edited behind an unchanged note still reaches Anki.
+        """
         # Get config directory for resolving relative media paths
         if config_dir is None:
             config_dir = Path.cwd()
 
-        self._log_verbose(f"Starting to apply plan with {len(plan.steps)} steps")
-        
-        # Execute in order
-        for i, s in enumerate(plan.steps, 1):
-            self._log_verbose(f"Step {i}/{len(plan.steps)}: [{s.kind}] {s.description}")
-            if s.kind == "deck.create":
-                self.backend.create_deck(s.payload["name"])
-            elif s.kind == "deck.delete":
-                self.backend.delete_decks([s.payload["name"]], cards_too=s.payload.get("cardsToo", False))
-            elif s.kind == "model.create":
-                p = s.payload
-                self.backend.create_model(p["name"], p["fields"], p["templates"], p["css"], p.get("isCloze", False))
-            elif s.kind == "model.updateTemplates":
-                p = s.payload
-                self.backend.update_model_templates(p["name"], p["templates"])
-            elif s.kind == "model.updateStyling":
-                p = s.payload
-                self.backend.update_model_styling(p["name"], p["css"])
-            elif s.kind == "model.delete":
-                self.backend.delete_model(s.payload["name"])
-            elif s.kind == "note.add":
-                n = s.payload["note"]
-                # Process media files if present
-                if "media" in n and n["media"]:
-                    media_mapping = process_media_files(self.backend, n["media"], config_dir, self.verbose)
-                    # TODO: We could optionally replace media references in field content
-                    # For now, user needs to reference media files by filename in their fields
-                self.backend.add_note(n["model"], n["deck"], n["fields"], n.get("tags", []))
-            elif s.kind == "note.update":
-                # Handle media for updates too if present in payload
-                if "media" in s.payload and s.payload["media"]:
-                    media_mapping = process_media_files(self.backend, s.payload["media"], config_dir, self.verbose)
-                self.backend.update_note_fields(s.payload["id"], s.payload["fields"])
-            elif s.kind.startswith("note.error") or s.kind == "model.note":
-                # No-op; informational only
-                continue
+        self._log_verbose("Starting to apply plan with %s steps", len(plan.steps))
+        self.media = MediaManifest(self.backend, config_dir, self.media_state, self.hash_cache, self.verbose)
+        completed = self.journal.completed if self.journal is not None else set()
+        numbered = [(i, s) for i, s in enumerate(plan.steps, 1) if i not in completed]
+        if completed:
+            self._log_verbose("Resuming: %s steps already applied, %s left", len(completed), len(numbered))
+        try:
+            self._run(plan, numbered, media)
+        finally:
+            self.media.cache.save()
+        self._log_verbose("Plan application completed successfully")
+
+    def apply_parts(
+        self,
+        parts: Iterable[Plan],
+        plan: Plan,
+        config_dir: Path = None,
+        queue_size: int = STREAM_QUEUE_SIZE,
+        on_part: Optional[Callable[[Plan], None]] = None,
+        media: Iterable[str] = (),
+    ) -> None:
+        """Apply a plan delivered in parts while later parts are still being planned.
+
+        A background thread pulls ``parts`` (e.g. :meth:`Planner.iter_plan`)
+        into a queue holding at most ``queue_size`` parts, so planning reads
+        overlap applying writes and only a few parts are in memory at once.
+        Each part is applied, after ``on_part`` saw it, before the next one
+        starts. Parts must be ordered so that none depends on a later one.
+        Steps are not kept: ``plan`` collects the unchanged count and note ids,
+        and the journal, if any, receives each part's steps as it starts.
+        The first failure stops planning and is raised. ``media`` is checked
+        and uploaded first, as in :meth:`apply`, while planning starts.
+        """
+        if config_dir is None:
+            config_dir = Path.cwd()
+        self._log_verbose("Starting to apply plan in parts")
+        self.media = MediaManifest(self.backend, config_dir, self.media_state, self.hash_cache, self.verbose)
+        queue: Queue = Queue(maxsize=max(1, queue_size))
+        stop = threading.Event()
+
+        def put(item: object) -> bool:
+            while not stop.is_set():
+                try:
+                    queue.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def produce() -> None:
+            try:
+                for part in parts:
+                    if not put(part):
+                        return
+            except BaseException as e:
+                put(_PlanningFailed(e))
             else:
-                raise RuntimeError(f"Unknown plan step kind: {s.kind}")
-        
-        self._log_verbose(f"Plan application completed successfully")
+                put(None)
+
+        producer = threading.Thread(target=produce, name="ankiday-planner", daemon=True)
+        producer.start()
+        applied = 0
+        try:
+            self._upload_media(media)
+            while True:
+                part = queue.get()
+                if part is None:
+                    break
+                if isinstance(part, _PlanningFailed):
+                    raise part.error
+                plan.unchanged += part.unchanged
+                plan.note_ids.update(part.note_ids)
+                if not part.steps:
+                    continue
+                if on_part is not None:
+                    on_part(part)
+                if self.journal is not None:
+                    self.journal.extend(part.steps, part.note_ids)
+                # Share note ids so created notes land in the overall plan
+                part.note_ids = plan.note_ids
+                self._run(part, list(enumerate(part.steps, applied + 1)))
+                applied += len(part.steps)
+        finally:
+            stop.set()
+            producer.join()
+            self.media.cache.save()
+        self._log_verbose("Applied %s steps in parts", applied)
+
+    def _upload_media(self, media_paths: Iterable[str]) -> Dict[str, str]:
+        """Hash, check and upload each distinct file once; return its Anki filename mapping."""
+        media_paths = list(dict.fromkeys(media_paths))
+        if not media_paths:
+            return {}
+        self._log_verbose("Processing %s distinct media files", len(media_paths))
+        with span(self.profiler, "apply.media", files=len(media_paths)):
+            return self.media.process(media_paths)
+
+    def _run(self, plan: Plan, numbered: List[Tuple[int, PlanStep]], media: Iterable[str] = ()) -> None:
+        """Upload ``media`` and the media of ``numbered`` steps, then apply the steps; raise the first failure."""
+        media_mapping: Dict[str, str] = {}
+
+        def upload_media() -> None:
+            # Media pre-pass: every distinct file is handled up front, however many notes share it
+            media_mapping.update(self._upload_media([*media, *(p for _, s in numbered for p in self._step_media(s))]))
+
+        tasks = [Task("media", upload_media)] + self._tasks(plan, numbered, media_mapping)
+        result = DagExecutor(self.parallelism, self.fail_fast).run(tasks)
+
+        for name, err in result.failed:
+            self._log_verbose("Part failed: %s: %s", name, err)
+        if result.skipped:
+            self._log_verbose("Skipped %s parts of the plan after a failure", len(result.skipped))
+        if len(result.failed) == 1:
+            raise result.failed[0][1]
+        if result.failed:
+            name, err = result.failed[0]
+            raise RuntimeError(f"{len(result.failed)} parts of the plan failed; first: {name}: {err}") from err
+
+    def _tasks(self, plan: Plan, numbered: List[Tuple[int, PlanStep]], media_mapping: Dict[str, str]) -> List[Task]:
+        """Split the plan into tasks and wire their dependencies.
+
+        Each run of same-entity steps (decks, models, notes) is a task; a run
+        of note steps is split further into one task per deck. Decks and
+        models do not depend on each other or on media, notes in different
+        decks do not depend on each other, and everything else keeps plan
+        order, so notes still wait for the decks, models and media they use.
+        """
+        parts: List[Tuple[int, str, List[Tuple[int, PlanStep]]]] = []
+        for run, (entity, group) in enumerate(groupby(numbered, key=lambda item: item[1].kind.split(".")[0])):
+            group = list(group)
+            if entity != "note":
+                parts.append((run, entity, group))
+                continue
+            by_deck: Dict[Optional[str], List[Tuple[int, PlanStep]]] = {}
+            for item in group:
+                by_deck.setdefault(_step_deck(item[1]), []).append(item)
+            parts.extend((run, entity, items) for items in by_deck.values())
+
+        def independent(a: Tuple[int, str], b: Tuple[int, str]) -> bool:
+            entities = {a[1], b[1]}
+            return entities == {"deck", "model"} or (a == b and a[1] == "note")
+
+        tasks: List[Task] = []
+        for run, entity, items in parts:
+            first, last = items[0][0], items[-1][0]
+            name = f"{entity} steps {first}-{last}" if first != last else f"{entity} step {first}"
+            deps = {t.name for t, (r, e, _) in zip(tasks, parts) if not independent((r, e), (run, entity))}
+            if entity == "note":
+                deps.add("media")
+            tasks.append(Task(name, partial(self._run_steps, plan, items, media_mapping), deps))
+        return tasks
+
+    def _run_steps(self, plan: Plan, items: List[Tuple[int, PlanStep]], media_mapping: Dict[str, str]) -> None:
+        """Apply steps in order. Consecutive steps of one kind group share a batch;
+        runs of note additions become bulk addNotes calls."""
+        for kind, group in groupby(items, key=lambda item: _group_kind(item[1].kind)):
+            group = list(group)
+            if self.verbose:
+                for i, s in group:
+                    self._log_verbose("Step %s/%s: [%s] %s", i, len(plan.steps), s.kind, s.description)
+            if self.journal is not None:
+                self.journal.begin(i for i, _ in group)
+            with span(self.profiler, f"apply.{kind}", steps=len(group)):
+                if kind == "note.add":
+                    failures = self._add_notes(plan, group)
+                else:
+                    settled = self._settled_in_doubt(group)
+                    with self.backend.batch() as batch:
+                        queued = [(s, self._queue_step(batch, s, media_mapping)) for i, s in group if i not in settled]
+                    failures = []
+                    for s, deferreds in queued:
+                        errors = [d.error for d in deferreds if d.error is not None]
+                        if errors:
+                            failures.append((s, errors[0]))
+
+            if self.journal is not None:
+                failed = {id(s) for s, _ in failures}
+                done = [(i, s) for i, s in group if id(s) not in failed]
+                keys = [s.payload["key"] for _, s in done if s.kind == "note.add" and "key" in s.payload]
+                self.journal.commit((i for i, _ in done), {k: plan.note_ids[k] for k in keys if k in plan.note_ids})
+
+            for s, err in failures:
+                self._log_verbose("Step failed: [%s] %s: %s", s.kind, s.description, err)
+            if len(failures) == 1:
+                raise failures[0][1]
+            if failures:
+                s, err = failures[0]
+                raise RuntimeError(
+                    f"{len(failures)} of {len(group)} steps failed; first: [{s.kind}] {s.description}: {err}"
+                ) from err
+
+    def _settled_in_doubt(self, items: List[Tuple[int, PlanStep]]) -> Set[int]:
+        """Model steps the journal had in flight whose effect Anki already shows.
+
+        Sending them again would fail (the model exists, or is already gone),
+        so they are taken as applied before the interruption.
+        """
+        in_doubt = self.journal.in_doubt if self.journal is not None else set()
+        pending = [(i, s) for i, s in items if i in in_doubt and s.kind in ("model.create", "model.delete")]
+        if not pending:
+            return set()
+        models = set(self.backend.list_models())
+        return {i for i, s in pending if (s.payload["name"] in models) == (s.kind == "model.create")}
+
+    def _add_notes(self, plan: Plan, items: List[Tuple[int, PlanStep]]) -> List[Tuple[PlanStep, BaseException]]:
+        """Create the notes of consecutive ``note.add`` steps in bulk.
+
+        Anki is asked up front which notes it would refuse (e.g. duplicates);
+        the rest are added in chunks. Ids are recorded in ``plan.note_ids``,
+        and every refused or failed note is returned with its error instead
+        of stopping the others. When resuming, a duplicate refused for a step
+        the journal had in flight is taken as added before the interruption.
+        """
+        in_doubt = self.journal.in_doubt if self.journal is not None else set()
+        steps = [s for _, s in items]
+        # TODO: We could optionally replace media references in field content
+        # using the pre-pass mapping. For now, user needs to reference media
+        # files by filename in their fields
+        notes = [s.note_data() for s in steps]
+        size = self.add_notes_chunk_size
+        starts = range(0, len(notes), size)
+
+        with self.backend.batch() as batch:
+            checks = [batch.can_add_notes(notes[i:i + size]) for i in starts]
+
+        failures: List[Tuple[PlanStep, BaseException]] = []
+        addable: List[int] = []
+        for start, check in zip(starts, checks):
+            if check.error is not None:
+                failures.extend((steps[i], check.error) for i in range(start, min(start + size, len(steps))))
+                continue
+            for i, reason in enumerate(check.result(), start):
+                if reason is None:
+                    addable.append(i)
+                elif items[i][0] in in_doubt and "duplicate" in reason:
+                    self._log_verbose("Note was added before the interruption: %s", steps[i].description)
+                else:
+                    failures.append((steps[i], RuntimeError(f"Cannot add note: {reason}")))
+
+        # One request per chunk; a concurrent backend overlaps them
+        chunks = [addable[i:i + size] for i in range(0, len(addable), size)]
+        with self.backend.batch(chunk_size=1) as batch:
+            adds = [(chunk, batch.add_notes([notes[i] for i in chunk])) for chunk in chunks]
+
+        for chunk, d in adds:
+            if d.error is not None:
+                failures.extend((steps[i], d.error) for i in chunk)
+                continue
+            ids = d.result()
+            errors = getattr(ids, "errors", None) or [None] * len(ids)
+            for i, nid, error in zip(chunk, ids, errors):
+                if nid is None:
+                    failures.append((steps[i], RuntimeError(f"Anki did not add the note: {error}" if error else "Anki did not add the note")))
+                elif "key" in steps[i].payload:
+                    plan.note_ids[steps[i].payload["key"]] = nid
+        self._log_verbose("Added %s of %s notes", len(steps) - len(failures), len(steps))
+        return failures
+
+    @staticmethod
+    def _step_media(s: PlanStep) -> List[str]:
+        if s.kind == "note.add":
+            return s.note_attr("media") or []
+        if s.kind == "note.update":
+            updates = s.payload.get("notes", [s.payload])
+            return [p for u in updates for p in u.get("media") or []]
+        return []
+
+    def _queue_step(self, batch: Batch, s: PlanStep, media_mapping: Dict[str, str]) -> List[Deferred]:
+        """Queue the backend calls for one step; informational steps queue none.
+
+        Bulk steps from :func:`~ankiday.ops.optimize.optimize_plan` carry a
+        list (``names``, ``ids`` or ``notes``) instead of a single entity.
+        Media was uploaded by the pre-pass; ``media_mapping`` maps each media
+        path in the plan to its Anki filename.
+        """
+        p = s.payload
+        if s.kind == "deck.create":
+            return [batch.create_deck(name) for name in p.get("names", [p.get("name")])]
+        elif s.kind == "deck.delete":
+            return [batch.delete_decks(p.get("names", [p.get("name")]), cards_too=p.get("cardsToo", False))]
+        elif s.kind == "model.create":
+            return [batch.create_model(p["name"], p["fields"], p["templates"], p["css"], p.get("isCloze", False))]
+        elif s.kind == "model.updateTemplates":
+            return [batch.update_model_templates(p["name"], p["templates"])]
+        elif s.kind == "model.updateStyling":
+            return [batch.update_model_styling(p["name"], p["css"])]
+        elif s.kind == "model.delete":
+            return [batch.delete_model(p["name"])]
+        elif s.kind == "note.update":
+            return [batch.update_note_fields(u["id"], u["fields"]) for u in p.get("notes", [p])]
+        elif s.kind == "note.delete":
+            return [batch.delete_notes(p.get("ids", [p.get("id")]))]
+        elif s.kind.startswith("note.error") or s.kind == "model.note":
+            # No-op; informational only
+            return []
+        else:
+            raise RuntimeError(f"Unknown plan step kind: {s.kind}")
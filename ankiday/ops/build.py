@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, Union
+
+import httpx
+
+from ..backends.collection import CollectionBackend, create_collection, stable_guid
+from ..config import Config, Note
+from ..state import note_key
+from .media import resolve_media
+
+# Notes handed to the collection per insert; bounds the rows held in memory
+BUILD_CHUNK_SIZE = 1000
+
+
+@dataclass
+class BuildResult:
+    notes: int = 0
+    cards: int = 0
+    media: int = 0
+    # Notes the collection refused (empty, or a duplicate of an earlier note)
+    skipped: int = 0
+
+
+def build_package(
+    cfg: Config,
+    output: Path,
+    config_dir: Path,
+    verbose: bool = False,
+    chunk_size: int = BUILD_CHUNK_SIZE,
+) -> BuildResult:
+    """Compile a config into an Anki package (``.apkg``) without Anki running.
+
+    Models, decks and notes are written to a fresh collection in one
+    transaction, ``chunk_size`` notes at a time; media files are then
+    streamed one by one into the zip, numbered as Anki expects, followed by
+    the ``media`` map and the collection. Notes get GUIDs derived from their
+    deck, model and unique field, and models and decks get ids derived from
+    their names, so importing a rebuilt package updates the notes from a
+    previous import instead of duplicating them. The package is
+    written next to ``output`` and moved into place once complete.
+    """
+    model_names = {m.name for m in cfg.models}
+    for note in cfg.notes:
+        if note.model not in model_names:
+            raise RuntimeError(f"Note references model '{note.model}', which is not defined in the config")
+
+    # Resolve media first so a missing file fails the build before any work
+    media = list(_media_sources(cfg, config_dir))
+    result = BuildResult()
+    output = Path(output)
+    with tempfile.TemporaryDirectory(prefix=".ankiday-build-", dir=output.parent) as tmp:
+        col_path = create_collection(Path(tmp) / "collection.anki2")
+        with CollectionBackend(col_path, verbose=verbose, stable_ids=True) as backend:
+            with backend.batch():
+                _write_collection(backend, cfg, result, chunk_size)
+            result.cards = backend.conn.execute("SELECT count(*) FROM cards").fetchone()[0]
+            backend.conn.execute("VACUUM")
+
+        partial = Path(tmp) / "package.apkg"
+        with zipfile.ZipFile(partial, "w", zipfile.ZIP_DEFLATED) as zf:
+            media_map: Dict[str, str] = {}
+            for index, (filename, source) in enumerate(media):
+                _write_media(zf, str(index), source)
+                media_map[str(index)] = filename
+            result.media = len(media_map)
+            zf.writestr("media", json.dumps(media_map))
+            zf.write(col_path, "collection.anki2")
+        os.replace(partial, output)
+    return result
+
+
+def _write_collection(backend: CollectionBackend, cfg: Config, result: BuildResult, chunk_size: int) -> None:
+    for m in cfg.models:
+        templates = [{"name": t.name, "qfmt": t.qfmt, "afmt": t.afmt} for t in m.templates]
+        backend.create_model(m.name, m.fields, templates, m.css, is_cloze=m.isCloze)
+    for d in cfg.decks:
+        backend.create_deck(d.name)
+
+    unique = {m.name: m.uniqueField for m in cfg.models}
+    for chunk in _chunks(cfg.notes, chunk_size):
+        ids = backend.add_notes([
+            {
+                "model": n.model,
+                "deck": n.deck,
+                "fields": n.fields,
+                "tags": n.tags,
+                # Same identity as the planner's note key, so notes in different decks never share a GUID
+                "guid": stable_guid(note_key(n.deck, n.model, n.fields.get(unique[n.model], ""))),
+            }
+            for n in chunk
+        ])
+        added = sum(1 for i in ids if i is not None)
+        result.notes += added
+        result.skipped += len(ids) - added
+
+
+def _chunks(notes: List[Note], size: int) -> Iterator[List[Note]]:
+    for i in range(0, len(notes), size):
+        yield notes[i : i + size]
+
+
+def _media_sources(cfg: Config, config_dir: Path) -> Iterator[Tuple[str, Union[Path, str]]]:
+    """Distinct media of the config as (Anki filename, local path or URL)."""
+    sources: Dict[str, Union[Path, str]] = {}
+    for note in cfg.notes:
+        for media_path in note.media:
+            filename, source = resolve_media(media_path, config_dir)
+            previous = sources.get(filename)
+            if previous is None:
+                sources[filename] = source
+                yield filename, source
+            elif _resolved(previous) != _resolved(source):
+                raise RuntimeError(f"Two different media files would be stored as '{filename}': {previous} and {source}")
+
+
+def _resolved(source: Union[Path, str]) -> Union[Path, str]:
+    return source.resolve() if isinstance(source, Path) else source
+
+
+def _write_media(zf: zipfile.ZipFile, name: str, source: Union[Path, str]) -> None:
+    if isinstance(source, Path):
+        zf.write(source, name)
+        return
+    with httpx.stream("GET", str(source), follow_redirects=True) as resp, zf.open(name, "w") as out:
+        resp.raise_for_status()
+        for chunk in resp.iter_bytes():
+            out.write(chunk)
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Set, Tuple
+
+
+@dataclass
+class Task:
+    """A unit of plan work; it runs once every task named in ``deps`` succeeded."""
+
+    name: str
+    run: Callable[[], None]
+    deps: Set[str] = field(default_factory=set)
+
+
+@dataclass
+class ExecutionResult:
+    # Failed tasks in task order, with their errors
+    failed: List[Tuple[str, BaseException]] = field(default_factory=list)
+    # Tasks never started: a dependency failed, or fail-fast stopped the run
+    skipped: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+class DagExecutor:
+    """Run a dependency graph of tasks on a thread pool.
+
+    At most ``parallelism`` tasks run at once; a task starts as soon as all of
+    its dependencies succeeded, in task order among those ready. With
+    ``fail_fast`` no new task starts after the first failure (running ones
+    finish); otherwise everything that does not depend on a failed task
+    still runs.
+    """
+
+    def __init__(self, parallelism: int = 1, fail_fast: bool = True):
+        self.parallelism = max(1, parallelism)
+        self.fail_fast = fail_fast
+
+    def run(self, tasks: List[Task]) -> ExecutionResult:
+        order = {t.name: i for i, t in enumerate(tasks)}
+        unknown = {d for t in tasks for d in t.deps} - set(order)
+        if unknown:
+            raise ValueError(f"Tasks depend on unknown tasks: {sorted(unknown)}")
+
+        by_name = {t.name: t for t in tasks}
+        waiting: Dict[str, Set[str]] = {t.name: set(t.deps) for t in tasks}
+        dependents: Dict[str, List[str]] = {t.name: [] for t in tasks}
+        for t in tasks:
+            for d in t.deps:
+                dependents[d].append(t.name)
+
+        errors: Dict[str, BaseException] = {}
+        running: Dict[Future, str] = {}
+        stopped = False
+        with ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix="ankiday-apply") as pool:
+            while True:
+                if not stopped:
+                    ready = sorted((n for n, deps in waiting.items() if not deps), key=order.__getitem__)
+                    for name in ready[: self.parallelism - len(running)]:
+                        del waiting[name]
+                        running[pool.submit(by_name[name].run)] = name
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        errors[name] = error
+                        stopped = stopped or self.fail_fast
+                        continue
+                    for d in dependents[name]:
+                        if d in waiting:
+                            waiting[d].discard(name)
+
+        return ExecutionResult(
+            failed=sorted(errors.items(), key=lambda item: order[item[0]]),
+            skipped=sorted(waiting, key=order.__getitem__),
+        )
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+from urllib.parse import urlparse
+
+from ..backends.base import Backend, Deferred
+from ..cache import HashCache
+from ..config import Note
+from ..log import enable_verbose, get_logger
+
+logger = get_logger("media")
+
+# Threads hashing local media; reads are I/O bound and hashlib releases the GIL
+HASH_WORKERS = 8
+
+
+def is_media_url(media_path: str) -> bool:
+    return media_path.startswith(("http://", "https://"))
+
+
+def resolve_media(media_path: str, config_dir: Path) -> Tuple[str, Union[Path, str]]:
+    """Anki filename and source (local path, or the URL itself) of a configured media entry."""
+    if is_media_url(media_path):
+        # Anki downloads it itself
+        return PurePosixPath(urlparse(media_path).path).name, media_path
+    path = Path(media_path)
+    if not path.is_absolute():
+        path = config_dir / path
+    if not path.exists():
+        raise FileNotFoundError(f"Media file not found: {media_path} (resolved to {path})")
+    # Anki filename is the local file name (extension preserved)
+    return path.name, path
+
+
+class MediaManifest:
+    """Media state for one apply: local content hashes, Anki's media listing and uploads.
+
+    ``known`` maps Anki filenames to the content hash last uploaded under that
+    name (from the state file). Anki's media folder is listed once, on first
+    use; a local file is uploaded when its name is missing there or its hash
+    differs from the recorded one, so edited files are re-uploaded and
+    unchanged ones cost neither a read nor a request. Local hashes come from
+    ``cache``, which only re-reads files whose mtime or size changed.
+    """
+
+    def __init__(
+        self,
+        backend: Backend,
+        config_dir: Path,
+        known: Optional[Dict[str, str]] = None,
+        cache: Optional[HashCache] = None,
+        verbose: bool = False,
+        workers: int = HASH_WORKERS,
+    ):
+        self.backend = backend
+        self.config_dir = config_dir
+        self.known: Dict[str, str] = dict(known or {})
+        self.cache = cache if cache is not None else HashCache()
+        self.verbose = verbose
+        if verbose:
+            enable_verbose()
+        self.workers = workers
+        self.mapping: Dict[str, str] = {}
+        # Files sent to Anki by this manifest
+        self.uploaded = 0
+        self._remote: Optional[Set[str]] = None
+
+    def _log_verbose(self, message: str, *args: object) -> None:
+        if self.verbose:
+            logger.info(message, *args)
+
+    def remote_names(self) -> Set[str]:
+        """Filenames in Anki's media folder, listed once per manifest."""
+        if self._remote is None:
+            self._remote = set(self.backend.get_media_files_names("*"))
+            self._log_verbose("Anki media folder holds %s files", len(self._remote))
+        return self._remote
+
+    def _resolve(self, media_path: str) -> Tuple[str, Union[Path, str]]:
+        return resolve_media(media_path, self.config_dir)
+
+    def process(self, media_paths: Iterable[str]) -> Dict[str, str]:
+        """Make sure the media is in Anki; return a mapping of original paths to Anki filenames."""
+        media_paths = list(media_paths)
+        pending = list(dict.fromkeys(p for p in media_paths if p not in self.mapping))
+        if pending:
+            self._log_verbose("Processing %s media files", len(pending))
+            self._upload([(p, *self._resolve(p)) for p in pending])
+        return {p: self.mapping[p] for p in media_paths}
+
+    def pending(self, media_paths: Iterable[str]) -> List[str]:
+        """Anki filenames ``process`` would upload for ``media_paths``, without uploading them."""
+        resolved: Dict[Union[Path, str], str] = {}
+        for media_path in dict.fromkeys(p for p in media_paths if p not in self.mapping):
+            filename, source = self._resolve(media_path)
+            resolved.setdefault(source, filename)
+        hashes = self._hashes([s for s in resolved if isinstance(s, Path)])
+        remote = self.remote_names()
+        return [
+            filename
+            for source, filename in resolved.items()
+            if self._needs_upload(filename, hashes.get(source) if isinstance(source, Path) else None, remote)
+        ]
+
+    def _hashes(self, local: List[Path]) -> Dict[Path, str]:
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(local) or 1))) as pool:
+            return dict(zip(local, pool.map(self.cache.hash, local)))
+
+    def _needs_upload(self, filename: str, digest: Optional[str], remote: Set[str]) -> bool:
+        # A local file (with a digest) is re-uploaded when it changed since it was last uploaded
+        if filename not in remote:
+            return True
+        return digest is not None and self.known.get(filename) != digest
+
+    def _upload(self, resolved: List[Tuple[str, str, Union[Path, str]]]) -> None:
+        hashes = self._hashes([source for _, _, source in resolved if isinstance(source, Path)])
+        remote = self.remote_names()
+
+        # Upload one request each; a concurrent backend overlaps them. Files
+        # go by path, so the backend decides whether Anki reads them directly
+        # or they are streamed, and they are never loaded into memory here.
+        uploads = []
+        queued: Dict[Union[Path, str], Tuple[Optional[str], Deferred]] = {}
+        with self.backend.batch(chunk_size=1) as batch:
+            for media_path, filename, source in resolved:
+                if source in queued:
+                    # Same file spelled differently (e.g. "a.png" and "./a.png")
+                    uploads.append((media_path, *queued[source]))
+                elif isinstance(source, Path):
+                    digest = hashes[source]
+                    if not self._needs_upload(filename, digest, remote):
+                        self._log_verbose("Media file unchanged in Anki: %s", filename)
+                        self.mapping[media_path] = filename
+                        continue
+                    action = "Re-uploading changed" if filename in remote else "Uploading new"
+                    self._log_verbose("%s media file: %s", action, filename)
+                    queued[source] = (digest, batch.store_media_path(filename, source))
+                    uploads.append((media_path, *queued[source]))
+                elif not self._needs_upload(filename, None, remote):
+                    self._log_verbose("Media file already exists in Anki: %s", filename)
+                    self.mapping[media_path] = filename
+                else:
+                    self._log_verbose("Uploading media from URL: %s", filename)
+                    queued[source] = (None, batch.store_media_url(filename, source))
+                    uploads.append((media_path, *queued[source]))
+
+        self.uploaded += len(queued)
+        for media_path, digest, upload in uploads:
+            stored_name = upload.result()
+            self.mapping[media_path] = stored_name
+            remote.add(stored_name)
+            self._log_verbose("Media file uploaded successfully as: %s", stored_name)
+            if digest is not None:
+                self.known[stored_name] = digest
+
+
+def config_media(notes: Iterable[Note]) -> List[str]:
+    """Distinct media paths of ``notes``, in config order."""
+    return list(dict.fromkeys(p for n in notes for p in n.media))
+
+
+def process_media_files(
+    backend: Backend,
+    media_paths: List[str],
+    config_dir: Path,
+    verbose: bool = False,
+    manifest: Optional[MediaManifest] = None,
+) -> Dict[str, str]:
+    """Process media files and return mapping of original paths to Anki filenames."""
+    if manifest is None:
+        manifest = MediaManifest(backend, config_dir, verbose=verbose)
+    return manifest.process(media_paths)
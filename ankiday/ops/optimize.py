@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from itertools import groupby
+from math import ceil
+from typing import Dict, List, Optional, Tuple
+
+from .apply import ADD_NOTES_CHUNK_SIZE, Plan, PlanStep, _group_kind, _step_deck
+
+# Step kinds merged into one bulk step, and the payload list the bulk step carries
+BULK_FIELDS = {
+    "deck.create": "names",
+    "deck.delete": "names",
+    "note.update": "notes",
+    "note.delete": "ids",
+}
+
+# Step kinds that never reach the backend
+INFORMATIONAL = ("note.error", "model.note")
+
+
+def optimize_plan(plan: Plan) -> Plan:
+    """Coalesce steps into bulk steps without breaking dependency order.
+
+    The plan is split into runs of same-entity steps (decks, models, notes),
+    which are never reordered, so decks and models still exist before notes
+    use them. Inside a deck or note run, steps are grouped by kind and the
+    kinds in ``BULK_FIELDS`` become one bulk step each (per deck for notes);
+    the notes run keeps its additions contiguous for ``addNotes``. Deck
+    creations implied by a subdeck creation ("A" by "A::B") are dropped.
+    Model steps are kept as they are.
+    """
+    optimized = Plan(unchanged=plan.unchanged, note_ids=plan.note_ids)
+    for entity, run in groupby(plan.steps, key=lambda s: s.kind.split(".")[0]):
+        run = list(run)
+        if entity == "model":
+            optimized.steps.extend(run)
+            continue
+        # Note steps are merged per deck, so the Applier can still apply decks in parallel
+        by_kind: Dict[Tuple[str, Optional[str]], List[PlanStep]] = {}
+        for s in run:
+            by_kind.setdefault((s.kind, _step_deck(s) if entity == "note" else None), []).append(s)
+        for (kind, deck), steps in by_kind.items():
+            if kind in BULK_FIELDS and len(steps) > 1:
+                bulk = _bulk_step(kind, steps)
+                if deck is not None:
+                    bulk.payload["deck"] = deck
+                    bulk.description += f" in deck '{deck}'"
+                optimized.steps.append(bulk)
+            else:
+                optimized.steps.extend(steps)
+    return optimized
+
+
+def _bulk_step(kind: str, steps: List[PlanStep]) -> PlanStep:
+    if kind == "deck.create":
+        names = [s.payload["name"] for s in steps]
+        # Anki creates missing parents along with a subdeck
+        names = [n for n in names if not any(other.startswith(n + "::") for other in names)]
+        return PlanStep(kind, f"Create {len(names)} decks: {_preview(names)}", {"names": names})
+    if kind == "deck.delete":
+        names = [s.payload["name"] for s in steps]
+        cards_too = any(s.payload.get("cardsToo", False) for s in steps)
+        return PlanStep(kind, f"Delete {len(names)} unmanaged decks: {_preview(names)}", {"names": names, "cardsToo": cards_too})
+    if kind == "note.update":
+        notes = [s.payload for s in steps]
+        return PlanStep(kind, f"Update {len(notes)} notes", {"notes": notes})
+    ids = [s.payload["id"] for s in steps]
+    return PlanStep(kind, f"Delete {len(ids)} unmanaged notes", {"ids": ids})
+
+
+def _preview(names: List[str], limit: int = 5) -> str:
+    shown = ", ".join(f"'{n}'" for n in names[:limit])
+    return shown + (f" and {len(names) - limit} more" if len(names) > limit else "")
+
+
+def _step_actions(s: PlanStep) -> int:
+    if s.kind in INFORMATIONAL:
+        return 0
+    if s.kind == "deck.create":
+        return len(s.payload.get("names", [None]))
+    if s.kind == "note.update":
+        return len(s.payload.get("notes", [None]))
+    return 1
+
+
+def count_requests(plan: Plan, batch_size: int, add_notes_chunk_size: int = ADD_NOTES_CHUNK_SIZE) -> Tuple[int, int]:
+    """Anki actions the Applier issues for ``plan`` and the HTTP requests they take.
+
+    Mirrors the Applier's grouping: each run of same-entity steps is packed
+    into ``multi`` requests of ``batch_size`` actions, and runs of note
+    additions cost one check per chunk (batched) plus one ``addNotes`` request
+    per chunk. Media uploads are not counted.
+    """
+    actions = requests = 0
+    for kind, group in groupby(plan.steps, key=lambda s: _group_kind(s.kind)):
+        group = list(group)
+        if kind == "note.add":
+            chunks = ceil(len(group) / add_notes_chunk_size)
+            actions += 2 * chunks
+            requests += ceil(chunks / batch_size) + chunks
+        else:
+            n = sum(_step_actions(s) for s in group)
+            actions += n
+            requests += ceil(n / batch_size)
+    return actions, requests
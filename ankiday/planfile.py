@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from .ops.apply import Plan, PlanStep
+
+PLAN_FILE_VERSION = 1
+
+
+class PlanFileError(ValueError):
+    """A plan file that cannot be read: missing, truncated or of another version."""
+
+
+@dataclass
+class PlanFile:
+    """A plan written by ``diff --out`` for ``apply --plan``.
+
+    JSON Lines: a header with the format version, the hash of the config the
+    plan was built from and the fingerprint of the collection it was checked
+    against (see :meth:`Planner.fingerprint`), then one line per step, then a
+    trailer with the step count and the ids of notes the plan already knows.
+    The trailer tells a complete file from a truncated one.
+    """
+
+    plan: Plan
+    config_hash: str
+    collection: str
+
+    def save(self, path: Path) -> None:
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            f.write(_line({
+                "version": PLAN_FILE_VERSION,
+                "config": self.config_hash,
+                "collection": self.collection,
+                "unchanged": self.plan.unchanged,
+            }))
+            for s in self.plan.steps:
+                f.write(_line(s.to_dict(compact=True)))
+            f.write(_line({"steps": len(self.plan.steps), "noteIds": self.plan.note_ids}))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "PlanFile":
+        try:
+            f = path.open(encoding="utf-8")
+        except OSError as e:
+            raise PlanFileError(f"Cannot read plan file {path}: {e.strerror}") from None
+        with f:
+            try:
+                header = json.loads(f.readline())
+                if header.get("version") != PLAN_FILE_VERSION:
+                    raise PlanFileError(f"{path} is not an ankiday plan file of version {PLAN_FILE_VERSION}")
+                plan = Plan(unchanged=header.get("unchanged", 0))
+                trailer = None
+                for line in f:
+                    record = json.loads(line)
+                    if "kind" in record:
+                        plan.steps.append(PlanStep.from_dict(record))
+                    else:
+                        trailer = record
+                        break
+            except (ValueError, AttributeError, KeyError):
+                raise PlanFileError(f"{path} is not a valid plan file") from None
+        if trailer is None or trailer.get("steps") != len(plan.steps):
+            raise PlanFileError(f"{path} is incomplete; run diff --out again")
+        plan.note_ids.update(trailer.get("noteIds", {}))
+        return cls(plan, header.get("config", ""), header.get("collection", ""))
+
+
+def _line(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
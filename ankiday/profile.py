@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from math import ceil
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Sequence
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values (0 for none)."""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values), max(1, ceil(q / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+@dataclass
+class ActionStats:
+    # Seconds each call of the action took; batched calls share their request's time
+    latencies: List[float] = field(default_factory=list)
+    bytes_sent: float = 0
+    bytes_received: float = 0
+
+    @property
+    def calls(self) -> int:
+        return len(self.latencies)
+
+
+class Profiler:
+    """Collects backend request timings and timed spans for ``--profile``.
+
+    A backend request carrying several actions (``multi``) is split evenly
+    between them: each counts one call with its share of the request's time
+    and bytes. Spans time phases of planning and applying; everything is
+    kept as trace events for :meth:`write_trace`.
+    """
+
+    def __init__(self) -> None:
+        self.actions: Dict[str, ActionStats] = {}
+        self.spans: Dict[str, List[float]] = {}
+        self.requests = 0
+        self._events: List[Dict[str, Any]] = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def _us(self, t: float) -> float:
+        return round((t - self._origin) * 1e6, 1)
+
+    @contextmanager
+    def span(self, name: str, cat: str = "phase", **args: Any) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.spans.setdefault(name, []).append(elapsed)
+                self._event(name, cat, started, elapsed, args)
+
+    def record_request(self, actions: List[str], started: float, bytes_sent: int, bytes_received: int) -> None:
+        """Record one backend request that carried ``actions`` and began at ``started``."""
+        elapsed = time.perf_counter() - started
+        share = 1 / max(1, len(actions))
+        with self._lock:
+            self.requests += 1
+            for action in actions:
+                stats = self.actions.setdefault(action, ActionStats())
+                stats.latencies.append(elapsed * share)
+                stats.bytes_sent += bytes_sent * share
+                stats.bytes_received += bytes_received * share
+            name = actions[0] if len(actions) == 1 else f"multi ({len(actions)} actions)"
+            self._event(name, "request", started, elapsed, {"bytesSent": bytes_sent, "bytesReceived": bytes_received})
+
+    def _event(self, name: str, cat: str, started: float, elapsed: float, args: Dict[str, Any]) -> None:
+        self._events.append({
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": self._us(started),
+            "dur": round(elapsed * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        })
+
+    def summary(self) -> str:
+        """Tables of backend actions and timed phases."""
+        lines = [f"Backend requests: {self.requests}"]
+        if self.actions:
+            header = f"{'action':<28} {'calls':>7} {'total ms':>10} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'sent KB':>9} {'recv KB':>9}"
+            lines += [header, "-" * len(header)]
+            for name, stats in sorted(self.actions.items(), key=lambda item: -sum(item[1].latencies)):
+                lat = sorted(stats.latencies)
+                lines.append(
+                    f"{name:<28} {stats.calls:>7} {sum(lat) * 1000:>10.1f} {percentile(lat, 50) * 1000:>8.2f} "
+                    f"{percentile(lat, 90) * 1000:>8.2f} {percentile(lat, 99) * 1000:>8.2f} "
+                    f"{stats.bytes_sent / 1024:>9.1f} {stats.bytes_received / 1024:>9.1f}"
+                )
+        if self.spans:
+            header = f"{'phase':<40} {'count':>7} {'total ms':>10} {'max ms':>8}"
+            lines += ["", header, "-" * len(header)]
+            for name, times in self.spans.items():
+                lines.append(f"{name:<40} {len(times):>7} {sum(times) * 1000:>10.1f} {max(times) * 1000:>8.1f}")
+        return "\n".join(lines)
+
+    def write_trace(self, path: Path) -> None:
+        """Write a Chrome trace-event file (chrome://tracing, Perfetto)."""
+        with self._lock:
+            events = sorted(self._events, key=lambda e: e["ts"])
+        Path(path).write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}), encoding="utf-8")
+
+
+def span(profiler: Optional[Profiler], name: str, **args: Any) -> ContextManager[None]:
+    """``profiler.span(...)``, or a no-op when profiling is off."""
+    return profiler.span(name, **args) if profiler is not None else nullcontext()
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import unicodedata
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import Config
+
+STATE_VERSION = 1
+
+
+def state_path(config_path: Path) -> Path:
+    """State file kept next to the config: ``decks.yaml`` -> ``decks.ankiday.lock``."""
+    return config_path.with_suffix(".ankiday.lock")
+
+
+def content_hash(data: Any) -> str:
+    """Short, stable hash of JSON-serializable data."""
+    blob = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha1(blob).hexdigest()[:16]
+
+
+def note_key(deck: str, model: str, unique_value: str) -> str:
+    """Identity of a managed note: its deck, model and unique-field value."""
+    return content_hash([deck, model, unicodedata.normalize("NFC", unique_value)])
+
+
+@dataclass
+class State:
+    """What the last successful apply left in Anki.
+
+    ``notes`` maps a note key to ``[content hash, Anki note id]``, ``models``
+    maps a model name to its content hash and ``media`` an Anki media
+    filename to the content hash of the file last uploaded under that name.
+    """
+
+    notes: Dict[str, List[Any]] = field(default_factory=dict)
+    models: Dict[str, str] = field(default_factory=dict)
+    media: Dict[str, str] = field(default_factory=dict)
+
+    def note_id(self, key: str, digest: str) -> Optional[int]:
+        """Anki id of the note if it was applied with exactly this content."""
+        entry = self.notes.get(key)
+        if entry and entry[0] == digest:
+            return int(entry[1])
+        return None
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["State"]:
+        """Read a state file; a missing, unreadable or outdated file yields None."""
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != STATE_VERSION:
+            return None
+        return cls(notes=data.get("notes", {}), models=data.get("models", {}), media=data.get("media", {}))
+
+    def save(self, path: Path) -> None:
+        data = {"version": STATE_VERSION, "models": self.models, "media": self.media, "notes": self.notes}
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @classmethod
+    def from_config(cls, cfg: Config, note_ids: Dict[str, int], media: Dict[str, str]) -> "State":
+        """State after ``cfg`` was applied.
+
+        ``note_ids`` maps note keys to Anki ids and ``media`` Anki filenames to
+        uploaded content hashes; only media referenced by the config is kept.
+        """
+        state = cls()
+        models = {m.name: m for m in cfg.models}
+        for m in cfg.models:
+            state.models[m.name] = content_hash(m.model_dump())
+        for n in cfg.notes:
+            for media_path in n.media:
+                filename = Path(media_path).name
+                if filename in media:
+                    state.media[filename] = media[filename]
+            model_cfg = models.get(n.model)
+            uniq_val = n.fields.get(model_cfg.uniqueField) if model_cfg else None
+            if not uniq_val:
+                continue
+            key = note_key(n.deck, n.model, uniq_val)
+            if key in note_ids:
+                state.notes[key] = [content_hash(n.model_dump()), note_ids[key]]
+        return state
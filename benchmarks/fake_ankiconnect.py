@@ -0,0 +1,242 @@
+"""In-process HTTP stand-in for AnkiConnect, for benchmarks.
+
+It implements the actions ``AnkiConnectBackend`` uses (including ``multi``)
+on top of :class:`ankiday.backends.memory.MemoryBackend`, sleeps ``latency`` seconds per HTTP request
+and ``action_latency`` per action to model Anki's round trip and work, and
+counts requests, actions and bytes in both directions.
+
+    python -m benchmarks.fake_ankiconnect --port 8765 --latency-ms 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from ankiday.backends.memory import MemoryBackend
+
+
+@dataclass
+class Stats:
+    requests: int = 0
+    actions: int = 0
+    # Request bodies received from the client, and responses sent back
+    bytes_in: int = 0
+    bytes_out: int = 0
+    by_action: Counter = field(default_factory=Counter)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "actions": self.actions,
+            "bytesIn": self.bytes_in,
+            "bytesOut": self.bytes_out,
+            "byAction": dict(sorted(self.by_action.items())),
+        }
+
+
+def _note(note: Dict[str, Any]) -> Dict[str, Any]:
+    return {"model": note["modelName"], "deck": note["deckName"], "fields": note["fields"], "tags": note.get("tags", [])}
+
+
+class FakeAnki:
+    """AnkiConnect action handlers (version 5 semantics) over a :class:`MemoryBackend`."""
+
+    def __init__(self, action_latency: float = 0.0, backend: Optional[MemoryBackend] = None):
+        self.action_latency = action_latency
+        self.backend = backend if backend is not None else MemoryBackend(record=False)
+        self.stats = Stats()
+        self._lock = threading.Lock()
+
+    def handle(self, payload: Dict[str, Any]) -> Any:
+        """Run one action; raises on errors, like AnkiConnect reports them."""
+        action = payload.get("action")
+        handler: Optional[Callable[..., Any]] = getattr(self, f"action_{action}", None)
+        if handler is None:
+            raise ValueError(f"unsupported action: {action}")
+        if action != "multi":
+            # A multi request counts as the actions it carries
+            with self._lock:
+                self.stats.actions += 1
+                self.stats.by_action[action] += 1
+            if self.action_latency:
+                time.sleep(self.action_latency)
+        return handler(**(payload.get("params") or {}))
+
+    # Misc
+    def action_version(self) -> int:
+        return 6
+
+    def action_multi(self, actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        replies = []
+        for entry in actions:
+            try:
+                replies.append({"result": self.handle(entry), "error": None})
+            except Exception as e:
+                replies.append({"result": None, "error": str(e)})
+        return replies
+
+    # Decks
+    def action_deckNames(self) -> List[str]:
+        return self.backend.list_decks()
+
+    def action_createDeck(self, deck: str) -> int:
+        return self.backend.create_deck(deck)
+
+    def action_deleteDecks(self, decks: List[str], cardsToo: bool = False) -> None:
+        self.backend.delete_decks(decks, cards_too=cardsToo)
+
+    # Models
+    def action_modelNames(self) -> List[str]:
+        return self.backend.list_models()
+
+    def action_modelFieldNames(self, modelName: str) -> List[str]:
+        return self.backend.model_field_names(modelName)
+
+    def action_createModel(self, modelName: str, inOrderFields: List[str], cardTemplates: List[Dict[str, str]], css: str = "", isCloze: bool = False) -> Dict[str, Any]:
+        templates = [{"name": t["Name"], "qfmt": t["Front"], "afmt": t["Back"]} for t in cardTemplates]
+        self.backend.create_model(modelName, inOrderFields, templates, css, is_cloze=isCloze)
+        return {"name": modelName}
+
+    def action_modelTemplates(self, modelName: str) -> Dict[str, Dict[str, str]]:
+        return self.backend.model_templates(modelName)
+
+    def action_modelStyling(self, modelName: str) -> Dict[str, str]:
+        return {"css": self.backend.model_styling(modelName)}
+
+    def action_updateModelTemplates(self, model: Dict[str, Any]) -> None:
+        templates = [{"name": name, "qfmt": t["Front"], "afmt": t["Back"]} for name, t in model["templates"].items()]
+        self.backend.update_model_templates(model["name"], templates)
+
+    def action_updateModelStyling(self, model: Dict[str, Any]) -> None:
+        self.backend.update_model_styling(model["name"], model["css"])
+
+    def action_deleteModel(self, model: str) -> None:
+        self.backend.delete_model(model)
+
+    # Notes
+    def action_findNotes(self, query: str) -> List[int]:
+        return self.backend.find_notes(query)
+
+    def action_addNote(self, note: Dict[str, Any]) -> int:
+        n = _note(note)
+        return self.backend.add_note(n["model"], n["deck"], n["fields"], n["tags"])
+
+    def action_addNotes(self, notes: List[Dict[str, Any]]) -> List[Optional[int]]:
+        return self.backend.add_notes([_note(n) for n in notes])
+
+    def action_canAddNotesWithErrorDetail(self, notes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        reasons = self.backend.can_add_notes([_note(n) for n in notes])
+        return [{"canAdd": False, "error": r} if r else {"canAdd": True} for r in reasons]
+
+    def action_updateNoteFields(self, note: Dict[str, Any]) -> None:
+        self.backend.update_note_fields(note["id"], note["fields"])
+
+    def action_deleteNotes(self, notes: List[int]) -> None:
+        self.backend.delete_notes(notes)
+
+    def action_notesInfo(self, notes: List[int]) -> List[Dict[str, Any]]:
+        return self.backend.notes_info(notes)
+
+    # Media
+    def action_storeMediaFile(self, filename: str, data: Optional[str] = None, path: Optional[str] = None, url: Optional[str] = None, **_: Any) -> str:
+        if data is not None:
+            return self.backend.store_media_file(filename, base64.b64decode(data))
+        if path is not None:
+            return self.backend.store_media_path(filename, Path(path))
+        if url is not None:
+            return self.backend.store_media_url(filename, url)
+        raise ValueError("storeMediaFile needs data, path or url")
+
+    def action_getMediaFilesNames(self, pattern: str = "*") -> List[str]:
+        return self.backend.get_media_files_names(pattern)
+
+    def action_retrieveMediaFile(self, filename: str) -> Any:
+        try:
+            return base64.b64encode(self.backend.retrieve_media_file(filename)).decode("ascii")
+        except RuntimeError:
+            return False
+
+    def action_deleteMediaFile(self, filename: str) -> None:
+        self.backend.delete_media_file(filename)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeAnkiConnectServer"
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        anki = self.server.anki
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        try:
+            reply = {"result": anki.handle(json.loads(body)), "error": None}
+        except Exception as e:
+            reply = {"result": None, "error": str(e)}
+        data = json.dumps(reply).encode("utf-8")
+        with anki._lock:
+            anki.stats.requests += 1
+            anki.stats.bytes_in += len(body)
+            anki.stats.bytes_out += len(data)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class FakeAnkiConnectServer(ThreadingHTTPServer):
+    """Threaded AnkiConnect stand-in; use as a context manager to serve in the background."""
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.0, action_latency: float = 0.0, anki: Optional[FakeAnki] = None):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.anki = anki if anki is not None else FakeAnki(action_latency)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self) -> "FakeAnkiConnectServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-ankiconnect", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a fake AnkiConnect for benchmarks")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay per HTTP request")
+    parser.add_argument("--action-latency-ms", type=float, default=0.0, help="Delay per action")
+    args = parser.parse_args()
+    server = FakeAnkiConnectServer(args.port, args.latency_ms / 1000, args.action_latency_ms / 1000)
+    print(f"Fake AnkiConnect listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.anki.stats.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Synthetic ankiday configs for benchmarks.
+
+    python -m benchmarks.generate -o /tmp/bench --notes 10000 --models 2 --media 50 --media-size 65536
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+from pathlib import Path
+from typing import Any, Dict, List
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as _Dumper
+except ImportError:  # pragma: no cover - libyaml not available
+    from yaml import SafeDumper as _Dumper
+
+
+def generate_config(
+    out_dir: Path,
+    notes: int,
+    models: int = 1,
+    decks: int = 10,
+    media: int = 0,
+    media_size: int = 16 * 1024,
+    seed: int = 0,
+) -> Path:
+    """Write ``config.yaml`` (and ``media/``) into ``out_dir``; returns the config path.
+
+    Notes are spread round-robin over ``models`` models and ``decks`` decks;
+    the first ``media`` notes each reference one media file of
+    ``media_size`` random bytes. The same arguments always produce the same
+    config.
+    """
+    rng = random.Random(seed)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    model_defs: List[Dict[str, Any]] = [
+        {
+            "name": f"Bench Model {m}",
+            "fields": ["Front", "Back", "Extra"],
+            "uniqueField": "Front",
+            "css": ".card { font-family: arial; }",
+            "templates": [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{FrontSide}}<hr id=answer>{{Back}}"}],
+        }
+        for m in range(models)
+    ]
+    deck_names = [f"Bench::Deck {d:03d}" for d in range(decks)]
+
+    media_files = []
+    if media:
+        (out_dir / "media").mkdir(exist_ok=True)
+        for i in range(media):
+            name = f"media/file{i:05d}.bin"
+            (out_dir / name).write_bytes(rng.randbytes(media_size))
+            media_files.append(name)
+
+    note_defs = []
+    for i in range(notes):
+        note: Dict[str, Any] = {
+            "model": model_defs[i % models]["name"],
+            "deck": deck_names[i % decks],
+            "fields": {
+                "Front": f"word {i:07d}",
+                "Back": f"meaning {rng.getrandbits(32):08x}",
+                "Extra": "lorem ipsum " * rng.randint(1, 8),
+            },
+            "tags": ["bench", f"group{i % 20}"],
+        }
+        if i < len(media_files):
+            note["media"] = [media_files[i]]
+        note_defs.append(note)
+
+    config = {
+        "version": 1,
+        "backend": "ankiConnect",
+        "models": model_defs,
+        "decks": [{"name": d} for d in deck_names],
+        "notes": note_defs,
+    }
+    path = out_dir / "config.yaml"
+    with path.open("w", encoding="utf-8") as f:
+        yaml.dump(config, f, Dumper=_Dumper, sort_keys=False, allow_unicode=True)
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--out", type=Path, required=True, help="Output directory")
+    parser.add_argument("--notes", type=int, default=1000)
+    parser.add_argument("--models", type=int, default=1)
+    parser.add_argument("--decks", type=int, default=10)
+    parser.add_argument("--media", type=int, default=0, help="Number of media files")
+    parser.add_argument("--media-size", type=int, default=16 * 1024, help="Bytes per media file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    path = generate_config(args.out, args.notes, args.models, args.decks, args.media, args.media_size, args.seed)
+    print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Time load_config, planning and applying against a fake AnkiConnect.
+
+Each size runs in its own subprocess so peak RSS is measured per size:
+
+    python -m benchmarks.run --sizes 1000,10000,100000 --latency-ms 1 -o results.json
+
+Per size and phase the JSON output holds the wall time and the requests,
+actions and bytes the phase exchanged with the fake server; ``replan`` is
+an unchanged re-plan right after applying. Compare two result files with
+``python -m benchmarks.run --compare old.json new.json``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+from .fake_ankiconnect import FakeAnkiConnectServer
+from .generate import generate_config
+
+
+def peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_once(args: argparse.Namespace, notes: int, workdir: Path) -> Dict[str, Any]:
+    """Generate a config of ``notes`` notes and time each phase against a fresh fake server."""
+    # Keep the media hash cache out of the user's cache directory
+    os.environ["ANKIDAY_CACHE_DIR"] = str(workdir / "cache")
+    from ankiday.cli import _load_backend
+    from ankiday.config import load_config
+    from ankiday.ops.apply import Applier, Planner
+    from ankiday.ops.optimize import optimize_plan
+
+    started = time.perf_counter()
+    cfg_path = generate_config(workdir, notes, args.models, args.decks, args.media, args.media_size)
+    result: Dict[str, Any] = {
+        "notes": notes,
+        "generateSeconds": round(time.perf_counter() - started, 3),
+        "configBytes": cfg_path.stat().st_size,
+        "phases": {},
+    }
+
+    with FakeAnkiConnectServer(latency=args.latency_ms / 1000, action_latency=args.action_latency_ms / 1000) as server:
+        stats = server.anki.stats
+
+        def measure(name: str, fn: Callable[[], Any]) -> Any:
+            before = stats.to_dict()
+            t0 = time.perf_counter()
+            value = fn()
+            after = stats.to_dict()
+            result["phases"][name] = {
+                "seconds": round(time.perf_counter() - t0, 4),
+                **{k: after[k] - before[k] for k in ("requests", "actions", "bytesIn", "bytesOut")},
+            }
+            return value
+
+        cfg = measure("load_config", lambda: load_config(cfg_path))
+        cfg.server.url = server.url
+        with _load_backend(cfg, concurrency=args.concurrency) as backend:
+            plan = measure("plan", lambda: Planner(backend).build_plan(cfg))
+            result["steps"] = len(plan.steps)
+            applier = Applier(backend, parallelism=args.jobs)
+            measure("apply", lambda: applier.apply(optimize_plan(plan), config_dir=cfg_path.parent))
+            replan = measure("replan", lambda: Planner(backend).build_plan(cfg))
+            result["replanSteps"] = len(replan.steps)
+        result["totals"] = stats.to_dict()
+
+    result["peakRssBytes"] = peak_rss_bytes()
+    return result
+
+
+def _child_args(args: argparse.Namespace, notes: int) -> List[str]:
+    return [
+        sys.executable, "-m", "benchmarks.run", "--single", str(notes),
+        "--models", str(args.models), "--decks", str(args.decks),
+        "--media", str(args.media), "--media-size", str(args.media_size),
+        "--latency-ms", str(args.latency_ms), "--action-latency-ms", str(args.action_latency_ms),
+        "--concurrency", str(args.concurrency), "--jobs", str(args.jobs),
+    ]
+
+
+def compare(old_path: Path, new_path: Path) -> None:
+    old = {r["notes"]: r for r in json.loads(old_path.read_text())["results"]}
+    new = {r["notes"]: r for r in json.loads(new_path.read_text())["results"]}
+    print(f"{'notes':>8} {'phase':<12} {'old s':>9} {'new s':>9} {'change':>8} {'old req':>8} {'new req':>8}")
+    for notes in sorted(old.keys() & new.keys()):
+        for phase, n in new[notes]["phases"].items():
+            o = old[notes]["phases"].get(phase)
+            if o is None:
+                continue
+            change = (n["seconds"] / o["seconds"] - 1) * 100 if o["seconds"] else 0.0
+            print(f"{notes:>8} {phase:<12} {o['seconds']:>9.3f} {n['seconds']:>9.3f} {change:>+7.1f}% {o['requests']:>8} {n['requests']:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ankiday benchmarks against a fake AnkiConnect")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated note counts")
+    parser.add_argument("--models", type=int, default=1)
+    parser.add_argument("--decks", type=int, default=10)
+    parser.add_argument("--media", type=int, default=0, help="Media files referenced by the config")
+    parser.add_argument("--media-size", type=int, default=16 * 1024, help="Bytes per media file")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="Fake server delay per HTTP request")
+    parser.add_argument("--action-latency-ms", type=float, default=0.0, help="Fake server delay per action")
+    parser.add_argument("--concurrency", type=int, default=1, help="AnkiConnect requests in flight (async backend)")
+    parser.add_argument("--jobs", type=int, default=1, help="Plan parts applied in parallel")
+    parser.add_argument("-o", "--output", type=Path, help="Write results JSON here instead of stdout")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("OLD", "NEW"), help="Compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.single is not None:
+        with tempfile.TemporaryDirectory(prefix="ankiday-bench-") as tmp:
+            print(json.dumps(run_once(args, args.single, Path(tmp))))
+        return
+
+    results = []
+    for notes in (int(n) for n in args.sizes.split(",")):
+        print(f"Running {notes} notes...", file=sys.stderr)
+        out = subprocess.run(_child_args(args, notes), check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(out))
+    report = {
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "single", "compare")},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
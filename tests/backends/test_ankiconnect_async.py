@@ -0,0 +1,88 @@
+"""Test the async AnkiConnect backend and its synchronous concurrent adapter."""
+
+import asyncio
+import json
+from unittest.mock import patch
+
+import httpx
+
+from ankiday.backends.ankiconnect_async import AsyncAnkiConnectBackend, ConcurrentAnkiConnectBackend
+
+_RealAsyncClient = httpx.AsyncClient
+
+
+class FakeAnkiConnect:
+    """Async request handler that tracks how many requests overlap."""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.actions = []
+
+    def reply(self, request):
+        action = request["action"]
+        self.actions.append(action)
+        if action == "multi":
+            return [{"result": self.reply(a), "error": None} for a in request["params"]["actions"]]
+        if action == "findNotes":
+            return [len(request["params"]["query"])]
+        return None
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            result = self.reply(json.loads(request.content))
+        finally:
+            self.in_flight -= 1
+        return httpx.Response(200, json={"result": result, "error": None})
+
+
+def _patched_client(server):
+    return patch(
+        "httpx.AsyncClient",
+        lambda **kwargs: _RealAsyncClient(transport=httpx.MockTransport(server), **kwargs),
+    )
+
+
+def test_async_methods_return_awaitables():
+    """Backend methods are coroutines with the same names as the sync backend."""
+    server = FakeAnkiConnect(delay=0)
+
+    async def run():
+        async with AsyncAnkiConnectBackend() as backend:
+            return await backend.find_notes("abc")
+
+    with _patched_client(server):
+        assert asyncio.run(run()) == [3]
+    assert server.actions == ["findNotes"]
+
+
+def test_concurrent_batch_respects_concurrency_limit():
+    """Batched chunks overlap, but never more than `concurrency` at a time."""
+    server = FakeAnkiConnect()
+
+    with _patched_client(server):
+        with ConcurrentAnkiConnectBackend(AsyncAnkiConnectBackend(concurrency=3)) as backend:
+            with backend.batch(chunk_size=1) as batch:
+                lookups = [batch.find_notes("x" * i) for i in range(10)]
+
+    assert [d.result() for d in lookups] == [[i] for i in range(10)]
+    assert server.max_in_flight == 3
+
+
+def test_blocking_calls_through_adapter():
+    """Direct calls on the adapter block and return plain values."""
+    server = FakeAnkiConnect(delay=0)
+
+    with _patched_client(server):
+        with ConcurrentAnkiConnectBackend(AsyncAnkiConnectBackend()) as backend:
+            assert backend.find_notes("ab") == [2]
+            with backend.batch() as batch:
+                first = batch.find_notes("a")
+                second = batch.find_notes("abc")
+
+    assert (first.result(), second.result()) == ([1], [3])
+    assert server.actions == ["findNotes", "multi", "findNotes", "findNotes"]
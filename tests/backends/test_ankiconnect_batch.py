@@ -0,0 +1,170 @@
+"""Test AnkiConnect transport: batched `multi` requests and the pooled HTTP session."""
+
+from unittest.mock import Mock, patch
+
+import pytest
+
+from ankiday.backends.ankiconnect import AnkiConnectBackend
+
+
+class MockResponse:
+    def __init__(self, json_data, status_code=200):
+        self.json_data = json_data
+        self.status_code = status_code
+
+    def json(self):
+        return self.json_data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+
+def _multi_reply(*replies):
+    return MockResponse({"result": list(replies), "error": None})
+
+
+def test_batch_packs_calls_into_multi():
+    """Queued calls are sent as one multi request and each gets its own result."""
+    backend = AnkiConnectBackend()
+
+    with patch('httpx.Client') as mock_client_class:
+        mock_client = Mock()
+        mock_client_class.return_value = mock_client
+        mock_client.post.return_value = _multi_reply(
+            {"result": [1, 2], "error": None},
+            {"result": None, "error": None},
+        )
+
+        with backend.batch() as batch:
+            found = batch.find_notes("deck:Test")
+            created = batch.create_deck("Other")
+            assert not found.done
+
+        mock_client.post.assert_called_once()
+        payload = mock_client.post.call_args[1]['json']
+        assert payload['action'] == 'multi'
+        actions = payload['params']['actions']
+        assert [a['action'] for a in actions] == ['findNotes', 'createDeck']
+        assert actions[0]['params'] == {"query": "deck:Test"}
+
+        assert found.result() == [1, 2]
+        assert created.result() is None
+
+
+def test_batch_delivers_errors_to_their_caller():
+    """An error in one batched action does not affect the others."""
+    backend = AnkiConnectBackend()
+
+    with patch('httpx.Client') as mock_client_class:
+        mock_client = Mock()
+        mock_client_class.return_value = mock_client
+        mock_client.post.return_value = _multi_reply(
+            {"result": None, "error": "model was not found"},
+            {"result": 1496198395707, "error": None},
+        )
+
+        with backend.batch() as batch:
+            failed = batch.update_model_styling("Missing", "")
+            added = batch.add_note("Basic", "Default", {"Front": "a"}, [])
+
+        assert isinstance(failed.error, RuntimeError)
+        with pytest.raises(RuntimeError, match="AnkiConnect error: model was not found"):
+            failed.result()
+        assert added.result() == 1496198395707
+
+
+def test_batch_respects_chunk_size():
+    """Calls are split into chunks of at most chunk_size actions."""
+    backend = AnkiConnectBackend(batch_size=2)
+
+    def reply(url, json):
+        actions = json['params']['actions']
+        return _multi_reply(*[{"result": None, "error": None} for _ in actions])
+
+    with patch('httpx.Client') as mock_client_class:
+        mock_client = Mock()
+        mock_client_class.return_value = mock_client
+        mock_client.post.side_effect = reply
+
+        with backend.batch() as batch:
+            deferreds = [batch.create_deck(f"Deck {i}") for i in range(4)]
+
+        assert mock_client.post.call_count == 2
+        assert all(d.done for d in deferreds)
+
+
+def test_bulk_note_actions():
+    """add_notes and can_add_notes map to addNotes and canAddNotesWithErrorDetail."""
+    backend = AnkiConnectBackend()
+    notes = [
+        {"model": "Basic", "deck": "Test", "fields": {"Front": "a"}, "tags": ["x"]},
+        {"model": "Basic", "deck": "Test", "fields": {"Front": "b"}},
+    ]
+
+    with patch('httpx.Client') as mock_client_class:
+        mock_client = Mock()
+        mock_client_class.return_value = mock_client
+        mock_client.post.side_effect = [
+            MockResponse({"result": [{"canAdd": True}, {"canAdd": False, "error": "cannot create note because it is a duplicate"}], "error": None}),
+            MockResponse({"result": [1496198395707, None], "error": None}),
+        ]
+
+        assert backend.can_add_notes(notes) == [None, "cannot create note because it is a duplicate"]
+        assert backend.add_notes(notes) == [1496198395707, None]
+
+        payload = mock_client.post.call_args[1]['json']
+        assert payload['action'] == 'addNotes'
+        assert payload['params']['notes'][0] == {
+            "deckName": "Test", "modelName": "Basic", "fields": {"Front": "a"}, "tags": ["x"],
+        }
+        assert payload['params']['notes'][1]['tags'] == []
+
+
+def test_direct_calls_are_not_batched():
+    """Calling the backend directly inside a batch block still runs immediately."""
+    backend = AnkiConnectBackend()
+
+    with patch('httpx.Client') as mock_client_class:
+        mock_client = Mock()
+        mock_client_class.return_value = mock_client
+        mock_client.post.return_value = MockResponse({"result": ["Default"], "error": None})
+
+        with backend.batch():
+            assert backend.list_decks() == ["Default"]
+
+        payload = mock_client.post.call_args[1]['json']
+        assert payload['action'] == 'deckNames'
+
+
+def test_session_is_reused_until_closed():
+    """One pooled client serves every call until the backend is closed."""
+    with patch('httpx.Client') as mock_client_class:
+        mock_client = Mock()
+        mock_client_class.return_value = mock_client
+        mock_client.post.return_value = MockResponse({"result": [], "error": None})
+
+        with AnkiConnectBackend() as backend:
+            backend.list_decks()
+            backend.list_models()
+            backend.find_notes("deck:Test")
+
+        mock_client_class.assert_called_once()
+        assert mock_client.post.call_count == 3
+        mock_client.close.assert_called_once()
+
+
+def test_active_batch_is_per_thread():
+    """A batch recording calls on one thread does not capture another thread's calls."""
+    import threading
+
+    backend = AnkiConnectBackend()
+    with backend.batch() as batch:
+        backend._active_batch = batch
+        seen = []
+        worker = threading.Thread(target=lambda: seen.append(backend._active_batch))
+        worker.start()
+        worker.join()
+        backend._active_batch = None
+
+    assert seen == [None]
@@ -23,10 +23,9 @@ def test_create_regular_model():
     backend = AnkiConnectBackend()
 
     with patch('httpx.Client') as mock_client_class:
-        # Mock the context manager and response
+        # Mock the pooled client and response
         mock_client = Mock()
-        mock_client_class.return_value.__enter__.return_value = mock_client
-        mock_client_class.return_value.__exit__.return_value = None
+        mock_client_class.return_value = mock_client
 
         mock_response = MockResponse({"result": None, "error": None})
         mock_client.post.return_value = mock_response
@@ -65,10 +64,9 @@ def test_create_cloze_model():
     backend = AnkiConnectBackend()
 
     with patch('httpx.Client') as mock_client_class:
-        # Mock the context manager and response
+        # Mock the pooled client and response
         mock_client = Mock()
-        mock_client_class.return_value.__enter__.return_value = mock_client
-        mock_client_class.return_value.__exit__.return_value = None
+        mock_client_class.return_value = mock_client
 
         mock_response = MockResponse({"result": None, "error": None})
         mock_client.post.return_value = mock_response
@@ -107,10 +105,9 @@ def test_create_model_with_error():
     backend = AnkiConnectBackend()
 
     with patch('httpx.Client') as mock_client_class:
-        # Mock the context manager and response
+        # Mock the pooled client and response
         mock_client = Mock()
-        mock_client_class.return_value.__enter__.return_value = mock_client
-        mock_client_class.return_value.__exit__.return_value = None
+        mock_client_class.return_value = mock_client
 
         mock_response = MockResponse({"result": None, "error": "Model already exists"})
         mock_client.post.return_value = mock_response
@@ -0,0 +1,75 @@
+"""Test media uploads by path, by URL and as a streamed request body."""
+
+import base64
+import json
+from unittest.mock import Mock, patch
+
+from ankiday.backends.ankiconnect import AnkiConnectBackend, Base64File
+
+
+class MockResponse:
+    def __init__(self, json_data, status_code=200):
+        self.json_data = json_data
+        self.status_code = status_code
+
+    def json(self):
+        return self.json_data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+
+def test_local_anki_reads_file_by_path(tmp_path):
+    """With Anki on this machine only the absolute path is sent."""
+    media = tmp_path / "hola.mp3"
+    media.write_bytes(b"ID3" * 1000)
+    backend = AnkiConnectBackend("http://localhost:8765")
+
+    with patch('httpx.Client') as mock_client_class:
+        mock_client = Mock()
+        mock_client_class.return_value = mock_client
+        mock_client.post.return_value = MockResponse({"result": "hola.mp3", "error": None})
+
+        assert backend.store_media_path("hola.mp3", media) == "hola.mp3"
+
+        params = mock_client.post.call_args[1]['json']['params']
+        assert params == {"filename": "hola.mp3", "path": str(media.resolve())}
+
+
+def test_remote_anki_receives_streamed_base64(tmp_path):
+    """Without filesystem access the file is streamed with an exact Content-Length."""
+    media = tmp_path / "image.png"
+    content = bytes(range(256)) * 5000 + b"tail"
+    media.write_bytes(content)
+    backend = AnkiConnectBackend("http://anki.example:8765")
+
+    # Small blocks force the file to be encoded in several pieces
+    with patch.object(Base64File, "block_size", 3 * 1024), patch('httpx.Client') as mock_client_class:
+        mock_client = Mock()
+        mock_client_class.return_value = mock_client
+        mock_client.post.return_value = MockResponse({"result": "image.png", "error": None})
+
+        backend.store_media_path("image.png", media)
+
+        kwargs = mock_client.post.call_args[1]
+        body = b"".join(kwargs['content'])
+        assert int(kwargs['headers']['Content-Length']) == len(body)
+        payload = json.loads(body)
+        assert payload['action'] == 'storeMediaFile'
+        assert payload['params']['filename'] == 'image.png'
+        assert base64.b64decode(payload['params']['data']) == content
+
+
+def test_store_media_url():
+    backend = AnkiConnectBackend()
+
+    with patch('httpx.Client') as mock_client_class:
+        mock_client = Mock()
+        mock_client_class.return_value = mock_client
+        mock_client.post.return_value = MockResponse({"result": "flag.svg", "error": None})
+
+        backend.store_media_url("flag.svg", "https://example.com/flag.svg")
+
+        params = mock_client.post.call_args[1]['json']['params']
+        assert params == {"filename": "flag.svg", "url": "https://example.com/flag.svg"}
@@ -0,0 +1,209 @@
+"""Test the direct SQLite collection backend against fixture collections."""
+
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from ankiday.backends.collection import (
+    CollectionBackend,
+    FIELD_SEPARATOR,
+    create_collection,
+    field_checksum,
+    guid64,
+    strip_html_media,
+)
+from ankiday.config import Config
+from ankiday.ops.apply import Applier, Planner
+
+
+BASIC = [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{FrontSide}}<hr id=answer>{{Back}}"}]
+
+
+@pytest.fixture
+def collection(tmp_path):
+    return create_collection(tmp_path / "collection.anki2")
+
+
+@pytest.fixture
+def backend(collection):
+    with CollectionBackend(collection) as b:
+        b.create_model("Basic", ["Front", "Back"], BASIC, ".card {}")
+        yield b
+
+
+def _rows(path, sql, *params):
+    conn = sqlite3.connect(str(path))
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def test_fixture_collection_has_default_deck(collection):
+    with CollectionBackend(collection) as b:
+        assert b.list_decks() == ["Default"]
+        assert b.list_models() == []
+
+
+def test_rejects_other_schema_versions(collection):
+    conn = sqlite3.connect(str(collection))
+    conn.execute("UPDATE col SET ver = 18")
+    conn.commit()
+    conn.close()
+
+    with pytest.raises(RuntimeError, match="schema version 18"):
+        CollectionBackend(collection).list_decks()
+
+
+def test_add_notes_writes_notes_and_cards(collection, backend):
+    ids = backend.add_notes([
+        {"model": "Basic", "deck": "Lang::Spanish", "fields": {"Front": "<b>hola</b>", "Back": "hello"}, "tags": ["es"]},
+        {"model": "Basic", "deck": "Lang::Spanish", "fields": {"Front": "", "Back": "empty"}, "tags": []},
+    ])
+
+    assert ids[0] is not None and ids[1] is None
+    assert "Lang" in backend.list_decks() and "Lang::Spanish" in backend.list_decks()
+
+    guid, flds, sfld, csum, tags = _rows(collection, "SELECT guid, flds, sfld, csum, tags FROM notes")[0]
+    assert flds == FIELD_SEPARATOR.join(["<b>hola</b>", "hello"])
+    assert sfld == "hola"
+    assert csum == field_checksum("hola")
+    assert tags == " es "
+    assert len(guid) <= 10
+
+    ((nid, ord_, type_, queue, due),) = _rows(collection, "SELECT nid, ord, type, queue, due FROM cards")
+    assert (nid, ord_, type_, queue, due) == (ids[0], 0, 0, 0, 1)
+
+
+def test_cloze_model_gets_a_card_per_cloze_number(collection, backend):
+    backend.create_model(
+        "Cloze",
+        ["Text", "Extra"],
+        [{"name": "Cloze", "qfmt": "{{cloze:Text}}", "afmt": "{{cloze:Text}}<br>{{Extra}}"}],
+        "",
+        is_cloze=True,
+    )
+    backend.add_note("Cloze", "Default", {"Text": "{{c1::Paris}} is in {{c3::France}}", "Extra": ""}, [])
+
+    assert _rows(collection, "SELECT ord FROM cards ORDER BY ord") == [(0,), (2,)]
+
+
+def test_optional_template_card_is_created_when_field_is_filled(collection, backend):
+    backend.create_model(
+        "Reverse",
+        ["Front", "Back", "AddReverse"],
+        [
+            {"name": "Forward", "qfmt": "{{Front}}", "afmt": "{{Back}}"},
+            {"name": "Reverse", "qfmt": "{{#AddReverse}}{{Back}}{{/AddReverse}}", "afmt": "{{Front}}"},
+        ],
+        "",
+    )
+    nid = backend.add_note("Reverse", "Default", {"Front": "a", "Back": "b", "AddReverse": ""}, [])
+    assert _rows(collection, "SELECT ord FROM cards") == [(0,)]
+
+    backend.update_note_fields(nid, {"AddReverse": "y"})
+    assert _rows(collection, "SELECT ord FROM cards ORDER BY ord") == [(0,), (1,)]
+
+
+def test_can_add_notes_reports_duplicates_and_empty_notes(backend):
+    backend.add_note("Basic", "Default", {"Front": "one", "Back": ""}, [])
+
+    reasons = backend.can_add_notes([
+        {"model": "Basic", "deck": "Default", "fields": {"Front": "<i>one</i>", "Back": ""}, "tags": []},
+        {"model": "Basic", "deck": "Default", "fields": {"Front": "", "Back": "x"}, "tags": []},
+        {"model": "Basic", "deck": "Default", "fields": {"Front": "two", "Back": ""}, "tags": []},
+    ])
+
+    assert "duplicate" in reasons[0]
+    assert "empty" in reasons[1]
+    assert reasons[2] is None
+
+
+def test_find_notes_supports_planner_scope_queries(backend):
+    top = backend.add_note("Basic", "Lang", {"Front": "top", "Back": ""}, [])
+    sub = backend.add_note("Basic", "Lang::Spanish", {"Front": "sub", "Back": ""}, [])
+
+    assert backend.find_notes("") == [top, sub]
+    assert backend.find_notes('"deck:Lang"') == [top, sub]
+    assert backend.find_notes('"deck:Lang" -"deck:Lang::*" "note:Basic"') == [top]
+    assert backend.find_notes(f"nid:{sub}") == [sub]
+    with pytest.raises(ValueError, match="Unsupported search term"):
+        backend.find_notes("front:top")
+
+
+def test_failed_batch_call_rolls_back_only_itself(collection, backend):
+    with backend.batch() as batch:
+        ok = batch.add_note("Basic", "Default", {"Front": "kept", "Back": ""}, [])
+        bad = batch.add_note("Basic", "Default", {"Front": "x", "Nope": ""}, [])
+
+    assert ok.result()
+    with pytest.raises(RuntimeError, match="no field"):
+        bad.result()
+    assert _rows(collection, "SELECT sfld FROM notes") == [("kept",)]
+
+
+def test_delete_decks_with_cards_removes_notes_and_records_graves(collection, backend):
+    nid = backend.add_note("Basic", "Old::Sub", {"Front": "gone", "Back": ""}, [])
+
+    backend.delete_decks(["Old"], cards_too=True)
+
+    assert backend.list_decks() == ["Default"]
+    assert _rows(collection, "SELECT count(*) FROM notes") == [(0,)]
+    assert (nid, 1) in _rows(collection, "SELECT oid, type FROM graves")
+
+
+def test_changes_are_visible_to_a_fresh_connection(collection, backend):
+    backend.create_deck("Fresh")
+    decks = json.loads(_rows(collection, "SELECT decks FROM col")[0][0])
+    assert "Fresh" in {d["name"] for d in decks.values()}
+
+
+def test_readers_wait_for_a_batch_in_another_thread(backend):
+    seen = []
+    with backend.batch() as batch:
+        batch.create_deck("Pending")
+        reader = threading.Thread(target=lambda: seen.append(backend.list_decks()))
+        reader.start()
+        reader.join(0.2)
+        assert reader.is_alive()
+    reader.join()
+
+    assert "Pending" in seen[0]
+
+
+def test_media_goes_to_collection_media_folder(collection, backend, tmp_path):
+    src = tmp_path / "img.png"
+    src.write_bytes(b"png")
+
+    assert backend.store_media_path("img.png", src) == "img.png"
+    assert (tmp_path / "collection.media" / "img.png").read_bytes() == b"png"
+    assert backend.get_media_files_names("*.png") == ["img.png"]
+    with pytest.raises(ValueError):
+        backend.store_media_file("../evil", b"")
+
+
+def test_plan_and_apply_against_collection(collection, tmp_path):
+    cfg = Config.model_validate({
+        "backend": "collection",
+        "models": [{"name": "Vocab", "fields": ["Word", "Meaning"], "uniqueField": "Word",
+                    "templates": [{"name": "Card 1", "qfmt": "{{Word}}", "afmt": "{{Meaning}}"}]}],
+        "decks": [{"name": "Lang::Spanish"}],
+        "notes": [
+            {"model": "Vocab", "deck": "Lang::Spanish", "fields": {"Word": "gato", "Meaning": "cat"}},
+            {"model": "Vocab", "deck": "Lang::Spanish", "fields": {"Word": "perro", "Meaning": "dog"}},
+        ],
+    })
+
+    with CollectionBackend(collection) as b:
+        Applier(b).apply(Planner(b).build_plan(cfg))
+    with CollectionBackend(collection) as b:
+        assert Planner(b).build_plan(cfg).steps == []
+
+    assert _rows(collection, "SELECT count(*) FROM cards") == [(2,)]
+
+
+def test_helpers():
+    assert strip_html_media('<img src="a.png"> x&amp;y') == "a.png  x&y"
+    assert len({guid64() for _ in range(100)}) == 100
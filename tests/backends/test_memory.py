@@ -0,0 +1,92 @@
+"""Test the recording in-memory backend."""
+
+import pytest
+
+from ankiday.backends.memory import MemoryBackend
+
+
+BASIC = [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Back}}"}]
+
+
+@pytest.fixture
+def backend():
+    b = MemoryBackend()
+    b.create_model("Basic", ["Front", "Back"], BASIC, "")
+    b.create_deck("Lang::Spanish")
+    b.reset_counters()
+    return b
+
+
+def _note(front, deck="Lang::Spanish"):
+    return {"model": "Basic", "deck": deck, "fields": {"Front": front, "Back": "x"}, "tags": []}
+
+
+def test_behaves_like_a_collection(backend):
+    ids = backend.add_notes([_note("a"), _note("a"), _note(""), _note("b", deck="Missing")])
+
+    assert ids[0] is not None and ids[1:] == [None, None, None]
+    assert backend.can_add_notes([_note("a"), _note("c")]) == ["cannot create note because it is a duplicate", None]
+    assert backend.list_decks() == ["Default", "Lang", "Lang::Spanish"]
+    assert backend.find_notes('"deck:Lang" -"deck:Lang::*" "note:Basic"') == []
+    assert backend.find_notes('"deck:Lang::Spanish" "note:Basic"') == [ids[0]]
+    (info,) = backend.notes_info([ids[0]])
+    assert info["fields"]["Front"] == {"value": "a", "order": 0}
+
+    backend.update_note_fields(ids[0], {"Front": "z"})
+    assert backend.can_add_notes([_note("a")]) == [None]
+    backend.delete_decks(["Lang"], cards_too=True)
+    assert backend.notes == {}
+
+
+def test_direct_calls_are_one_request_each(backend):
+    backend.list_decks()
+    backend.list_models()
+
+    assert backend.requests == 2
+    assert [c.method for c in backend.calls] == ["list_decks", "list_models"]
+    assert backend.calls[1].request == 2
+
+
+def test_batch_packs_calls_into_requests(backend):
+    with backend.batch(chunk_size=3) as batch:
+        found = [batch.find_notes(f"nid:{i}") for i in range(7)]
+        assert not found[-1].done
+
+    assert backend.requests == 3
+    assert all(d.result() == [] for d in found)
+    assert backend.call_counts() == {"find_notes": 7}
+
+
+def test_errors_are_recorded_and_delivered(backend):
+    with backend.batch() as batch:
+        bad = batch.model_styling("Missing")
+
+    with pytest.raises(RuntimeError, match="model was not found"):
+        bad.result()
+    assert isinstance(backend.calls[-1].error, RuntimeError)
+
+
+def test_bytes_are_counted_both_ways(backend):
+    backend.store_media_file("a.bin", b"x" * 300)
+
+    (call,) = backend.calls
+    assert call.bytes_sent > 400  # base64 of 300 bytes
+    assert backend.bytes_received == call.bytes_received > 0
+
+
+def test_overridden_actions_are_recorded_and_batched():
+    class FailingBackend(MemoryBackend):
+        def create_deck(self, name):
+            if name == "Bad":
+                raise RuntimeError("deck refused")
+            return super().create_deck(name)
+
+    backend = FailingBackend()
+    with backend.batch() as batch:
+        good, bad = batch.create_deck("Good"), batch.create_deck("Bad")
+
+    assert good.result() == backend.decks["Good"]
+    with pytest.raises(RuntimeError, match="deck refused"):
+        bad.result()
+    assert backend.requests == 1
+    assert [c.method for c in backend.calls] == ["create_deck", "create_deck"]
@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep each test's caches in its own directory instead of ``~/.cache/ankiday``."""
+    path = tmp_path / "cache"
+    monkeypatch.setenv("ANKIDAY_CACHE_DIR", str(path))
+    return path
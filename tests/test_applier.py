@@ -0,0 +1,138 @@
+"""Tests for Applier execution of plan steps."""
+
+import threading
+import time
+
+import pytest
+
+from ankiday.backends.base import Backend
+from ankiday.backends.memory import MemoryBackend
+from ankiday.ops.apply import Applier, Plan, PlanStep
+
+
+def _backend(*existing, kind=MemoryBackend):
+    """Backend of type ``kind`` with a one-field Basic model, deck Test and notes for ``existing`` fronts."""
+    backend = kind()
+    backend.create_model("Basic", ["Front"], [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Front}}"}], "")
+    backend.create_deck("Test")
+    for front in existing:
+        backend.add_note("Basic", "Test", {"Front": front}, [])
+    backend.reset_counters()
+    return backend
+
+
+def _ids(backend):
+    return {note["fields"]["Front"]: nid for nid, note in backend.notes.items()}
+
+
+def _bulk_calls(backend):
+    return [(c.method, len(c.args[0])) for c in backend.calls]
+
+
+def _add_step(front):
+    note = {"model": "Basic", "deck": "Test", "fields": {"Front": front}, "tags": [], "media": []}
+    return PlanStep("note.add", f"add {front}", {"note": note, "key": front})
+
+
+def test_consecutive_adds_use_chunked_bulk_calls():
+    """Note additions are checked and added a chunk at a time, and ids map back to keys."""
+    backend = _backend()
+    plan = Plan(steps=[_add_step(str(i)) for i in range(5)])
+
+    Applier(backend, add_notes_chunk_size=2).apply(plan)
+
+    assert _bulk_calls(backend) == [("can_add_notes", 2), ("can_add_notes", 2), ("can_add_notes", 1),
+                                    ("add_notes", 2), ("add_notes", 2), ("add_notes", 1)]
+    assert plan.note_ids == _ids(backend)
+    assert len(plan.note_ids) == 5
+
+
+def test_refused_notes_do_not_stop_the_others():
+    """Notes Anki would refuse are reported; the remaining notes are still added."""
+    backend = _backend("b", "d")
+    plan = Plan(steps=[_add_step(f) for f in "abcd"])
+
+    with pytest.raises(RuntimeError, match=r"2 of 4 steps failed; first: \[note.add\] add b: Cannot add note: .* duplicate"):
+        Applier(backend).apply(plan)
+
+    assert _bulk_calls(backend) == [("can_add_notes", 4), ("add_notes", 2)]
+    ids = _ids(backend)
+    assert plan.note_ids == {"a": ids["a"], "c": ids["c"]}
+
+
+def test_reason_a_note_was_not_added_is_reported():
+    """When a note fails only at addition, the backend's error text is in the failure."""
+
+    class OneByOneBackend(Backend):
+        def add_note(self, model, deck, fields, tags):
+            if fields["Front"] == "b":
+                raise RuntimeError("deck was not found: Test")
+            return 1
+
+    with pytest.raises(RuntimeError, match="Anki did not add the note: deck was not found: Test"):
+        Applier(OneByOneBackend()).apply(Plan(steps=[_add_step("a"), _add_step("b")]))
+
+
+def test_bulk_steps_are_applied():
+    """Bulk steps from the optimizer expand to their backend calls."""
+    backend = _backend("1", "2", "3", "4")
+    ids = _ids(backend)
+    plan = Plan(steps=[
+        PlanStep("deck.create", "", {"names": ["A", "B"]}),
+        PlanStep("note.update", "", {"notes": [{"id": ids["1"], "fields": {}}, {"id": ids["2"], "fields": {}}]}),
+        PlanStep("note.delete", "", {"ids": [ids["3"], ids["4"]]}),
+    ])
+
+    Applier(backend).apply(plan)
+
+    assert [(c.method, c.args[0]) for c in backend.calls] == [
+        ("create_deck", "A"), ("create_deck", "B"),
+        ("update_note_fields", ids["1"]), ("update_note_fields", ids["2"]),
+        ("delete_notes", [ids["3"], ids["4"]]),
+    ]
+
+
+def test_notes_of_different_decks_are_applied_in_parallel():
+    """Each deck's notes form their own part; parts run on separate threads after decks exist."""
+    threads = {}
+
+    class ThreadBackend(MemoryBackend):
+        def update_note_fields(self, note_id, fields):
+            threads[note_id] = threading.current_thread().name
+            time.sleep(0.02)
+            super().update_note_fields(note_id, fields)
+
+    backend = _backend("1", "2", kind=ThreadBackend)
+    first, second = _ids(backend).values()
+    plan = Plan(steps=[
+        PlanStep("deck.create", "", {"names": ["A", "B"]}),
+        PlanStep("note.update", "", {"id": first, "deck": "A", "fields": {}}),
+        PlanStep("note.update", "", {"id": second, "deck": "B", "fields": {}}),
+    ])
+
+    Applier(backend, parallelism=2).apply(plan)
+
+    assert [(c.method, c.args[0]) for c in backend.calls[:2]] == [("create_deck", "A"), ("create_deck", "B")]
+    assert threads[first] != threads[second]
+
+
+def test_keep_going_applies_independent_parts():
+    """Without fail-fast, a failing deck part does not stop the others."""
+
+    class FailingBackend(MemoryBackend):
+        def update_note_fields(self, note_id, fields):
+            if note_id == failing:
+                raise RuntimeError("note was not found")
+            super().update_note_fields(note_id, fields)
+
+    backend = _backend("1", "2", kind=FailingBackend)
+    failing, other = _ids(backend).values()
+    plan = Plan(steps=[
+        PlanStep("note.update", "", {"id": failing, "deck": "A", "fields": {}}),
+        PlanStep("note.update", "", {"id": other, "deck": "B", "fields": {}}),
+    ])
+
+    with pytest.raises(RuntimeError, match="note was not found"):
+        Applier(backend, fail_fast=False).apply(plan)
+
+    assert [(c.method, c.args[0]) for c in backend.calls if c.error is None] == [("update_note_fields", other)]
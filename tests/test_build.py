@@ -0,0 +1,107 @@
+"""Tests for compiling a config into an .apkg package."""
+
+import json
+import sqlite3
+import zipfile
+
+import pytest
+
+from ankiday.config import Config
+from ankiday.ops.build import build_package
+
+
+def _config(**extra):
+    return Config.model_validate({
+        "models": [
+            {"name": "Vocab", "fields": ["Word", "Meaning"], "uniqueField": "Word",
+             "templates": [{"name": "Card 1", "qfmt": "{{Word}}", "afmt": "{{Meaning}}"}]},
+            {"name": "Cloze", "fields": ["Text"], "uniqueField": "Text", "isCloze": True,
+             "templates": [{"name": "Cloze", "qfmt": "{{cloze:Text}}", "afmt": "{{cloze:Text}}"}]},
+        ],
+        "decks": [{"name": "Lang::Spanish"}],
+        "notes": [
+            {"model": "Vocab", "deck": "Lang::Spanish", "fields": {"Word": "gato", "Meaning": "cat"}, "media": ["cat.png"]},
+            {"model": "Vocab", "deck": "Lang::Spanish", "fields": {"Word": "perro", "Meaning": "dog"}, "media": ["./cat.png"]},
+            {"model": "Cloze", "deck": "Lang::Spanish", "fields": {"Text": "{{c1::uno}} {{c2::dos}}"}},
+        ],
+        **extra,
+    })
+
+
+def _collection(package, tmp_path):
+    with zipfile.ZipFile(package) as zf:
+        zf.extract("collection.anki2", tmp_path / "out")
+        media = json.loads(zf.read("media"))
+        files = {name: zf.read(name) for name in media}
+    return sqlite3.connect(str(tmp_path / "out" / "collection.anki2")), media, files
+
+
+def test_build_writes_collection_and_media(tmp_path):
+    (tmp_path / "cat.png").write_bytes(b"meow")
+    package = tmp_path / "deck.apkg"
+
+    result = build_package(_config(), package, tmp_path)
+
+    assert (result.notes, result.cards, result.media, result.skipped) == (3, 4, 1, 0)
+    conn, media, files = _collection(package, tmp_path)
+    assert media == {"0": "cat.png"}
+    assert files == {"0": b"meow"}
+    assert conn.execute("SELECT count(*) FROM notes").fetchone() == (3,)
+    decks = json.loads(conn.execute("SELECT decks FROM col").fetchone()[0])
+    assert {"Default", "Lang", "Lang::Spanish"} == {d["name"] for d in decks.values()}
+
+
+def test_rebuilt_package_keeps_note_guids(tmp_path):
+    (tmp_path / "cat.png").write_bytes(b"meow")
+    build_package(_config(), tmp_path / "a.apkg", tmp_path)
+    build_package(_config(), tmp_path / "b.apkg", tmp_path)
+
+    builds = []
+    for name in ("a", "b"):
+        conn, _, _ = _collection(tmp_path / f"{name}.apkg", tmp_path / name)
+        notes = sorted(conn.execute("SELECT guid, mid FROM notes"))
+        models, decks = (json.loads(v) for v in conn.execute("SELECT models, decks FROM col").fetchone())
+        builds.append((notes, sorted(models), sorted(decks)))
+    # Anki matches imported notes by GUID and note type, so both must survive a rebuild
+    assert builds[0] == builds[1]
+
+
+def test_same_unique_value_in_two_decks_gets_distinct_guids(tmp_path):
+    cfg = Config.model_validate({
+        "models": [{"name": "Basic", "fields": ["Front", "Back"], "uniqueField": "Back",
+                    "templates": [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Back}}"}]}],
+        "decks": [{"name": "A"}, {"name": "B"}],
+        "notes": [{"model": "Basic", "deck": d, "fields": {"Front": d, "Back": "same"}} for d in ("A", "B")],
+    })
+
+    build_package(cfg, tmp_path / "deck.apkg", tmp_path)
+
+    conn, _, _ = _collection(tmp_path / "deck.apkg", tmp_path)
+    guids = [r[0] for r in conn.execute("SELECT guid FROM notes")]
+    assert len(guids) == 2 and len(set(guids)) == 2
+
+
+def test_duplicate_notes_are_skipped(tmp_path):
+    (tmp_path / "cat.png").write_bytes(b"meow")
+    cfg = _config()
+    cfg.notes.append(cfg.notes[0].model_copy())
+
+    result = build_package(cfg, tmp_path / "deck.apkg", tmp_path, chunk_size=2)
+
+    assert (result.notes, result.skipped) == (3, 1)
+
+
+def test_missing_media_fails_without_output(tmp_path):
+    package = tmp_path / "deck.apkg"
+
+    with pytest.raises(FileNotFoundError):
+        build_package(_config(), package, tmp_path)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_unknown_model_is_rejected(tmp_path):
+    cfg = _config(notes=[{"model": "Missing", "deck": "A", "fields": {"Front": "x"}}])
+
+    with pytest.raises(RuntimeError, match="Missing"):
+        build_package(cfg, tmp_path / "deck.apkg", tmp_path)
@@ -1,7 +1,12 @@
 """Basic tests for ankiday configuration."""
 
 from pathlib import Path
-from ankiday.config import Config, Model, Template, Deck, Note
+from unittest.mock import patch
+
+import pytest
+import yaml
+
+from ankiday.config import Config, Model, Template, Deck, Note, load_config
 
 
 def test_config_validation():
@@ -98,6 +103,113 @@ def test_regular_model_defaults_to_non_cloze():
 
     assert regular_model.isCloze == False
 
+def test_load_config_reuses_cached_config(tmp_path):
+    """Test that an unchanged file is loaded from the cache without parsing."""
+    path = tmp_path / "decks.yaml"
+    path.write_text("decks:\n  - name: Words\n")
+    first = load_config(path)
+
+    with patch("ankiday.config.yaml.load", side_effect=AssertionError("parsed again")):
+        assert load_config(path) == first
+
+    path.write_text("decks:\n  - name: Other\n")
+    assert load_config(path).decks[0].name == "Other"
+
+
+def test_load_config_ignores_broken_cache(tmp_path):
+    """Test that an unreadable cache entry falls back to parsing."""
+    path = tmp_path / "decks.yaml"
+    path.write_text("decks:\n  - name: Words\n")
+    load_config(path)
+    for entry in (tmp_path / "cache" / "configs").iterdir():
+        entry.write_bytes(b"garbage")
+
+    assert load_config(path).decks[0].name == "Words"
+
+
+def test_load_config_rejects_cache_from_another_schema(tmp_path):
+    """Test that a cache entry written for a different config schema is not reused."""
+    path = tmp_path / "decks.yaml"
+    path.write_text("decks:\n  - name: Words\n")
+    load_config(path)
+
+    with patch("ankiday.config._schema_hash", return_value="Config-changed"):
+        with patch("ankiday.config.yaml.load", wraps=yaml.load) as parse:
+            assert load_config(path).decks[0].name == "Words"
+    assert parse.called
+
+
+BASIC = {"name": "Basic", "fields": ["Front", "Back"], "uniqueField": "Front",
+         "templates": [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Back}}"}]}
+
+
+def _deck_file(path, deck, words):
+    path.parent.mkdir(exist_ok=True)
+    path.write_text(yaml.safe_dump({
+        "decks": [{"name": deck}],
+        "notes": [{"model": "Basic", "deck": deck, "fields": {"Front": w, "Back": ""}} for w in words],
+    }))
+
+
+def test_include_merges_files_in_path_order(tmp_path):
+    """Test that included deck files are appended to the config, sorted by path."""
+    _deck_file(tmp_path / "decks" / "b.yaml", "B", ["b1"])
+    _deck_file(tmp_path / "decks" / "a.yaml", "A", ["a1", "a2"])
+    path = tmp_path / "decks.yaml"
+    path.write_text(yaml.safe_dump({"models": [BASIC], "include": "decks/*.yaml"}))
+
+    cfg = load_config(path)
+
+    assert cfg.include == ["decks/*.yaml"]
+    assert [d.name for d in cfg.decks] == ["A", "B"]
+    assert [n.fields["Front"] for n in cfg.notes] == ["a1", "a2", "b1"]
+    assert load_config(path, cache=False, workers=2) == cfg
+
+
+def test_include_reparses_only_changed_files(tmp_path):
+    """Test that editing one included file parses only that file again."""
+    for deck in "ABC":
+        _deck_file(tmp_path / "decks" / f"{deck}.yaml", deck, [deck.lower()])
+    path = tmp_path / "decks.yaml"
+    path.write_text(yaml.safe_dump({"models": [BASIC], "include": ["decks"]}))
+    load_config(path, workers=1)
+    _deck_file(tmp_path / "decks" / "B.yaml", "B", ["b", "b2"])
+
+    with patch("ankiday.config.yaml.load", wraps=yaml.load) as parse:
+        cfg = load_config(path, workers=1)
+
+    assert parse.call_count == 1
+    assert [n.fields["Front"] for n in cfg.notes] == ["a", "b", "b2", "c"]
+
+
+def test_include_conflicts_name_both_files(tmp_path):
+    """Test that a note or deck defined in two files is reported with both paths."""
+    _deck_file(tmp_path / "decks" / "a.yaml", "Words", ["same"])
+    _deck_file(tmp_path / "decks" / "b.yaml", "Words", ["same"])
+    path = tmp_path / "decks.yaml"
+    path.write_text(yaml.safe_dump({"models": [BASIC], "include": "decks/*.yaml"}))
+
+    with pytest.raises(RuntimeError, match=r"Front='same'.*decks/a.yaml and decks/b.yaml"):
+        load_config(path)
+
+    (tmp_path / "decks" / "b.yaml").write_text(yaml.safe_dump({"decks": [{"name": "Words", "config": {"x": 1}}]}))
+    with pytest.raises(RuntimeError, match="Deck 'Words' is defined differently"):
+        load_config(path)
+
+    (tmp_path / "decks" / "b.yaml").write_text(yaml.safe_dump({"backend": "collection"}))
+    with pytest.raises(RuntimeError, match="validation failed in .*b.yaml"):
+        load_config(path)
+
+
+def test_include_leaves_notes_without_unique_value_to_the_planner(tmp_path):
+    """Test that notes missing their unique field in two files are not reported as the same note."""
+    _deck_file(tmp_path / "decks" / "a.yaml", "Words", [""])
+    _deck_file(tmp_path / "decks" / "b.yaml", "Words", [""])
+    path = tmp_path / "decks.yaml"
+    path.write_text(yaml.safe_dump({"models": [BASIC], "include": "decks/*.yaml"}))
+
+    assert len(load_config(path).notes) == 2
+
 
 if __name__ == "__main__":
     test_config_validation()
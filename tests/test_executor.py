@@ -0,0 +1,78 @@
+"""Tests for the dependency-graph executor."""
+
+import threading
+import time
+
+import pytest
+
+from ankiday.ops.executor import DagExecutor, Task
+
+
+def _recorder(log, name, error=None, delay=0.0):
+    def run():
+        time.sleep(delay)
+        log.append(name)
+        if error:
+            raise error
+
+    return run
+
+
+def test_dependencies_run_first():
+    log = []
+    tasks = [
+        Task("notes", _recorder(log, "notes"), {"decks", "models"}),
+        Task("decks", _recorder(log, "decks", delay=0.02)),
+        Task("models", _recorder(log, "models")),
+    ]
+
+    assert DagExecutor(parallelism=3).run(tasks).ok
+    assert log[-1] == "notes"
+
+
+def test_independent_tasks_overlap_up_to_the_limit():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def run():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+
+    DagExecutor(parallelism=2).run([Task(str(i), run) for i in range(6)])
+
+    assert max(peak) == 2
+
+
+def test_fail_fast_stops_starting_tasks():
+    log = []
+    tasks = [Task("a", _recorder(log, "a", RuntimeError("boom"))), Task("b", _recorder(log, "b"))]
+
+    result = DagExecutor(parallelism=1, fail_fast=True).run(tasks)
+
+    assert [(name, str(err)) for name, err in result.failed] == [("a", "boom")]
+    assert result.skipped == ["b"]
+    assert log == ["a"]
+
+
+def test_continue_on_error_skips_only_dependents():
+    log = []
+    tasks = [
+        Task("a", _recorder(log, "a", RuntimeError("boom"))),
+        Task("b", _recorder(log, "b")),
+        Task("c", _recorder(log, "c"), {"a"}),
+    ]
+
+    result = DagExecutor(parallelism=1, fail_fast=False).run(tasks)
+
+    assert log == ["a", "b"]
+    assert result.skipped == ["c"]
+
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError, match="unknown tasks"):
+        DagExecutor().run([Task("a", lambda: None, {"missing"})])
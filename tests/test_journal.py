@@ -0,0 +1,110 @@
+"""Tests for the write-ahead journal and resumed applies."""
+
+from pathlib import Path
+
+from ankiday.backends.memory import MemoryBackend
+from ankiday.journal import Journal, journal_path
+from ankiday.ops.apply import Applier, Plan
+
+
+def _backend(*existing):
+    """MemoryBackend with a one-field Basic model and notes for ``existing`` fronts in deck A."""
+    backend = MemoryBackend()
+    backend.create_model("Basic", ["Front"], [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Front}}"}], "")
+    backend.create_deck("A")
+    for front in existing:
+        backend.add_note("Basic", "A", {"Front": front}, [])
+    backend.reset_counters()
+    return backend
+
+
+def _ids(backend):
+    return {note["fields"]["Front"]: nid for nid, note in backend.notes.items()}
+
+
+def _plan():
+    note = {"model": "Basic", "deck": "A", "tags": []}
+    plan = Plan(unchanged=2)
+    plan.add("deck.create", "Create deck 'A'", {"name": "A"})
+    plan.add("note.add", "add a", {"note": {**note, "fields": {"Front": "a"}}, "key": "ka"})
+    plan.add("note.add", "add b", {"note": {**note, "fields": {"Front": "b"}}, "key": "kb"})
+    plan.note_ids["kx"] = 7
+    return plan
+
+
+def test_journal_path_is_next_to_config():
+    assert journal_path(Path("decks/spanish.yaml")) == Path("decks/spanish.ankiday.journal")
+
+
+def test_journal_records_completed_steps(tmp_path):
+    """Completed steps and created note ids survive a reload; a torn last line is ignored."""
+    path = tmp_path / "config.ankiday.journal"
+    journal = Journal.create(path, _plan(), "cfg")
+    backend = _backend()
+    Applier(backend, journal=journal).apply(journal.plan)
+    journal.close()
+    with path.open("a") as f:
+        f.write('{"done": [')
+
+    loaded = Journal.load(path)
+
+    assert loaded.config_hash == "cfg"
+    assert loaded.completed == {1, 2, 3}
+    assert loaded.in_doubt == set()
+    assert loaded.plan.unchanged == 2
+    ids = _ids(backend)
+    assert loaded.plan.note_ids == {"kx": 7, "ka": ids["a"], "kb": ids["b"]}
+    loaded.discard()
+    assert not path.exists()
+
+
+def test_resume_skips_completed_steps_and_accepts_in_flight_adds(tmp_path):
+    """Steps confirmed before the crash are skipped; adds that were in flight and now
+    show up as duplicates count as done."""
+    path = tmp_path / "config.ankiday.journal"
+    journal = Journal.create(path, _plan(), "cfg")
+    journal.begin([1])
+    journal.commit([1])
+    journal.begin([2, 3])  # crash before Anki's reply was recorded
+    journal.close()
+
+    journal = Journal.load(path)
+    assert journal.in_doubt == {2, 3}
+    backend = _backend("a")
+    Applier(backend, journal=journal).apply(journal.plan)
+
+    assert "create_deck" not in backend.call_counts()  # completed before the crash
+    assert [[n["fields"]["Front"] for n in c.args[0]] for c in backend.calls if c.method == "add_notes"] == [["b"]]
+    assert journal.plan.note_ids["kb"] == _ids(backend)["b"]
+    journal.close()
+    assert Journal.load(path).completed == {1, 2, 3}
+
+
+def test_resume_accepts_in_flight_model_steps(tmp_path):
+    """A model creation or deletion in flight at the crash is not sent again once Anki shows it applied."""
+    plan = Plan()
+    plan.add("model.create", "Create model 'New'", {
+        "name": "New", "fields": ["Front"], "css": "", "isCloze": False,
+        "templates": [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Front}}"}],
+    })
+    plan.add("model.delete", "Delete unmanaged model 'Old'", {"name": "Old"})
+    path = tmp_path / "config.ankiday.journal"
+    journal = Journal.create(path, plan, "cfg")
+    journal.begin([1, 2])  # crash after Anki applied both
+    journal.close()
+    backend = MemoryBackend()
+    backend.create_model("New", ["Front"], [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Front}}"}], "")
+
+    journal = Journal.load(path)
+    Applier(backend, journal=journal).apply(journal.plan)
+
+    assert backend.list_models() == ["New"]
+    journal.close()
+    assert Journal.load(path).completed == {1, 2}
+
+
+def test_missing_or_foreign_journal_is_ignored(tmp_path):
+    path = tmp_path / "config.ankiday.journal"
+    assert Journal.load(path) is None
+    path.write_text('{"version": 999}\n')
+    assert Journal.load(path) is None
@@ -0,0 +1,112 @@
+"""Tests for the media manifest and the local hash cache."""
+
+import os
+
+from ankiday.backends.memory import MemoryBackend
+from ankiday.cache import HashCache, file_hash
+from ankiday.ops.apply import Applier, Plan, PlanStep
+from ankiday.ops.media import MediaManifest
+
+
+def _backend(names=()):
+    """MemoryBackend whose media folder already holds ``names``."""
+    backend = MemoryBackend()
+    backend.media.update((name, b"in Anki") for name in names)
+    return backend
+
+
+def _uploads(backend):
+    return [c.args[0] for c in backend.calls if c.method.startswith("store_media")]
+
+
+def test_media_folder_is_listed_once(tmp_path):
+    """Any number of notes share one listing of Anki's media folder."""
+    for name in ("a.png", "b.png"):
+        (tmp_path / name).write_bytes(name.encode())
+    backend = _backend()
+    manifest = MediaManifest(backend, tmp_path)
+
+    assert manifest.process(["a.png"]) == {"a.png": "a.png"}
+    assert manifest.process(["a.png", "b.png"]) == {"a.png": "a.png", "b.png": "b.png"}
+
+    assert backend.call_counts()["get_media_files_names"] == 1
+    assert _uploads(backend) == ["a.png", "b.png"]
+
+
+def test_applier_uploads_shared_media_once_before_notes(tmp_path):
+    """Media shared by many notes is processed once, before any note step runs."""
+    (tmp_path / "logo.png").write_bytes(b"logo")
+    (tmp_path / "a.mp3").write_bytes(b"a")
+    note = {"model": "Basic", "deck": "Test", "tags": [], "media": ["logo.png"]}
+    steps = [
+        PlanStep("note.add", f"add {i}", {"note": {**note, "fields": {"Front": str(i)}}})
+        for i in range(3)
+    ]
+    backend = _backend()
+    backend.create_model("Basic", ["Front"], [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Front}}"}], "")
+    backend.create_deck("Test")
+    existing = backend.add_note("Basic", "Test", {"Front": "old"}, [])
+    backend.reset_counters()
+    steps.append(PlanStep("note.update", "update", {"id": existing, "fields": {}, "media": ["logo.png", "./a.mp3"]}))
+
+    Applier(backend).apply(Plan(steps=steps), config_dir=tmp_path)
+
+    actions = [c.method for c in backend.calls]
+    assert actions[:3] == ["get_media_files_names", "store_media_path", "store_media_path"]
+    assert _uploads(backend) == ["logo.png", "a.mp3"]
+    assert len(backend.notes) == 4
+
+
+def test_unchanged_media_is_skipped_and_changed_media_reuploaded(tmp_path):
+    """Files whose hash matches the recorded upload are skipped; edited files are sent again."""
+    same, edited = tmp_path / "same.png", tmp_path / "edited.png"
+    same.write_bytes(b"same")
+    edited.write_bytes(b"new content")
+    known = {"same.png": file_hash(same), "edited.png": "0" * 16}
+    backend = _backend(names=["same.png", "edited.png"])
+
+    manifest = MediaManifest(backend, tmp_path, known=known)
+    manifest.process(["same.png", "edited.png", "https://example.com/img/remote.jpg"])
+
+    assert _uploads(backend) == ["edited.png", "remote.jpg"]
+    assert manifest.known["edited.png"] == file_hash(edited)
+
+
+def test_unknown_remote_file_is_uploaded_once(tmp_path):
+    """A same-named file in Anki without a recorded hash may differ, so it is replaced."""
+    (tmp_path / "a.png").write_bytes(b"a")
+    backend = _backend(names=["a.png"])
+
+    manifest = MediaManifest(backend, tmp_path)
+    manifest.process(["a.png"])
+    MediaManifest(backend, tmp_path, known=manifest.known).process(["a.png"])
+
+    assert _uploads(backend) == ["a.png"]
+
+
+def test_hash_cache_skips_unchanged_files(tmp_path, monkeypatch):
+    """Cached hashes are reused until mtime or size change, and persist across runs."""
+    media = tmp_path / "a.png"
+    media.write_bytes(b"one")
+    cache_file = tmp_path / "cache" / "media-hashes.json"
+
+    cache = HashCache.load(cache_file)
+    first = cache.hash(media)
+    cache.save()
+
+    reads = []
+    monkeypatch.setattr("ankiday.cache.file_hash", lambda path: reads.append(path) or "x" * 16)
+    reloaded = HashCache.load(cache_file)
+    assert reloaded.hash(media) == first
+    assert reads == []
+
+    media.write_bytes(b"two!")
+    os.utime(media, ns=(0, 0))
+    assert reloaded.hash(media) == "x" * 16
+    assert reads == [media]
+
+
+def test_process_media_files_is_still_importable_from_apply():
+    from ankiday.ops import apply, media
+
+    assert apply.process_media_files is media.process_media_files
@@ -0,0 +1,61 @@
+"""Tests for the plan optimizer."""
+
+from ankiday.ops.apply import Plan
+from ankiday.ops.optimize import count_requests, optimize_plan
+
+
+def _plan(*steps):
+    plan = Plan(unchanged=3)
+    for kind, payload in steps:
+        plan.add(kind, kind, payload)
+    return plan
+
+
+def test_steps_are_merged_into_bulk_steps():
+    """Deck, note update and note delete steps become one bulk step each, in entity order."""
+    plan = _plan(
+        ("deck.create", {"name": "Lang"}),
+        ("deck.create", {"name": "Lang::Spanish"}),
+        ("deck.create", {"name": "Other"}),
+        ("deck.delete", {"name": "Old", "cardsToo": False}),
+        ("model.updateStyling", {"name": "Basic", "css": ""}),
+        ("note.update", {"id": 1, "fields": {}, "media": []}),
+        ("note.add", {"note": {}, "key": "a"}),
+        ("note.update", {"id": 2, "fields": {}, "media": []}),
+        ("note.add", {"note": {}, "key": "b"}),
+        ("note.delete", {"id": 8}),
+        ("note.delete", {"id": 9}),
+    )
+
+    optimized = optimize_plan(plan)
+
+    assert [(s.kind, s.payload) for s in optimized.steps] == [
+        ("deck.create", {"names": ["Lang::Spanish", "Other"]}),  # "Lang" comes with its subdeck
+        ("deck.delete", {"name": "Old", "cardsToo": False}),
+        ("model.updateStyling", {"name": "Basic", "css": ""}),
+        ("note.update", {"notes": [plan.steps[5].payload, plan.steps[7].payload]}),
+        ("note.add", {"note": {}, "key": "a"}),
+        ("note.add", {"note": {}, "key": "b"}),
+        ("note.delete", {"ids": [8, 9]}),
+    ]
+    assert optimized.unchanged == 3
+    assert optimized.note_ids is plan.note_ids
+
+
+def test_entity_runs_are_not_reordered():
+    """Steps are only merged within a run of the same entity, so barriers stay in place."""
+    plan = _plan(
+        ("deck.create", {"name": "A"}),
+        ("model.create", {"name": "M"}),
+        ("deck.create", {"name": "B"}),
+    )
+
+    assert [s.payload for s in optimize_plan(plan).steps] == [{"name": "A"}, {"name": "M"}, {"name": "B"}]
+
+
+def test_request_count_reflects_bulk_steps():
+    """Bulk deletes cost one action; runs of actions are packed into multi requests."""
+    plan = _plan(*[("note.delete", {"id": i}) for i in range(10)], ("note.error", {}))
+
+    assert count_requests(plan, batch_size=4) == (10, 3)
+    assert count_requests(optimize_plan(plan), batch_size=4) == (1, 1)
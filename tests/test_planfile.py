@@ -0,0 +1,137 @@
+"""Test plan files written by diff --out and applied with apply --plan."""
+
+from unittest.mock import patch
+
+import pytest
+import yaml
+from typer.testing import CliRunner
+
+from ankiday.backends.collection import CollectionBackend, create_collection
+from ankiday.backends.memory import MemoryBackend
+from ankiday.cli import app
+from ankiday.config import Config
+from ankiday.ops.apply import Plan, Planner
+from ankiday.planfile import PlanFile, PlanFileError
+
+CONFIG = {
+    "backend": "collection",
+    "collection": {"path": "collection.anki2"},
+    "models": [{"name": "Basic", "fields": ["Front", "Back"], "uniqueField": "Front",
+                "templates": [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Back}}"}]}],
+    "decks": [{"name": "Words"}],
+    "notes": [{"model": "Basic", "deck": "Words", "fields": {"Front": f"w{i}", "Back": "x"}} for i in range(3)],
+}
+
+
+def test_round_trip(tmp_path):
+    plan = Plan(unchanged=2, note_ids={"k": 7})
+    plan.add("deck.create", "Create deck 'Words'", {"name": "Words"})
+    plan.add("note.add", "Add note", {"note": {"fields": {"Front": "é"}}, "key": "k2"})
+    path = tmp_path / "plan.jsonl"
+
+    PlanFile(plan, "cfg", "col").save(path)
+    loaded = PlanFile.load(path)
+
+    assert loaded.plan == plan
+    assert (loaded.config_hash, loaded.collection) == ("cfg", "col")
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 4
+
+
+def test_truncated_file_is_refused(tmp_path):
+    plan = Plan()
+    plan.add("deck.create", "Create deck 'Words'", {"name": "Words"})
+    path = tmp_path / "plan.jsonl"
+    PlanFile(plan, "cfg", "col").save(path)
+    path.write_text(path.read_text().splitlines()[0] + "\n")
+
+    with pytest.raises(PlanFileError, match="incomplete"):
+        PlanFile.load(path)
+
+
+def test_fingerprint_follows_managed_notes():
+    cfg = Config.model_validate({k: v for k, v in CONFIG.items() if k not in ("backend", "collection")})
+    backend = MemoryBackend()
+    planner = Planner(backend)
+    before = planner.fingerprint(cfg)
+    assert backend.requests == 1
+
+    backend.create_deck("Words")
+    backend.create_model("Basic", ["Front", "Back"], [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Back}}"}], "")
+    with_model = planner.fingerprint(cfg)
+    backend.update_model_templates("Basic", [{"name": "Card 1", "qfmt": "{{Back}}", "afmt": "{{Front}}"}])
+    with_templates = planner.fingerprint(cfg)
+    backend.update_model_styling("Basic", ".card { color: red; }")
+    with_css = planner.fingerprint(cfg)
+    backend.add_note("Basic", "Words", {"Front": "other", "Back": ""}, [])
+    requests = backend.requests
+    with_note = planner.fingerprint(cfg)
+
+    assert backend.requests == requests + 1
+    assert len({before, with_model, with_templates, with_css, with_note}) == 5
+
+
+@pytest.fixture
+def project(tmp_path):
+    create_collection(tmp_path / "collection.anki2")
+    config = tmp_path / "decks.yaml"
+    config.write_text(yaml.safe_dump(CONFIG))
+    return config
+
+
+def test_apply_runs_saved_plan_without_planning(project):
+    runner = CliRunner()
+    out = project.with_name("plan.jsonl")
+    assert runner.invoke(app, ["diff", "-f", str(project), "--out", str(out)]).exit_code == 0
+
+    with patch.object(Planner, "build_plan", side_effect=AssertionError("planned again")):
+        result = runner.invoke(app, ["apply", "-f", str(project), "--plan", str(out), "-y"])
+
+    assert result.exit_code == 0, result.output
+    with CollectionBackend(project.with_name("collection.anki2")) as backend:
+        assert len(backend.find_notes('"deck:Words"')) == 3
+
+
+def test_apply_refuses_stale_plan(project):
+    runner = CliRunner()
+    out = project.with_name("plan.jsonl")
+    runner.invoke(app, ["diff", "-f", str(project), "--out", str(out)])
+    with CollectionBackend(project.with_name("collection.anki2")) as backend:
+        backend.create_deck("Words")
+
+    result = runner.invoke(app, ["apply", "-f", str(project), "--plan", str(out), "-y"])
+
+    assert result.exit_code == 1
+    assert "Anki changed" in result.output
+
+    project.write_text(yaml.safe_dump({**CONFIG, "decks": [{"name": "Other"}]}))
+    result = runner.invoke(app, ["apply", "-f", str(project), "--plan", str(out), "-y"])
+    assert result.exit_code == 1
+    assert "config changed" in result.output
+
+
+def test_saved_steps_reference_config_notes(tmp_path):
+    cfg = Config.model_validate({k: v for k, v in CONFIG.items() if k not in ("backend", "collection")})
+    plan = Planner(MemoryBackend()).build_plan(cfg)
+    adds = [s for s in plan.steps if s.kind == "note.add"]
+    assert all(s._description is None and "note" not in s.payload for s in adds)
+    path = tmp_path / "plan.jsonl"
+
+    PlanFile(plan, "cfg", "col").save(path)
+    loaded = PlanFile.load(path).plan.bind(cfg.notes)
+
+    assert "w1" not in path.read_text(encoding="utf-8")
+    assert loaded == plan
+    assert [s.note for s in loaded.steps if s.kind == "note.add"] == cfg.notes
+
+
+def test_diff_summary_counts_steps(project):
+    runner = CliRunner()
+    result = runner.invoke(app, ["diff", "-f", str(project), "--summary"])
+
+    assert result.exit_code == 0, result.output
+    assert "Planned changes by kind:" in result.output
+    assert "note.add" in result.output and "3" in result.output
+    assert "Add note" not in result.output
+
+    result = runner.invoke(app, ["diff", "-f", str(project), "--summary", "--json"])
+    assert yaml.safe_load(result.output)["counts"] == {"deck.create": 1, "model.create": 1, "note.add": 3}
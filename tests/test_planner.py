@@ -0,0 +1,168 @@
+"""Tests for Planner note matching."""
+
+from ankiday.backends.memory import MemoryBackend
+from ankiday.config import Config, Deck, Model, Note, Template
+from ankiday.ops.apply import Planner, scope_query
+from ankiday.state import State, note_key
+
+
+CARD = {"Card 1": {"Front": "{{Front}}", "Back": "{{Back}}"}}
+
+
+def _backend(*notes, templates=CARD, css=""):
+    """MemoryBackend with model Basic, deck Lang::Spanish and ``notes`` as (front, back) pairs in that deck."""
+    backend = MemoryBackend()
+    backend.create_model(
+        "Basic", ["Front", "Back"], [{"name": n, "qfmt": t["Front"], "afmt": t["Back"]} for n, t in templates.items()], css
+    )
+    backend.create_deck("Lang::Spanish")
+    for front, back in notes:
+        backend.add_note("Basic", "Lang::Spanish", {"Front": front, "Back": back}, [])
+    backend.reset_counters()
+    return backend
+
+
+def _ids(backend):
+    return {note["fields"]["Front"]: nid for nid, note in backend.notes.items()}
+
+
+def _searches(backend):
+    return [c.args[0] for c in backend.calls if c.method == "find_notes"]
+
+
+def _config(*fronts):
+    return Config(
+        models=[
+            Model(
+                name="Basic",
+                fields=["Front", "Back"],
+                templates=[Template(name="Card 1", qfmt="{{Front}}", afmt="{{Back}}")],
+                uniqueField="Front",
+            )
+        ],
+        decks=[Deck(name="Lang::Spanish")],
+        notes=[Note(model="Basic", deck="Lang::Spanish", fields={"Front": f, "Back": "x"}) for f in fronts],
+    )
+
+
+def test_scope_query_escapes_names():
+    """Deck and model names are quoted and escaped."""
+    query = scope_query('My "Deck"_1', "Basic*")
+    assert query == '"deck:My \\"Deck\\"\\_1" "note:Basic\\*"'
+
+
+def test_note_moved_into_subdeck_is_matched():
+    """A managed note the user moved into a subdeck is found, not added again."""
+    backend = _backend()
+    backend.create_deck("Lang::Spanish::Old")
+    moved = backend.add_note("Basic", "Lang::Spanish::Old", {"Front": "hola", "Back": "x"}, [])
+    backend.add_note("Basic", "Lang::Spanish::Old", {"Front": "gracias", "Back": "thanks"}, [])
+
+    plan = Planner(backend).build_plan(_config("hola", "gracias"))
+
+    assert [s.kind for s in plan.steps if s.kind.startswith("note.")] == ["note.update"]
+    assert plan.note_ids[note_key("Lang::Spanish", "Basic", "hola")] == moved
+
+
+def test_managed_subdeck_keeps_its_own_notes():
+    """When a deck and its subdeck are both managed, each matches only its own notes."""
+    backend = _backend()
+    backend.create_deck("Lang::Spanish::Verbs")
+    sub = backend.add_note("Basic", "Lang::Spanish::Verbs", {"Front": "hola", "Back": "x"}, [])
+    cfg = _config("hola")
+    cfg.notes.append(Note(model="Basic", deck="Lang::Spanish::Verbs", fields={"Front": "hola", "Back": "x"}))
+
+    plan = Planner(backend).build_plan(cfg)
+
+    assert [(s.kind, s.note.deck) for s in plan.steps if s.kind.startswith("note.")] == [("note.add", "Lang::Spanish")]
+    assert plan.note_ids[note_key("Lang::Spanish::Verbs", "Basic", "hola")] == sub
+
+
+def test_notes_matched_through_index():
+    """One search per (deck, model) pair, then notes are matched by unique field."""
+    backend = _backend(("hola", "hello"), ("adiós: bye", "goodbye"))
+    ids = _ids(backend)
+
+    plan = Planner(backend).build_plan(_config("hola", "adiós: bye", "gracias"))
+
+    note_steps = [s for s in plan.steps if s.kind.startswith("note.")]
+    assert [s.kind for s in note_steps] == ["note.update", "note.update", "note.add"]
+    assert [s.payload.get("id") for s in note_steps[:2]] == [ids["hola"], ids["adiós: bye"]]
+    assert _searches(backend) == [scope_query("Lang::Spanish", "Basic")]
+
+
+def test_index_matches_unicode_normalized_values():
+    """Values that differ only in Unicode normalization form match the same note."""
+    decomposed = "adio\u0301s"
+    backend = _backend((decomposed, "bye"))
+
+    plan = Planner(backend).build_plan(_config("adi\u00f3s"))
+
+    assert [s.kind for s in plan.steps if s.kind.startswith("note.")] == ["note.update"]
+
+
+def test_unchanged_notes_are_not_updated():
+    """Notes whose fields already match Anki are counted, not updated."""
+    backend = _backend(("hola", "x"), ("gracias", "thanks"))
+
+    plan = Planner(backend).build_plan(_config("hola", "gracias"))
+
+    updates = [s for s in plan.steps if s.kind == "note.update"]
+    assert [s.payload["id"] for s in updates] == [_ids(backend)["gracias"]]
+    assert plan.unchanged == 1
+    assert plan.to_dict()["unchanged"] == 1
+    assert "1 notes unchanged." in plan.pretty()
+
+
+def test_matching_model_is_not_rewritten():
+    """Models whose templates and CSS match Anki produce no write steps."""
+    plan = Planner(_backend()).build_plan(_config())
+
+    assert [s.kind for s in plan.steps if s.kind.startswith("model.")] == []
+
+
+def test_extra_anki_template_is_not_rewritten():
+    """A template that exists only in Anki does not trigger a template update on every run."""
+    templates = {**CARD, "Card 2": {"Front": "{{Back}}", "Back": "{{Front}}"}}
+    plan = Planner(_backend(templates=templates)).build_plan(_config())
+
+    assert [s.kind for s in plan.steps if s.kind.startswith("model.")] == []
+
+
+def test_changed_model_parts_are_updated():
+    """Only the model part that differs from Anki is updated."""
+    plan = Planner(_backend(css=".card { color: red; }")).build_plan(_config())
+    assert [s.kind for s in plan.steps if s.kind.startswith("model.")] == ["model.updateStyling"]
+
+    backend = _backend(templates={"Card 1": {"Front": "{{Front}}", "Back": "{{Front}}<hr>{{Back}}"}})
+    plan = Planner(backend).build_plan(_config())
+    assert [s.kind for s in plan.steps if s.kind.startswith("model.")] == ["model.updateTemplates"]
+
+
+def test_state_file_skips_applied_notes():
+    """Notes recorded unchanged in the state file are confirmed with one nid: search."""
+    cfg = _config("hola", "gracias")
+    backend = _backend(("hola", "x"))
+    nid = _ids(backend)["hola"]
+    state = State.from_config(cfg, {note_key("Lang::Spanish", "Basic", "hola"): nid}, {})
+
+    plan = Planner(backend, state=state).build_plan(cfg)
+
+    assert [s.kind for s in plan.steps] == ["note.add"]
+    assert plan.unchanged == 1
+    assert _searches(backend) == [f"nid:{nid}", scope_query("Lang::Spanish", "Basic")]
+    assert [nid] in [c.args[0] for c in backend.calls if c.method == "notes_info"]  # only the pair of the new note is indexed
+
+
+def test_state_file_entries_are_rechecked_when_note_changed():
+    """A note whose config content changed since the last apply is matched again."""
+    backend = _backend(("hola", "x"))
+    nid = _ids(backend)["hola"]
+    state = State.from_config(_config("hola"), {note_key("Lang::Spanish", "Basic", "hola"): nid}, {})
+    cfg = _config("hola")
+    cfg.notes[0].fields["Back"] = "hello"
+
+    plan = Planner(backend, state=state).build_plan(cfg)
+
+    assert [(s.kind, s.payload.get("id")) for s in plan.steps] == [("note.update", nid)]
+    assert _searches(backend) == [scope_query("Lang::Spanish", "Basic")]
@@ -0,0 +1,90 @@
+"""Test the --profile timing surface: request accounting, spans and traces."""
+
+import json
+import time
+from unittest.mock import patch
+
+import httpx
+
+from ankiday.backends.ankiconnect import AnkiConnectBackend
+from ankiday.backends.memory import MemoryBackend
+from ankiday.cache import HashCache
+from ankiday.config import Config
+from ankiday.ops.apply import Applier, Planner
+from ankiday.ops.optimize import optimize_plan
+from ankiday.profile import Profiler, percentile
+
+_RealClient = httpx.Client
+
+
+def _reply(request: httpx.Request) -> httpx.Response:
+    body = json.loads(request.content)
+    if body["action"] == "multi":
+        result = [{"result": [], "error": None} for _ in body["params"]["actions"]]
+    else:
+        result = ["Default"]
+    return httpx.Response(200, json={"result": result, "error": None})
+
+
+def test_percentile_is_nearest_rank():
+    values = [1.0, 2.0, 3.0, 4.0]
+
+    assert percentile([], 50) == 0.0
+    assert percentile(values, 50) == 2.0
+    assert percentile(values, 99) == 4.0
+
+
+def test_multi_requests_are_split_between_their_actions():
+    profiler = Profiler()
+    backend = AnkiConnectBackend(profiler=profiler)
+
+    with patch("httpx.Client", lambda **kwargs: _RealClient(transport=httpx.MockTransport(_reply), **kwargs)):
+        with backend:
+            backend.list_decks()
+            with backend.batch() as batch:
+                batch.find_notes("deck:A")
+                batch.find_notes("deck:B")
+                batch.notes_info([1])
+
+    assert profiler.requests == 2
+    assert profiler.actions["deckNames"].calls == 1
+    assert profiler.actions["findNotes"].calls == 2
+    assert profiler.actions["notesInfo"].calls == 1
+    sent = sum(s.bytes_sent for s in profiler.actions.values())
+    assert sent > 0 and profiler.actions["findNotes"].bytes_sent * 3 / 2 <= sent
+    assert "findNotes" in profiler.summary()
+
+
+def test_planner_and_applier_phases_are_timed(tmp_path):
+    cfg = Config.model_validate({
+        "models": [{"name": "Basic", "fields": ["Front", "Back"], "uniqueField": "Front",
+                    "templates": [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Back}}"}]}],
+        "decks": [{"name": "Words"}],
+        "notes": [{"model": "Basic", "deck": "Words", "fields": {"Front": "a", "Back": "b"}}],
+    })
+    profiler = Profiler()
+    backend = MemoryBackend()
+
+    plan = Planner(backend, profiler=profiler).build_plan(cfg)
+    Applier(backend, hash_cache=HashCache(tmp_path / "hashes.json"), profiler=profiler).apply(
+        optimize_plan(plan), config_dir=tmp_path
+    )
+
+    assert {"plan.decks", "plan.models", "plan.notes", "apply.note.add"} <= set(profiler.spans)
+    assert "plan.notes" in profiler.summary()
+
+
+def test_trace_holds_spans_and_requests(tmp_path):
+    profiler = Profiler()
+    with profiler.span("plan.notes", notes=3):
+        profiler.record_request(["findNotes", "notesInfo"], time.perf_counter(), 100, 50)
+
+    trace = tmp_path / "trace.json"
+    profiler.write_trace(trace)
+
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert [e["name"] for e in events] == ["plan.notes", "multi (2 actions)"]
+    assert events[0]["args"] == {"notes": 3}
+    assert all(e["ph"] == "X" for e in events)
+    assert {e["cat"] for e in events} == {"phase", "request"}
+    assert profiler.actions["findNotes"].bytes_sent == 50
@@ -0,0 +1,135 @@
+"""Request budgets: planning and applying N notes must not cost per-note round trips.
+
+Runs against the recording MemoryBackend, which counts requests the way the
+AnkiConnect backend packs them into ``multi`` calls.
+"""
+
+from math import ceil
+
+import pytest
+
+from ankiday.backends.memory import MemoryBackend, payload_size
+from ankiday.cache import HashCache
+from ankiday.config import Config
+from ankiday.ops.apply import ADD_NOTES_CHUNK_SIZE, Applier, Planner
+from ankiday.ops.media import config_media
+from ankiday.ops.optimize import optimize_plan
+from ankiday.state import State
+
+DECKS = 4
+
+
+def _config(n, media=()):
+    notes = [
+        {"model": "Basic", "deck": f"Deck {i % DECKS}", "fields": {"Front": f"word {i}", "Back": "meaning"}}
+        for i in range(n)
+    ]
+    for note, path in zip(notes, media):
+        note["media"] = [path]
+    return Config.model_validate({
+        "models": [{"name": "Basic", "fields": ["Front", "Back"], "uniqueField": "Front",
+                    "templates": [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Back}}"}]}],
+        "decks": [{"name": f"Deck {d}"} for d in range(DECKS)],
+        "notes": notes,
+    })
+
+
+def _apply(backend, cfg, tmp_path, state=None):
+    plan = Planner(backend, state=state).build_plan(cfg)
+    applier = Applier(backend, media_state=state.media if state else None, hash_cache=HashCache(tmp_path / "hashes.json"))
+    applier.apply(optimize_plan(plan), config_dir=tmp_path, media=config_media(cfg.notes))
+    return plan, applier
+
+
+@pytest.mark.parametrize("n", [100, 2000])
+def test_planning_new_notes_is_constant_requests(n):
+    backend = MemoryBackend()
+
+    Planner(backend).build_plan(_config(n))
+
+    assert backend.requests <= 3
+    assert "notes_info" not in backend.call_counts()
+
+
+@pytest.mark.parametrize("n", [100, 2000])
+def test_applying_new_notes_costs_requests_per_chunk(n, tmp_path):
+    backend = MemoryBackend()
+    cfg = _config(n)
+    plan = Planner(backend).build_plan(cfg)
+    backend.reset_counters()
+
+    Applier(backend, hash_cache=HashCache(tmp_path / "hashes.json")).apply(optimize_plan(plan), config_dir=tmp_path)
+
+    chunks = DECKS * ceil(n / DECKS / ADD_NOTES_CHUNK_SIZE)
+    counts = backend.call_counts()
+    assert counts["add_notes"] == counts["can_add_notes"] == chunks
+    # Deck and model setup, then one check and one add per chunk
+    assert backend.requests <= 2 + 2 * chunks
+    # Each note travels twice (check and add), with little overhead
+    notes_bytes = sum(payload_size(n.model_dump(include={"model", "deck", "fields", "tags"})) for n in cfg.notes)
+    assert backend.bytes_sent <= 2.5 * notes_bytes
+
+
+@pytest.mark.parametrize("n", [100, 2000])
+def test_unchanged_replan_is_constant_requests(n, tmp_path):
+    backend = MemoryBackend()
+    cfg = _config(n)
+    _apply(backend, cfg, tmp_path)
+    backend.reset_counters()
+
+    plan = Planner(backend).build_plan(cfg)
+
+    assert plan.steps == []
+    assert backend.requests <= 5
+    # Existing notes are read in bulk, never one by one
+    assert backend.call_counts()["notes_info"] <= DECKS * ceil(n / DECKS / 500)
+    assert "add_notes" not in backend.call_counts()
+
+
+def test_unchanged_replan_with_state_reads_no_notes(tmp_path):
+    backend = MemoryBackend()
+    cfg = _config(2000)
+    plan, applier = _apply(backend, cfg, tmp_path)
+    state = State.from_config(cfg, plan.note_ids, applier.media.known)
+    backend.reset_counters()
+
+    assert Planner(backend, state=state).build_plan(cfg).steps == []
+
+    assert backend.requests <= 3
+    assert "notes_info" not in backend.call_counts()
+    # Only note ids cross the wire, not note contents
+    assert backend.bytes_received < 20 * len(cfg.notes)
+
+
+def test_reapply_does_not_reupload_media(tmp_path):
+    for i in range(3):
+        (tmp_path / f"m{i}.bin").write_bytes(bytes([i]) * 1000)
+    backend = MemoryBackend()
+    cfg = _config(30, media=[f"m{i % 3}.bin" for i in range(30)])
+
+    plan, applier = _apply(backend, cfg, tmp_path)
+    assert backend.call_counts()["store_media_path"] == 3
+
+    state = State.from_config(cfg, plan.note_ids, applier.media.known)
+    backend.reset_counters()
+    _apply(backend, cfg, tmp_path, state=state)
+
+    assert "store_media_path" not in backend.call_counts()
+
+
+def test_media_changed_behind_unchanged_notes_is_reuploaded(tmp_path):
+    for i in range(3):
+        (tmp_path / f"m{i}.bin").write_bytes(bytes([i]) * 1000)
+    backend = MemoryBackend()
+    cfg = _config(30, media=[f"m{i % 3}.bin" for i in range(30)])
+    plan, applier = _apply(backend, cfg, tmp_path)
+    state = State.from_config(cfg, plan.note_ids, applier.media.known)
+    (tmp_path / "m1.bin").write_bytes(b"v2")
+    backend.reset_counters()
+
+    plan, applier = _apply(backend, cfg, tmp_path, state=state)
+
+    assert plan.steps == []
+    assert backend.call_counts()["store_media_path"] == 1
+    assert backend.media["m1.bin"] == b"v2"
+    assert applier.media.uploaded == 1
@@ -0,0 +1,61 @@
+"""Tests for the local state file."""
+
+from pathlib import Path
+
+from ankiday.config import Config, Deck, Model, Note, Template
+from ankiday.state import State, content_hash, note_key, state_path
+
+
+def _config():
+    return Config(
+        models=[
+            Model(
+                name="Basic",
+                fields=["Front", "Back"],
+                templates=[Template(name="Card 1", qfmt="{{Front}}", afmt="{{Back}}")],
+                uniqueField="Front",
+            )
+        ],
+        decks=[Deck(name="Test")],
+        notes=[
+            Note(model="Basic", deck="Test", fields={"Front": "a", "Back": "1"}, media=["media/sample.svg"]),
+            Note(model="Basic", deck="Test", fields={"Front": "b", "Back": "2"}),
+        ],
+    )
+
+
+def test_state_path_is_next_to_config():
+    assert state_path(Path("decks/spanish.yaml")) == Path("decks/spanish.ankiday.lock")
+
+
+def test_state_round_trip(tmp_path):
+    """A saved state file loads back with the same entries."""
+    cfg = _config()
+    key = note_key("Test", "Basic", "a")
+    state = State.from_config(cfg, {key: 101}, {"sample.svg": "abc", "other.png": "def"})
+
+    assert state.note_id(key, content_hash(cfg.notes[0].model_dump())) == 101
+    assert note_key("Test", "Basic", "b") not in state.notes  # no id known yet
+    assert set(state.models) == {"Basic"}
+    assert state.media == {"sample.svg": "abc"}  # only referenced media is kept
+
+    path = tmp_path / "config.ankiday.lock"
+    state.save(path)
+    assert State.load(path) == state
+
+
+def test_stale_content_hash_yields_no_id():
+    cfg = _config()
+    key = note_key("Test", "Basic", "a")
+    state = State.from_config(cfg, {key: 101}, {"sample.svg": "abc", "other.png": "def"})
+
+    assert state.note_id(key, "0" * 16) is None
+
+
+def test_unreadable_state_is_ignored(tmp_path):
+    path = tmp_path / "config.ankiday.lock"
+    assert State.load(path) is None
+    path.write_text("{not json")
+    assert State.load(path) is None
+    path.write_text('{"version": 999}')
+    assert State.load(path) is None
@@ -0,0 +1,166 @@
+"""Test planning in parts and applying the parts while planning goes on."""
+
+import threading
+
+import pytest
+import yaml
+from typer.testing import CliRunner
+
+from ankiday.backends.collection import CollectionBackend, create_collection
+from ankiday.backends.memory import MemoryBackend
+from ankiday.cache import HashCache
+from ankiday.cli import app
+from ankiday.config import Config
+from ankiday.journal import Journal
+from ankiday.ops.apply import Applier, Plan, Planner
+from ankiday.state import State
+
+BASIC = {"name": "Basic", "fields": ["Front", "Back"], "uniqueField": "Front",
+         "templates": [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Back}}"}]}
+
+
+def _config(n=12, decks=3, **extra):
+    return {
+        "models": [BASIC],
+        "decks": [{"name": f"D{d}"} for d in range(decks)],
+        "notes": [{"model": "Basic", "deck": f"D{i % decks}", "fields": {"Front": f"w{i}", "Back": "x"}} for i in range(n)],
+        **extra,
+    }
+
+
+def _steps(parts):
+    return sorted((s.kind, s.description) for p in parts for s in p.steps)
+
+
+def test_parts_hold_the_same_plan(tmp_path):
+    backend = MemoryBackend()
+    first = Config.model_validate(_config(6))
+    Applier(backend, hash_cache=HashCache(tmp_path / "h.json")).apply(Planner(backend).build_plan(first), tmp_path)
+    backend.add_note("Basic", "D0", {"Front": "stray", "Back": ""}, [])
+    backend.update_note_fields(min(backend.notes), {"Back": "changed"})
+    cfg = Config.model_validate(_config())
+
+    plan = Planner(backend).build_plan(cfg)
+    parts = list(Planner(backend).iter_plan(cfg))
+
+    assert _steps(parts) == _steps([plan])
+    assert sum(p.unchanged for p in parts) == plan.unchanged
+    assert {k: v for p in parts for k, v in p.note_ids.items()} == plan.note_ids
+    # Decks and models first, then one part per (deck, model) pair after the notes needing no lookup
+    assert len(parts) == 3 + 3
+
+
+def test_apply_parts_applies_everything(tmp_path):
+    backend = MemoryBackend()
+    cfg = Config.model_validate(_config())
+    plan = Plan()
+    seen = []
+
+    applier = Applier(backend, hash_cache=HashCache(tmp_path / "hashes.json"))
+    applier.apply_parts(Planner(backend).iter_plan(cfg), plan, config_dir=tmp_path, on_part=seen.append)
+
+    assert len(backend.notes) == 12
+    assert len(plan.note_ids) == 12
+    assert [p.steps[0].kind for p in seen] == ["deck.create", "model.create", "note.add", "note.add", "note.add"]
+    assert Planner(backend).build_plan(cfg).steps == []
+
+
+def test_planning_failure_is_raised(tmp_path):
+    def parts():
+        yield Plan()
+        raise RuntimeError("planning broke")
+
+    with pytest.raises(RuntimeError, match="planning broke"):
+        Applier(MemoryBackend(), hash_cache=HashCache(tmp_path / "h.json")).apply_parts(parts(), Plan(), tmp_path)
+
+
+def test_apply_failure_stops_planning(tmp_path):
+    produced = []
+
+    def parts():
+        for i in range(100):
+            produced.append(i)
+            part = Plan()
+            part.add("model.delete", "Delete model 'Missing'", {"name": "Missing"})
+            yield part
+
+    with pytest.raises(RuntimeError, match="model was not found"):
+        Applier(MemoryBackend(), hash_cache=HashCache(tmp_path / "h.json")).apply_parts(
+            parts(), Plan(), tmp_path, queue_size=2
+        )
+
+    assert len(produced) < 10
+    assert not any(t.name == "ankiday-planner" for t in threading.enumerate())
+
+
+def test_journal_of_parts_can_be_resumed(tmp_path):
+    backend = MemoryBackend()
+    cfg = Config.model_validate(_config(4, decks=2))
+    path = tmp_path / "config.ankiday.journal"
+    journal = Journal.create(path, Plan(), "cfg")
+
+    Applier(backend, hash_cache=HashCache(tmp_path / "h.json"), journal=journal).apply_parts(
+        Planner(backend).iter_plan(cfg), Plan(), tmp_path
+    )
+    journal.close()
+    loaded = Journal.load(path)
+
+    assert [s.kind for s in loaded.plan.steps].count("note.add") == 4
+    assert loaded.completed == set(range(1, len(loaded.plan.steps) + 1))
+    assert len(loaded.plan.note_ids) == 4
+
+
+def test_apply_yes_streams(tmp_path):
+    create_collection(tmp_path / "collection.anki2")
+    config = tmp_path / "decks.yaml"
+    config.write_text(yaml.safe_dump({"backend": "collection", **_config()}))
+    runner = CliRunner()
+
+    result = runner.invoke(app, ["apply", "-f", str(config), "-y"])
+
+    assert result.exit_code == 0, result.output
+    assert "Applying changes as they are planned" in result.output
+    with CollectionBackend(tmp_path / "collection.anki2") as backend:
+        assert len(backend.find_notes('"note:Basic"')) == 12
+    assert len(State.load(tmp_path / "decks.ankiday.lock").notes) == 12
+    assert "Nothing to do." in runner.invoke(app, ["apply", "-f", str(config), "-y"]).output
+
+
+@pytest.mark.parametrize("flags", [["-y"], [], ["--refresh-state"]])
+def test_apply_uploads_media_edited_behind_unchanged_notes(tmp_path, flags):
+    create_collection(tmp_path / "collection.anki2")
+    (tmp_path / "img.png").write_bytes(b"v1")
+    cfg = _config(n=2, decks=1)
+    cfg["notes"][0]["media"] = ["img.png"]
+    config = tmp_path / "decks.yaml"
+    config.write_text(yaml.safe_dump({"backend": "collection", **cfg}))
+    runner = CliRunner()
+    assert runner.invoke(app, ["apply", "-f", str(config), "-y"]).exit_code == 0
+    (tmp_path / "img.png").write_bytes(b"v2, edited")
+
+    result = runner.invoke(app, ["apply", "-f", str(config), *flags], input="y\n")
+
+    assert result.exit_code == 0, result.output
+    assert ("Upload these media files?" in result.output) == ("-y" not in flags)
+    assert "uploaded 1 changed media files" in result.output
+    assert (tmp_path / "collection.media" / "img.png").read_bytes() == b"v2, edited"
+    # --refresh-state forgets uploaded hashes, so only a plain apply is a no-op again
+    assert "Nothing to do." in runner.invoke(app, ["apply", "-f", str(config)]).output
+
+
+def test_apply_asks_before_uploading_media_behind_unchanged_notes(tmp_path):
+    create_collection(tmp_path / "collection.anki2")
+    (tmp_path / "img.png").write_bytes(b"v1")
+    cfg = _config(n=2, decks=1)
+    cfg["notes"][0]["media"] = ["img.png"]
+    config = tmp_path / "decks.yaml"
+    config.write_text(yaml.safe_dump({"backend": "collection", **cfg}))
+    runner = CliRunner()
+    assert runner.invoke(app, ["apply", "-f", str(config), "-y"]).exit_code == 0
+    (tmp_path / "img.png").write_bytes(b"v2, edited")
+
+    result = runner.invoke(app, ["apply", "-f", str(config)], input="n\n")
+
+    assert result.exit_code == 1
+    assert "- img.png" in result.output
+    assert (tmp_path / "collection.media" / "img.png").read_bytes() == b"v1"
@@ -91,6 +91,69 @@ def test_applier_verbose_logging():
     print("✓ Applier verbose logging works")
 
 
+def test_backend_verbose_summarizes_payloads():
+    """Verbose output shows the size of base64 media, not the data."""
+    captured_output = io.StringIO()
+
+    with patch('sys.stdout', captured_output), patch('httpx.Client') as mock_client_class:
+        mock_client = Mock()
+        mock_client_class.return_value = mock_client
+        mock_client.post.return_value.json.return_value = {"result": "big.bin", "error": None}
+
+        backend = AnkiConnectBackend(verbose=True)
+        backend.store_media_file("big.bin", b"x" * 300_000)
+
+    output = captured_output.getvalue()
+    assert "'data': '<base64, 400000 chars>'" in output
+    assert len(output) < 1000
+
+
+def test_verbose_payload_truncates_long_values():
+    """Long strings and lists are cut unless the trace level is selected."""
+    from ankiday import log
+
+    logger = log.get_logger("ankiconnect")
+    value = {"notes": [{"fields": {"Front": "y" * 5000}}] * 50}
+
+    text = str(log.LogPayload(value, logger))
+    assert "(5000 chars)" in text and "(40 more)" in text
+    assert len(text) < 2500
+
+    previous = log.root.level
+    try:
+        log.set_level("trace")
+        assert str(log.LogPayload(value, logger)).count("y" * 5000) == 50
+    finally:
+        log._level = None
+        log.root.setLevel(previous)
+
+
+def test_verbose_lines_are_not_formatted_when_filtered():
+    """Messages below the selected level cost no formatting."""
+    from ankiday import log
+
+    formatted = []
+
+    class Spy:
+        def __str__(self):
+            formatted.append(True)
+            return "spy"
+
+    captured_output = io.StringIO()
+    previous = log.root.level
+    try:
+        with patch('sys.stdout', captured_output):
+            backend = AnkiConnectBackend(verbose=True)
+            log.root.setLevel(log.logging.INFO)
+            backend._log_verbose("Parameters: %s", Spy())
+            Planner(Mock(), verbose=True)._log_verbose("Planning %s", "notes")
+    finally:
+        log.root.setLevel(previous)
+
+    assert formatted == []
+    assert captured_output.getvalue() == "[PLANNER] Planning notes\n"
+
+
 def test_verbose_flag_in_cli():
     """Test that CLI accepts verbose flag (basic import test)."""
     print("Testing CLI structure...")
@@ -109,6 +172,9 @@ def run_all_tests():
         test_backend_no_verbose_logging,
         test_planner_verbose_logging,
         test_applier_verbose_logging,
+        test_backend_verbose_summarizes_payloads,
+        test_verbose_payload_truncates_long_values,
+        test_verbose_lines_are_not_formatted_when_filtered,
         test_verbose_flag_in_cli,
     ]
     